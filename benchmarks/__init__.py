@@ -0,0 +1,4 @@
+"""
+Benchmarks for the text analysis: a synthetic corpus generator,
+a timing suite for the main operations and a comparison with a baseline.
+"""
@@ -0,0 +1,81 @@
+"""
+Command line interface of the benchmarks.
+
+    python -m benchmarks generate corpus.txt --size 1000000
+    python -m benchmarks run --output results.json
+    python -m benchmarks compare baseline.json results.json
+"""
+
+import argparse
+import json
+import sys
+
+from benchmarks.corpus import SUPPORTED_LANGUAGES, write_corpus
+from benchmarks.suite import CASES, compare_results, format_comparison, run_suite
+
+
+def add_corpus_arguments(parser):
+    """Adds the arguments of the synthetic corpus to the parser."""
+    parser.add_argument("--size", type=int, default=1_000_000, help="characters")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="distinct words")
+    parser.add_argument("--language", choices=SUPPORTED_LANGUAGES, default="en")
+    parser.add_argument("--row-words", type=int, default=40, help="mean words per row")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def corpus_params(args):
+    """Returns the keyword arguments of generate_text from the parsed arguments."""
+    return {
+        "size": args.size,
+        "vocabulary_size": args.vocabulary,
+        "language": args.language,
+        "row_words": args.row_words,
+        "seed": args.seed,
+    }
+
+
+def main(argv=None):
+    """Parses the arguments and runs the command."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="write a synthetic corpus")
+    generate.add_argument("path")
+    add_corpus_arguments(generate)
+
+    run = commands.add_parser("run", help="run the benchmark suite")
+    add_corpus_arguments(run)
+    run.add_argument("--corpus", help="use an existing .txt file instead")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--case", action="append", choices=list(CASES))
+    run.add_argument("--output", default="bench_results.json")
+
+    compare = commands.add_parser("compare", help="compare results with a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.2)
+    compare.add_argument("--min-time", type=float, default=1e-4)
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        print(write_corpus(args.path, **corpus_params(args)))
+        return 0
+    if args.command == "run":
+        results = run_suite(corpus_params(args), args.repeat, args.case, args.corpus)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+        for name, res in results["results"].items():
+            print(f"{name}: {res.get('median', res.get('error'))}")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, "r", encoding="utf-8") as file:
+        current = json.load(file)
+    rows = compare_results(baseline, current, args.threshold, args.min_time)
+    print(format_comparison(rows))
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+This module generates reproducible synthetic corpora modeled on
+the texts in tests/texts.
+"""
+
+import random
+import re
+from pathlib import Path
+
+TEXTS_DIR = Path(__file__).resolve().parent.parent / "tests" / "texts"
+SUPPORTED_LANGUAGES = ("uk", "ru", "en", "de")
+
+
+def load_seed_words(language):
+    """
+    Returns the distinct words of the sample text for the language.
+    """
+    if language not in SUPPORTED_LANGUAGES:
+        raise ValueError(
+            f"Language {language} is not supported, use one of {SUPPORTED_LANGUAGES}."
+        )
+    text = (TEXTS_DIR / f"text_{language}.txt").read_text(encoding="utf-8")
+    return sorted(set(re.findall(r"\b[^\W\d_]+\b", text)))
+
+
+def build_vocabulary(language, vocabulary_size, rnd):
+    """
+    Builds a vocabulary of the given size from the sample words,
+    extending it with new words made from their syllables if needed.
+    """
+    seed_words = load_seed_words(language)
+    vocabulary = list(seed_words[:vocabulary_size])
+    known = set(vocabulary)
+    parts = [word[i : i + 3] for word in seed_words for i in range(0, len(word), 3)]
+    while len(vocabulary) < vocabulary_size:
+        word = "".join(rnd.choice(parts) for _ in range(rnd.randint(2, 4))).lower()
+        if word not in known:
+            known.add(word)
+            vocabulary.append(word)
+    rnd.shuffle(vocabulary)
+    return vocabulary
+
+
+def generate_text(
+    size=1_000_000, vocabulary_size=5000, language="en", row_words=40, seed=0
+):
+    """
+    Generates a text of about `size` characters with a Zipf-like word distribution.
+    The same arguments always produce the same text.
+    """
+    rnd = random.Random(seed)
+    vocabulary = build_vocabulary(language, vocabulary_size, rnd)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    rows = []
+    length = 0
+    while length < size:
+        words = rnd.choices(vocabulary, weights, k=rnd.randint(1, row_words * 2))
+        words[0] = words[0].capitalize()
+        if rnd.random() < 0.2:
+            words.insert(rnd.randrange(len(words)), str(rnd.randint(1, 2024)))
+        row = " ".join(
+            word + ("," if rnd.random() < 0.08 else "") for word in words
+        ) + rnd.choice(".!?")
+        rows.append(row)
+        length += len(row) + 1
+        if rnd.random() < 0.1:
+            rows.append("")
+    return "\n".join(rows)
+
+
+def write_corpus(path, **kwargs):
+    """
+    Generates a text and writes it to a .txt file, returns the path.
+    """
+    path = Path(path)
+    path.write_text(generate_text(**kwargs), encoding="utf-8")
+    return path
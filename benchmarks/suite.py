@@ -0,0 +1,364 @@
+"""
+This module times the main operations of AnalysisText on a synthetic corpus.
+"""
+
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from frequency_analysis_text.functionality import AnalysisText
+from frequency_analysis_text.parallel_search import search_rows
+from benchmarks.corpus import write_corpus
+
+CASES = {}
+
+
+def case(name):
+    """
+    Registers a benchmark case. A case receives the context and returns
+    a pair (setup, func): setup prepares a fresh argument for every run,
+    only func(argument) is timed.
+    """
+
+    def decorator(func):
+        CASES[name] = func
+        return func
+
+    return decorator
+
+
+class Context:
+    """Stores the corpus and the files shared by the benchmark cases."""
+
+    def __init__(self, corpus_path, work_dir):
+        self.corpus_path = Path(corpus_path).resolve()
+        self.work_dir = Path(work_dir)
+        postings = self.load().get_text_index().postings
+        ranked = sorted(
+            (word for word in postings if word.isalpha() and len(word) > 4),
+            key=lambda word: -len(postings[word]),
+        )
+        self.word = ranked[len(ranked) // 10] if ranked else "a"
+        self.root = self.word[1:4]
+
+    def load(self, path=None, count=True, **kwargs):
+        """Returns a loaded AnalysisText, with the words counted if count is set."""
+        obj = AnalysisText(path or self.corpus_path, **kwargs)
+        obj.load_file()
+        if count:
+            obj.update_result_counter()
+        return obj
+
+    def edited(self, edits=3, obj=None):
+        """
+        Returns a loaded AnalysisText, by default a new one,
+        with several edits in the history.
+        """
+        obj = obj or self.load()
+        for _ in range(edits):
+            obj.search_word(self.word)
+            obj.remove_or_replace_last_words(self.word.upper())
+            obj.search_word(self.word.upper())
+            obj.remove_or_replace_last_words(self.word)
+        return obj
+
+    def saved(self, suffix):
+        """Returns the path to the corpus analysis saved with the suffix."""
+        path = self.work_dir / f"saved{suffix}"
+        if not path.exists():
+            obj = self.load()
+            saved_path, _ = obj.get_path_to_save(suffix)
+            if suffix == ".pkl":
+                obj.save_file_to_pickle()
+            elif suffix == ".journal":
+                obj.save_file_to_journal()
+                obj = self.edited(obj=obj)
+                obj.save_file_to_journal()
+            else:
+                obj.save_file_to_json()
+            Path(saved_path).rename(path)
+        return path
+
+
+@case("load_txt")
+def load_txt(ctx):
+    """Reads a .txt file and detects its language."""
+    return lambda: AnalysisText(ctx.corpus_path), lambda obj: obj.load_file()
+
+
+@case("count")
+def count(ctx):
+    """Counts word frequencies."""
+    return lambda: ctx.load(count=False), lambda obj: obj.update_result_counter()
+
+
+@case("count_numpy")
+def count_numpy(ctx):
+    """Counts word frequencies on an array of token ids."""
+    return (
+        lambda: ctx.load(count=False, use_numpy=True),
+        lambda obj: obj.update_result_counter(),
+    )
+
+
+@case("top_numpy")
+def top_numpy(ctx):
+    """Finds the most frequent words and their rows on an encoded text."""
+
+    def setup():
+        obj = ctx.load(count=False, use_numpy=True)
+        obj.get_token_array()
+        return obj
+
+    def func(obj):
+        token_array = obj.get_token_array()
+        token_array.row_counts([word for word, _ in token_array.top(10)])
+
+    return setup, func
+
+
+@case("str")
+def to_str(ctx):
+    """Formats the table of analysis results."""
+    return ctx.load, str
+
+
+@case("index")
+def build_index(ctx):
+    """Builds the text index."""
+    return ctx.load, lambda obj: obj.get_text_index()
+
+
+def search_case(mode):
+    """Creates a case searching the word in the mode on an indexed text."""
+
+    def setup(ctx):
+        obj = ctx.load()
+        if mode:
+            getattr(obj, f"{mode}_on")()
+        obj.get_text_index()
+        return obj
+
+    def make(ctx):
+        word = ctx.root if mode == "root_mode" else ctx.word
+        return lambda: setup(ctx), lambda obj: obj.search_word(word)
+
+    return make
+
+
+for _mode, _name in (
+    (None, "search"),
+    ("case_sens", "search_case_sens"),
+    ("root_mode", "search_root"),
+    ("smart_mode", "search_smart"),
+):
+    case(_name)(search_case(_mode))
+
+
+def mapped_scan_case(workers):
+    """
+    Creates a case scanning all rows of the mapped corpus for the forms
+    of the word with the number of workers, even if the corpus is small.
+    """
+
+    def make(ctx):
+        obj = ctx.load(use_mmap=True)
+        obj.smart_mode_on()
+        _, _, query = obj.get_query(ctx.word)
+        mapped = obj.mapped_text
+
+        def func(mapped):
+            search_rows(query, mapped.iter_rows(), len(mapped), None, workers, 0)
+
+        func(mapped)
+        return lambda: mapped, func
+
+    return make
+
+
+for _workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+    case(f"search_mapped_scan_{_workers}")(mapped_scan_case(_workers))
+
+
+def replace_case(new_word):
+    """Creates a case replacing the found word with new_word."""
+
+    def make(ctx):
+        def setup():
+            obj = ctx.load()
+            obj.search_word(ctx.word)
+            return obj
+
+        return setup, lambda obj: obj.remove_or_replace_last_words(new_word)
+
+    return make
+
+
+case("replace")(replace_case("replacement"))
+case("remove")(replace_case(""))
+
+
+@case("undo")
+def undo(ctx):
+    """Undoes the last edit."""
+    return ctx.edited, lambda obj: obj.undo()
+
+
+@case("redo")
+def redo(ctx):
+    """Redoes the last undone edit."""
+
+    def setup():
+        obj = ctx.edited()
+        obj.undo()
+        return obj
+
+    return setup, lambda obj: obj.redo()
+
+
+def save_case(method, suffix):
+    """Creates a case saving the analysis with the method."""
+
+    def make(ctx):
+        def setup():
+            for path in Path().glob(f"*{suffix}"):
+                path.unlink()
+            return ctx.load()
+
+        return setup, lambda obj: getattr(obj, method)()
+
+    return make
+
+
+def load_saved_case(suffix):
+    """Creates a case loading the analysis saved with the suffix."""
+
+    def make(ctx):
+        path = ctx.saved(suffix)
+        return lambda: AnalysisText(path), lambda obj: obj.load_file()
+
+    return make
+
+
+@case("save_journal_append")
+def save_journal_append(ctx):
+    """Appends the edits made since the last save to a journal."""
+
+    def setup():
+        for path in Path().glob("*.journal"):
+            path.unlink()
+        obj = ctx.load()
+        obj.save_file_to_journal()
+        return ctx.edited(obj=obj)
+
+    return setup, lambda obj: obj.save_file_to_journal()
+
+
+@case("save_journal_compact")
+def save_journal_compact(ctx):
+    """Appends the edits to a journal and compacts it into a new base."""
+
+    def setup():
+        for path in Path().glob("*.journal"):
+            path.unlink()
+        obj = ctx.load()
+        obj.save_file_to_journal()
+        obj = ctx.edited(obj=obj)
+        obj.journal.max_ratio = 0
+        return obj
+
+    return setup, lambda obj: obj.save_file_to_journal()
+
+
+case("save_pickle")(save_case("save_file_to_pickle", ".pkl"))
+case("save_json")(save_case("save_file_to_json", ".json"))
+case("save_journal")(save_case("save_file_to_journal", ".journal"))
+case("load_pickle")(load_saved_case(".pkl"))
+case("load_json")(load_saved_case(".json"))
+case("load_journal")(load_saved_case(".journal"))
+
+
+def time_case(setup, func, repeat):
+    """Returns the timings of func in seconds for `repeat` fresh setups."""
+    timings = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_suite(corpus_params, repeat=5, names=None, corpus_path=None):
+    """
+    Runs the benchmark cases and returns the results as a dict
+    ready to be written to JSON.
+    """
+    results = {}
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            if corpus_path is None:
+                corpus_path = write_corpus(
+                    Path(work_dir) / "corpus.txt", **corpus_params
+                )
+            ctx = Context(corpus_path, work_dir)
+            for name, make in CASES.items():
+                if names and name not in names:
+                    continue
+                try:
+                    timings = time_case(*make(ctx), repeat)
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    results[name] = {"error": f"{type(e).__name__}: {e}"}
+                    continue
+                results[name] = {
+                    "min": min(timings),
+                    "median": statistics.median(timings),
+                    "runs": timings,
+                }
+        finally:
+            os.chdir(old_cwd)
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "corpus": corpus_params if corpus_path is None else str(corpus_path),
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.2, min_time=1e-4):
+    """
+    Compares the medians of two result dicts.
+    Returns a list of rows (name, baseline, current, ratio, regression).
+    """
+    rows = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if not cur or "median" not in base or "median" not in cur:
+            continue
+        ratio = cur["median"] / base["median"] if base["median"] else float("inf")
+        regression = ratio > 1 + threshold and cur["median"] > min_time
+        rows.append((name, base["median"], cur["median"], ratio, regression))
+    return rows
+
+
+def format_comparison(rows):
+    """Formats the comparison rows as a table."""
+    width = max([len(row[0]) for row in rows] + [4])
+    res = f'{"case":^{width}}|{"baseline":^12}|{"current":^12}|{"ratio":^8}|\n'
+    res += "-" * (width + 36) + "\n"
+    for name, base, cur, ratio, regression in rows:
+        res += (
+            f"{name:<{width}}|{base:>12.6f}|{cur:>12.6f}|{ratio:>8.2f}|"
+            f'{" REGRESSION" if regression else ""}\n'
+        )
+    return res
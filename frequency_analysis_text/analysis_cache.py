@@ -0,0 +1,115 @@
+"""
+This module stores the results of analyzing .txt files on disk, keyed by
+a hash of the file content and the tokenizer version, so reopening the same
+file skips language detection, counting and indexing.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+TOKENIZER_VERSION = 2
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get(
+        "FREQUENCY_ANALYSIS_CACHE_DIR",
+        Path.home() / ".cache" / "frequency_analysis_text",
+    )
+)
+
+
+def get_default_cache():
+    """
+    Returns the AnalysisCache of the default directory, or None if caching
+    is turned off by setting FREQUENCY_ANALYSIS_NO_CACHE to a value other than 0.
+    """
+    if os.environ.get("FREQUENCY_ANALYSIS_NO_CACHE", "0") not in ("", "0"):
+        return None
+    return AnalysisCache()
+
+
+class AnalysisCache:
+    """
+    A directory of cached analyses with a size limit and least recently used
+    eviction. Entries are written to a temporary file and renamed, so several
+    processes can share the cache.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        """Initializes the cache in the directory."""
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def new_digest():
+        """
+        Returns a hash object for the file content, whose hex digest is the key.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"tokenizer-{TOKENIZER_VERSION}:".encode("ascii"))
+        return digest
+
+    @staticmethod
+    def make_key(data, chunk_size=1 << 24):
+        """Returns the key of the file content given as bytes or a memory map."""
+        digest = AnalysisCache.new_digest()
+        view = memoryview(data)
+        for start in range(0, len(view), chunk_size):
+            digest.update(view[start : start + chunk_size])
+        view.release()
+        return digest.hexdigest()
+
+    def get_path(self, key):
+        """Returns the path of the entry."""
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key):
+        """Returns the cached entry or None, marking the entry as recently used."""
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.load(file)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        """Writes the entry atomically and evicts old entries if needed."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.get_path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def entries(self):
+        """Returns a list of (mtime, size, path) of the entries."""
+        res = []
+        for path in self.directory.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            res.append((stat.st_mtime, stat.st_size, path))
+        return res
+
+    def evict(self):
+        """Removes the least recently used entries while the cache is too large."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        """Removes all entries."""
+        for _, _, path in self.entries():
+            path.unlink(missing_ok=True)
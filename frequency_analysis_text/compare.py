@@ -0,0 +1,160 @@
+"""
+This module compares the word frequencies of two analyses. The two
+vocabularies are aligned into one space of word ids, and the count deltas,
+the ratios of the relative frequencies and the keyness of every word are
+computed over whole arrays of counts: with NumPy if it is installed,
+word by word otherwise.
+"""
+
+import heapq
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+MEASURES = ("log_likelihood", "chi_square", "log_ratio", "delta")
+
+
+def log_likelihood(a, b, total_a, total_b, log):
+    """
+    Returns the log-likelihood (G2) of the counts a and b in texts
+    of total_a and total_b words. A zero count adds nothing to the sum.
+    """
+    expected_a = total_a * (a + b) / (total_a + total_b)
+    expected_b = total_b * (a + b) / (total_a + total_b)
+    return 2 * (
+        a * log((a + (a == 0)) / expected_a) + b * log((b + (b == 0)) / expected_b)
+    )
+
+
+def chi_square(a, b, total_a, total_b, log):
+    """
+    Returns the chi-square of the 2x2 table of the counts a and b
+    and the other words of the texts.
+    """
+    c, d = total_a - a, total_b - b
+    denominator = (a + b) * (c + d) * total_a * total_b
+    return (
+        (total_a + total_b) * (a * d - b * c) ** 2 / (denominator + (denominator == 0))
+    )
+
+
+def log_ratio(a, b, total_a, total_b, log):
+    """
+    Returns the binary log of the ratio of the relative frequencies,
+    with half an occurrence added to the counts so that zeros stay finite.
+    """
+    return log(((b + 0.5) / total_b) / ((a + 0.5) / total_a)) / log(2)
+
+
+def delta(a, b, total_a, total_b, log):
+    """Returns the change of the frequency per million words."""
+    return (b / total_b - a / total_a) * 1_000_000
+
+
+SCORES = {
+    "log_likelihood": log_likelihood,
+    "chi_square": chi_square,
+    "log_ratio": log_ratio,
+    "delta": delta,
+}
+
+
+class Comparison:
+    """
+    The word counts of two analyses, a and b, aligned by word id.
+    The first len(counts_a) ids are the words of a, the others are
+    the words found only in b.
+    """
+
+    def __init__(self, counts_a, counts_b):
+        """Aligns two mappings of words to counts."""
+        if not counts_a or not counts_b:
+            raise ValueError("Both analyses must contain words.")
+        ids = dict(zip(counts_a, range(len(counts_a))))
+        only_b = [word for word in counts_b if word not in ids]
+        ids.update(zip(only_b, range(len(ids), len(ids) + len(only_b))))
+        self.vocabulary = list(ids)
+        if np is not None:
+            self.counts_a = np.zeros(len(self.vocabulary))
+            self.counts_a[: len(counts_a)] = np.fromiter(
+                counts_a.values(), float, len(counts_a)
+            )
+            self.counts_b = np.zeros(len(self.vocabulary))
+            self.counts_b[
+                np.fromiter(map(ids.__getitem__, counts_b), np.int64, len(counts_b))
+            ] = np.fromiter(counts_b.values(), float, len(counts_b))
+        else:
+            self.counts_a = list(counts_a.values())
+            self.counts_a += [0] * (len(self.vocabulary) - len(counts_a))
+            self.counts_b = [0] * len(self.vocabulary)
+            for word, count in counts_b.items():
+                self.counts_b[ids[word]] = count
+        self.total_a = int(sum(counts_a.values()))
+        self.total_b = int(sum(counts_b.values()))
+
+    def __len__(self):
+        """Returns the number of the words of both analyses."""
+        return len(self.vocabulary)
+
+    def scores(self, measure="log_likelihood"):
+        """
+        Returns the scores of all words in the measure. The keyness
+        measures are signed: negative if the word is rarer in b.
+        """
+        if measure not in SCORES:
+            raise ValueError(f"The measure must be one of: {', '.join(MEASURES)}.")
+        score = SCORES[measure]
+        args = self.total_a, self.total_b
+        if np is not None:
+            res = score(self.counts_a, self.counts_b, *args, np.log)
+            if measure in ("log_likelihood", "chi_square"):
+                res *= np.sign(
+                    self.counts_b * self.total_a - self.counts_a * self.total_b
+                )
+            return res
+        res = [
+            score(a, b, *args, math.log) for a, b in zip(self.counts_a, self.counts_b)
+        ]
+        if measure in ("log_likelihood", "chi_square"):
+            res = [
+                -value if b * self.total_a < a * self.total_b else value
+                for value, a, b in zip(res, self.counts_a, self.counts_b)
+            ]
+        return res
+
+    def table(self, measure="log_likelihood", k=20):
+        """
+        Returns the k words that differ most in the measure as a list
+        of (word, count in a, count in b, count delta, log ratio, score),
+        sorted by the absolute score. Words scored 0 are left out.
+        """
+        scores = self.scores(measure)
+        ratios = scores if measure == "log_ratio" else self.scores("log_ratio")
+        if np is not None:
+            weights = np.abs(scores)
+            ids = np.flatnonzero(weights)
+            if k < len(ids):
+                ids = ids[np.argpartition(-weights[ids], k)[:k]]
+            ids = ids.tolist()
+        else:
+            weights = [abs(score) for score in scores]
+            ids = heapq.nlargest(
+                k,
+                (i for i, weight in enumerate(weights) if weight),
+                weights.__getitem__,
+            )
+        ids.sort(key=lambda i: (-weights[i], self.vocabulary[i]))
+        return [
+            (
+                self.vocabulary[i],
+                int(self.counts_a[i]),
+                int(self.counts_b[i]),
+                int(self.counts_b[i] - self.counts_a[i]),
+                float(ratios[i]),
+                float(scores[i]),
+            )
+            for i in ids
+        ]
@@ -0,0 +1,47 @@
+"""
+This module reads compressed .txt files (.txt.gz, .txt.bz2, .txt.xz)
+as a stream of decoded chunks, without writing the decompressed file to disk.
+"""
+
+import bz2
+import codecs
+import gzip
+import lzma
+
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+COMPRESSED_SUFFIXES = tuple(f".txt{suffix}" for suffix in COMPRESSED_OPENERS)
+
+
+def is_compressed_txt(path):
+    """Checks whether the path is a compressed .txt file."""
+    return str(path).endswith(COMPRESSED_SUFFIXES)
+
+
+def iter_compressed_chunks(path, chunk_size=1 << 20, digest=None):
+    """
+    Decompresses the file and yields the decoded text in chunks of about
+    chunk_size bytes that end on the end of a row, with newlines translated
+    like in a file opened in text mode. The decompressed bytes are also
+    fed to the digest, if given.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    rest = ""
+    with COMPRESSED_OPENERS[path.suffix](path, "rb") as file:
+        while True:
+            data = file.read(chunk_size)
+            if digest is not None:
+                digest.update(data)
+            text = rest + decoder.decode(data, final=not data)
+            if not data:
+                if text:
+                    yield normalize_newlines(text)
+                return
+            end = max(text.rfind("\n"), text.rfind("\r", 0, len(text) - 1)) + 1
+            if end:
+                yield normalize_newlines(text[:end])
+            rest = text[end:]
+
+
+def normalize_newlines(text):
+    """Translates \\r\\n and \\r to \\n."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
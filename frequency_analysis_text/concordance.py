@@ -0,0 +1,87 @@
+"""
+This module builds keyword-in-context (KWIC) concordances: every hit
+of a search with a window of tokens or characters around it. The windows
+are cut from the offsets of the hits in their rows, reading only a little
+more of the row than the window, so long rows are never printed whole.
+"""
+
+from frequency_analysis_text.tokenizer import TOKEN_PATTERN
+
+CONTEXT_UNITS = ("tokens", "chars")
+
+
+def clean(context):
+    """Returns the context with every run of whitespace made one space."""
+    return " ".join(context.split())
+
+
+def char_window(row, start, end, width):
+    """Returns the width characters of the row before start and after end."""
+    return row[max(start - width, 0) : start], row[end : end + width]
+
+
+def token_window(row, start, end, width):
+    """
+    Returns the parts of the row holding the width tokens before start
+    and after end. The row is read in growing slices around the hit.
+    """
+    if not width:
+        return "", ""
+    size = width * 16 + 16
+    while True:
+        low = max(start - size, 0)
+        tokens = list(TOKEN_PATTERN.finditer(row, low, start))
+        if len(tokens) > width or low == 0:
+            left = (
+                row[tokens[-min(width, len(tokens))].start() : start] if tokens else ""
+            )
+            break
+        size *= 2
+    size = width * 16 + 16
+    while True:
+        high = min(end + size, len(row))
+        tokens = list(TOKEN_PATTERN.finditer(row, end, high))
+        if len(tokens) > width or high == len(row):
+            right = (
+                row[end : tokens[min(width, len(tokens)) - 1].end()] if tokens else ""
+            )
+            break
+        size *= 2
+    return left, right
+
+
+def iter_concordance(found_rows, query, width=5, unit="tokens", terms=None):
+    """
+    Yields (row label, left context, hit, right context) for every hit
+    of the query in the (row label, row) pairs, lazily.
+    """
+    if unit not in CONTEXT_UNITS:
+        raise ValueError(
+            f"The context unit must be one of: {', '.join(CONTEXT_UNITS)}."
+        )
+    window = token_window if unit == "tokens" else char_window
+    for label, row in found_rows:
+        for start, end in query.iter_spans(row, terms):
+            left, right = window(row, start, end, width)
+            yield label, clean(left), row[start:end], clean(right)
+
+
+def sort_concordance(lines, by="left"):
+    """
+    Returns the concordance lines sorted by the words nearest to the hit
+    on the left or on the right, ignoring case.
+    """
+    if by == "left":
+        return sorted(
+            lines,
+            key=lambda line: (
+                TOKEN_PATTERN.findall(line[1].lower())[::-1],
+                line[2].lower(),
+            ),
+        )
+    if by == "right":
+        return sorted(
+            lines,
+            key=lambda line: (TOKEN_PATTERN.findall(line[3].lower()), line[2].lower()),
+        )
+    raise ValueError('Sort by "left" or "right".')
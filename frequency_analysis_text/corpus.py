@@ -0,0 +1,237 @@
+"""
+This module analyzes a corpus of many documents: it loads them in parallel,
+keeps one shared vocabulary and sparse per-document counts, and answers
+corpus-wide frequency questions.
+"""
+
+import heapq
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+
+from frequency_analysis_text.compressed_text import is_compressed_txt
+from frequency_analysis_text.functionality import AnalysisText
+from frequency_analysis_text.parallel_search import get_pool, get_workers
+from frequency_analysis_text.records import RECORD_SUFFIXES
+from frequency_analysis_text.search_index import Vocabulary
+
+CORPUS_SUFFIXES = (".txt", ".json", ".pkl", ".pickle", ".journal") + RECORD_SUFFIXES
+
+
+def count_document(path):
+    """
+    Loads one document with AnalysisText and returns its language and word counts.
+    """
+    obj_text = AnalysisText(path)
+    obj_text.load_file()
+    obj_text.update_result_counter()
+    return obj_text.language, dict(obj_text.result_counter.items())
+
+
+def find_corpus_files(source):
+    """
+    Returns the sorted files of a directory, of a glob pattern or a single file.
+    """
+    path = Path(source)
+    if path.is_dir():
+        files = path.rglob("*")
+    elif path.exists():
+        files = [path]
+    else:
+        files = Path().glob(str(source))
+    return sorted(
+        file
+        for file in files
+        if file.suffix in CORPUS_SUFFIXES or is_compressed_txt(file)
+    )
+
+
+class Corpus:
+    """
+    Word frequencies of many documents. Every document keeps sorted arrays
+    of word ids and counts, and every word keeps the array of documents
+    it occurs in.
+    """
+
+    def __init__(self):
+        """Initializes an empty corpus."""
+        self.paths = []
+        self.languages = []
+        self.vocabulary = []
+        self.word_ids = {}
+        self.doc_word_ids = []
+        self.doc_counts = []
+        self.totals = array("Q")
+        self.word_docs = []
+        self.errors = {}
+        self._vocabulary = None
+
+    def __len__(self):
+        """Returns the number of documents."""
+        return len(self.paths)
+
+    def get_word_id(self, word):
+        """Returns the id of the word, adding it to the vocabulary if needed."""
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.vocabulary)
+            word = sys.intern(word)
+            self.word_ids[word] = word_id
+            self.vocabulary.append(word)
+            self.totals.append(0)
+            self.word_docs.append(array("I"))
+        return word_id
+
+    def add_counts(self, path, language, counts):
+        """Adds the word counts of one document."""
+        doc_id = len(self.paths)
+        pairs = sorted(
+            (self.get_word_id(word), count) for word, count in counts.items()
+        )
+        word_ids = array("I", (word_id for word_id, _ in pairs))
+        doc_counts = array("I", (count for _, count in pairs))
+        for word_id, count in pairs:
+            self.totals[word_id] += count
+            self.word_docs[word_id].append(doc_id)
+        self.paths.append(str(path))
+        self.languages.append(language)
+        self.doc_word_ids.append(word_ids)
+        self.doc_counts.append(doc_counts)
+        self._vocabulary = None
+
+    def add_files(self, paths, workers=None):
+        """
+        Loads the documents, in the shared pool of the parallel search
+        if there are several workers. Files that cannot be loaded
+        are recorded in errors.
+        """
+        paths = [str(path) for path in paths]
+        loaded = len(self.paths)
+        errors = len(self.errors)
+        workers = get_workers(workers)
+        if workers == 1 or len(paths) < 2:
+            results = map(self.safe_count_document, paths)
+            for path, result in zip(paths, results):
+                self.add_result(path, result)
+        else:
+            executor = get_pool(workers)
+            futures = [executor.submit(count_document, path) for path in paths]
+            for path, future in zip(paths, futures):
+                try:
+                    self.add_result(path, future.result())
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    self.errors[path] = str(e) or type(e).__name__
+        return (
+            f"Documents loaded: {len(self.paths) - loaded},"
+            f" errors: {len(self.errors) - errors}."
+        )
+
+    @staticmethod
+    def safe_count_document(path):
+        """Counts a document, returning the exception instead of raising it."""
+        try:
+            return count_document(path)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            return e
+
+    def add_result(self, path, result):
+        """Adds the result of count_document or records the error."""
+        if isinstance(result, Exception):
+            self.errors[path] = str(result) or type(result).__name__
+        else:
+            self.add_counts(path, *result)
+
+    @property
+    def language(self):
+        """Returns the most common language of the documents."""
+        return Counter(self.languages).most_common(1)[0][0] if self.languages else None
+
+    def resolve(self, word, mode="default"):
+        """
+        Returns the ids of the vocabulary words matching the word in the mode
+        (default, case_sensitive, root, smart or fuzzy), like the search of AnalysisText.
+        """
+        _, _, query = AnalysisText.make_query(word, mode, self.language)
+        if self._vocabulary is None:
+            self._vocabulary = Vocabulary(self.word_ids)
+        return sorted(self.word_ids[term] for term in query.terms(self._vocabulary))
+
+    def top(self, k=10):
+        """Returns the k most frequent words of the corpus with their counts."""
+        ids = heapq.nlargest(
+            k, range(len(self.vocabulary)), key=self.totals.__getitem__
+        )
+        return [(self.vocabulary[word_id], self.totals[word_id]) for word_id in ids]
+
+    def count_in_document(self, doc_id, word_id):
+        """Returns the number of occurrences of the word in the document."""
+        word_ids = self.doc_word_ids[doc_id]
+        i = bisect_left(word_ids, word_id)
+        if i < len(word_ids) and word_ids[i] == word_id:
+            return self.doc_counts[doc_id][i]
+        return 0
+
+    def documents_with(self, word, mode="default"):
+        """
+        Returns a list of (path, count) of the documents containing the word,
+        sorted by count.
+        """
+        counts = Counter()
+        for word_id in self.resolve(word, mode):
+            for doc_id in self.word_docs[word_id]:
+                counts[doc_id] += self.count_in_document(doc_id, word_id)
+        return [(self.paths[doc_id], count) for doc_id, count in counts.most_common()]
+
+    def document_frequency(self, word, mode="default"):
+        """Returns the number of documents containing the word."""
+        doc_ids = set()
+        for word_id in self.resolve(word, mode):
+            doc_ids.update(self.word_docs[word_id])
+        return len(doc_ids)
+
+    def frequency(self, word, mode="default"):
+        """Returns the number of occurrences of the word in the corpus."""
+        return sum(self.totals[word_id] for word_id in self.resolve(word, mode))
+
+    def show_top(self, k=10):
+        """Generates a string with the most frequent words of the corpus."""
+        if not self.vocabulary:
+            return "The corpus is empty."
+        top = self.top(k)
+        width_1 = max(max(len(word) for word, _ in top), 4)
+        width_2 = max(max(len(str(count)) for _, count in top), 5)
+        res = f"Corpus: {len(self)} documents, {len(self.vocabulary)} words.\n\n"
+        res += f'{"word":^{width_1}}|{"count":^{width_2}}\n{"-" * (width_1 + width_2 + 1)}\n'
+        res += "\n".join(f"{word:^{width_1}}|{count:^{width_2}}" for word, count in top)
+        return res + "\n"
+
+    def load(self, source, workers=None):
+        """
+        Loads the documents of a directory, a glob pattern or a single file.
+        """
+        files = find_corpus_files(source)
+        if not files:
+            return (
+                "No .txt, .json, .pkl, .pickle, .journal, .jsonl, .csv"
+                " or compressed .txt files found."
+            )
+        return self.add_files(files, workers)
+
+    def show_word(self, word, mode="default"):
+        """Generates a string with the corpus statistics of the word."""
+        documents = self.documents_with(word, mode)
+        if not documents:
+            return f'"{word}" - not exist in corpus.'
+        width_1 = max(max(len(path) for path, _ in documents), 8)
+        width_2 = max(max(len(str(count)) for _, count in documents), 5)
+        res = (
+            f'"{word}": {self.frequency(word, mode)} occurrences'
+            f" in {len(documents)} of {len(self)} documents.\n\n"
+        )
+        res += f'{"document":^{width_1}}|{"count":^{width_2}}\n{"-" * (width_1 + width_2 + 1)}\n'
+        res += "\n".join(
+            f"{path:<{width_1}}|{count:^{width_2}}" for path, count in documents
+        )
+        return res + "\n"
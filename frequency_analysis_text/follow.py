@@ -0,0 +1,132 @@
+"""
+This module follows a text file that is still being written, like a log:
+it remembers the byte offset already read and reads only the data
+appended since, up to the last complete row. A file replaced by a new one
+(rotated) or cut shorter (truncated) is detected from its identity and size.
+"""
+
+import os
+import threading
+
+from frequency_analysis_text.compressed_text import normalize_newlines
+
+FOLLOW_INTERVAL = 2.0
+
+
+class FileRotatedError(Exception):
+    """An exception raised when the followed file was rotated or truncated."""
+
+    def __init__(self, path):
+        super().__init__(f"The file {path} was rotated or truncated.")
+        self.path = path
+
+    def __reduce__(self):
+        return self.__class__, (self.path,)
+
+
+class FileFollower:
+    """
+    The state of a followed file: its identity (device and inode)
+    and the offset of the first byte not read yet. Rows are read only
+    once they end with a newline, so a token is never cut in two.
+    """
+
+    def __init__(self, path, offset=None):
+        """
+        Starts following the file from the offset, by default from its end.
+        """
+        self.path = path
+        stat = os.stat(path)
+        self.identity = (stat.st_dev, stat.st_ino)
+        self.offset = stat.st_size if offset is None else offset
+
+    def is_rotated(self, stat):
+        """Checks whether the file was replaced or cut shorter than the offset."""
+        return (stat.st_dev, stat.st_ino) != self.identity or stat.st_size < self.offset
+
+    def read_new(self):
+        """
+        Returns the complete rows appended since the last read, decoded
+        and with Windows newlines normalized, or "" if there are none.
+        Rows that cannot be decoded are not skipped but read again next time.
+        Raises FileRotatedError if the file was rotated or truncated.
+        """
+        stat = os.stat(self.path)
+        if self.is_rotated(stat):
+            raise FileRotatedError(self.path)
+        if stat.st_size == self.offset:
+            return ""
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            data = file.read(stat.st_size - self.offset)
+        end = data.rfind(b"\n") + 1
+        tail = data[:end].decode("utf-8")
+        self.offset += end
+        return normalize_newlines(tail)
+
+    def restart(self):
+        """Follows the file now at the path from its start."""
+        stat = os.stat(self.path)
+        self.identity = (stat.st_dev, stat.st_ino)
+        self.offset = 0
+
+
+class FollowWorker:
+    """
+    Updates the analysis with the data appended to its file every interval
+    seconds on a timer thread, holding the lock while the analysis changes.
+    The callback receives the message of every update that found new rows
+    and of an error that stopped following.
+    """
+
+    def __init__(self, lock=None, callback=None):
+        """Initializes the worker with the lock shared with the caller."""
+        self.lock = threading.RLock() if lock is None else lock
+        self.callback = callback
+        self.interval = None
+        self._timer = None
+        self._generation = 0
+
+    def start(self, get_obj_text, interval=FOLLOW_INTERVAL):
+        """
+        Follows the file of the analysis returned by get_obj_text
+        until stop is called or the analysis stops following it.
+        """
+        self.stop()
+        self.interval = interval
+        generation = self._generation
+
+        def tick():
+            with self.lock:
+                obj_text = get_obj_text()
+                if (
+                    generation != self._generation
+                    or obj_text is None
+                    or not obj_text.following
+                ):
+                    return
+                try:
+                    mess = obj_text.update_from_file()
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    obj_text.following = False
+                    mess = f"Follow mode off: {e}"
+                else:
+                    self.schedule(tick)
+            if mess and self.callback is not None:
+                self.callback(mess)
+
+        self.schedule(tick)
+
+    def schedule(self, tick):
+        """Runs tick after the interval."""
+        self._timer = threading.Timer(self.interval, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop(self):
+        """Stops following."""
+        self._generation += 1
+        self.interval = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -1,7 +1,7 @@
 """
 This module is designed for text analysis from various file formats
-(.txt, .json, .pkl, .pickle), including searching, replacing words,
-and saving and loading data.
+(.txt, .json, .pkl, .pickle, .journal, compressed .txt, .jsonl and .csv),
+including searching, replacing words, and saving and loading data.
 """
 
 import pickle
@@ -9,11 +9,44 @@ from pathlib import Path
 from collections import Counter
 import copy
 import datetime
+from itertools import islice
 import re
 import json
+import threading
+from contextlib import contextmanager
 import pymorphy2
 from nltk.stem import SnowballStemmer
 import langid
+from frequency_analysis_text.analysis_cache import AnalysisCache
+from frequency_analysis_text.compare import MEASURES, Comparison
+from frequency_analysis_text.compressed_text import (
+    is_compressed_txt,
+    iter_compressed_chunks,
+    normalize_newlines,
+)
+from frequency_analysis_text.concordance import iter_concordance, sort_concordance
+from frequency_analysis_text.follow import FileFollower, FileRotatedError
+from frequency_analysis_text.fuzzy import FUZZY_DISTANCE, MAX_FUZZY_DISTANCE
+from frequency_analysis_text.journal import Journal
+from frequency_analysis_text.lemmas import count_lemmas
+from frequency_analysis_text.mapped_text import MappedText
+from frequency_analysis_text.memory import CompactCounter, memory_report
+from frequency_analysis_text.metrics import Metrics
+from frequency_analysis_text.persistence import atomic_write
+from frequency_analysis_text.ngrams import count_ngrams
+from frequency_analysis_text.parallel_search import search_rows
+from frequency_analysis_text.records import RECORD_SUFFIXES, RecordFile
+from frequency_analysis_text.search_index import TextIndex, Vocabulary
+from frequency_analysis_text.stopwords import STOPWORDS, TokenFilter
+from frequency_analysis_text.token_array import HAS_NUMPY, TokenArray
+from frequency_analysis_text.versions import TextVersion
+from frequency_analysis_text.tokenizer import (
+    NEAR_PATTERN,
+    TOKEN_PATTERN,
+    PhraseQuery,
+    TokenQuery,
+    replace_spans,
+)
 
 
 class InvalidFileFormatError(Exception):
@@ -24,6 +57,9 @@ class InvalidFileFormatError(Exception):
     def __init__(self):
         super().__init__("Invalid file format.")
 
+    def __reduce__(self):
+        return self.__class__, ()
+
 
 class EmptyFileError(Exception):
     """An exception raised when the file does not contain words or numbers."""
@@ -31,12 +67,23 @@ class EmptyFileError(Exception):
     def __init__(self):
         super().__init__("The file does not contain words or numbers.")
 
+    def __reduce__(self):
+        return self.__class__, ()
+
 
 class ProgramState:
-    """Stores the state of the program, determining whether a new file needs to be loaded."""
+    """
+    Stores the state of the program, determining whether a new file needs
+    to be loaded, the worker saving the analysis in the background
+    and the worker following its file.
+    """
 
-    def __init__(self):
+    def __init__(self, persistence=None, follow=None):
         self.enter_new_file = True
+        self.corpus = None
+        self.obj_text = None
+        self.persistence = persistence
+        self.follow = follow
 
     def new_file(self):
         """
@@ -49,30 +96,122 @@ class ProgramState:
 class AnalysisText:
     """A class representing text analysis."""
 
-    def __init__(self, path):
-        """Initializes with the path to the file."""
+    __slots__ = (
+        "path",
+        "metrics",
+        "memory_lean",
+        "use_mmap",
+        "mapped_text",
+        "cache",
+        "cache_key",
+        "counted_text",
+        "text_field",
+        "id_field",
+        "record_ids",
+        "row_labels",
+        "use_numpy",
+        "token_array",
+        "token_filter",
+        "follower",
+        "following",
+        "journal",
+        "journal_edits",
+        "new_file",
+        "root_mode",
+        "case_sensitive",
+        "smart_mode",
+        "fuzzy_mode",
+        "fuzzy_distance",
+        "last_search_key",
+        "last_query",
+        "version",
+        "write_lock",
+        "support_language",
+        "old_text",
+        "text",
+        "result_counter",
+        "lemma_counter",
+        "ngram_counter",
+        "ngram_size",
+        "datetime_created",
+        "language",
+        "search_cache",
+        "search_cache_keys",
+        "text_index",
+        "history",
+        "redo_stack",
+    )
+
+    def __init__(
+        self,
+        path,
+        collect_metrics=False,
+        memory_lean=False,
+        use_mmap=False,
+        cache: AnalysisCache = None,
+        text_field="text",
+        id_field=None,
+        use_numpy=False,
+        token_filter: TokenFilter = None,
+    ):
+        """
+        Initializes with the path to the file. With use_mmap a .txt file
+        is mapped to memory for read-only analysis. With a cache the analysis
+        of a .txt file is reused when the same content is opened again.
+        The text of a .jsonl or .csv record is taken from text_field,
+        and search results name records by id_field or by their number.
+        With use_numpy words are counted on an array of token ids,
+        if NumPy is installed. The tokens left out by the token filter
+        are not counted or indexed.
+        """
         self.path = Path(path)
+        self.metrics = Metrics(collect_metrics)
+        self.memory_lean = memory_lean
+        self.use_mmap = use_mmap
+        self.mapped_text = None
+        self.cache = cache
+        self.cache_key = None
+        self.counted_text = None
+        self.text_field = text_field
+        self.id_field = id_field
+        self.record_ids = None
+        self.row_labels = None
+        self.use_numpy = use_numpy and HAS_NUMPY
+        self.token_array = None
+        self.token_filter = token_filter if token_filter else None
+        self.follower = None
+        self.following = False
+        self.journal = None
+        self.journal_edits = []
         self.new_file = False
         self.root_mode = False
         self.case_sensitive = False
         self.smart_mode = False
+        self.fuzzy_mode = False
+        self.fuzzy_distance = FUZZY_DISTANCE
         self.last_search_key = None
-        self.last_pattern = None
+        self.last_query = None
+        self.version = None
+        self.write_lock = threading.RLock()
         self.support_language = ("uk", "ru", "en")
         self.old_text = None
         self.text = None
         self.result_counter = None
+        self.lemma_counter = None
+        self.ngram_counter = None
+        self.ngram_size = None
         self.datetime_created = None
         self.language = None
         self.search_cache = {}
         self.search_cache_keys = []
+        self.text_index = None
 
         self.history = []
         self.redo_stack = []
 
     def root_mode_on(self):
         """
-        Enables root mode and disables smart mode and case sensitivity.
+        Enables root mode and disables smart mode, case sensitivity and fuzzy mode.
         """
         self.root_mode = True
         mess = (
@@ -81,7 +220,7 @@ class AnalysisText:
         )
         self.smart_mode = False
         self.case_sensitive = False
-        return mess
+        return self.fuzzy_mode_off_for(mess)
 
     def root_mode_off(self):
         """
@@ -98,13 +237,13 @@ class AnalysisText:
 
     def case_sens_on(self):
         """
-        Enables case sensitivity and disables smart mode and root mode.
+        Enables case sensitivity and disables smart mode, root mode and fuzzy mode.
         """
         self.case_sensitive = True
         mess = f'Case sensitive on{", smart mode off, root mode off." if self.smart_mode or self.root_mode else "."}'
         self.smart_mode = False
         self.root_mode = False
-        return mess
+        return self.fuzzy_mode_off_for(mess)
 
     def case_sens_off(self):
         """
@@ -131,7 +270,7 @@ class AnalysisText:
             )
             self.case_sensitive = False
             self.root_mode = False
-            return mess
+            return self.fuzzy_mode_off_for(mess)
         return (
             f"At the moment the Smart mode only supports {self.support_language} languages,"
             f" your text is in the {self.language} language."
@@ -150,12 +289,319 @@ class AnalysisText:
         """
         return f'Smart mode: {"on." if self.smart_mode else "off."}'
 
+    def fuzzy_mode_on(self, args=""):
+        """
+        Enables fuzzy mode, which finds the words within the edit distance
+        given in args (2 by default) of the searched word, and disables
+        the other search modes.
+        """
+        try:
+            distance = int(args) if args.strip() else FUZZY_DISTANCE
+        except ValueError:
+            distance = 0
+        if not 1 <= distance <= MAX_FUZZY_DISTANCE:
+            return f"Enter the edit distance from 1 to {MAX_FUZZY_DISTANCE}."
+        self.fuzzy_distance = distance
+        mess = (
+            f"Fuzzy mode on, edit distance {distance}"
+            f'{", case sensitive off, smart mode off, root mode off." if self.case_sensitive or self.smart_mode or self.root_mode else "."}'
+        )
+        self.fuzzy_mode = True
+        self.case_sensitive = False
+        self.smart_mode = False
+        self.root_mode = False
+        return mess
+
+    def fuzzy_mode_off(self):
+        """
+        Disables fuzzy mode.
+        """
+        self.fuzzy_mode = False
+        return "Fuzzy mode off."
+
+    def show_fuzzy_mode(self):
+        """
+        Returns a string showing the status of fuzzy mode.
+        """
+        if self.fuzzy_mode:
+            return f"Fuzzy mode: on, edit distance {self.fuzzy_distance}."
+        return "Fuzzy mode: off."
+
+    def fuzzy_mode_off_for(self, mess):
+        """
+        Disables fuzzy mode when another search mode is enabled,
+        adding it to the message of that mode.
+        """
+        if not self.fuzzy_mode:
+            return mess
+        self.fuzzy_mode = False
+        return f"{mess[:-1]}, fuzzy mode off."
+
+    def memory_lean_on(self):
+        """
+        Enables the memory-lean mode and compacts the loaded data.
+        """
+        self.memory_lean = True
+        self.compact()
+        return "Memory-lean mode on."
+
+    def memory_lean_off(self):
+        """
+        Disables the memory-lean mode.
+        """
+        self.memory_lean = False
+        if isinstance(self.result_counter, CompactCounter):
+            self.result_counter = dict(self.result_counter.items())
+        self.text_index = None
+        return "Memory-lean mode off."
+
+    def show_memory_lean(self):
+        """
+        Returns a string showing the status of the memory-lean mode.
+        """
+        return f'Memory-lean mode: {"on." if self.memory_lean else "off."}'
+
+    def follow_on(self):
+        """
+        Enables follow mode: update_from_file adds the rows appended
+        to the .txt file since it was loaded.
+        """
+        if self.follower is None:
+            return "Only a loaded .txt file can be followed."
+        self.load_mapped_text()
+        self.following = True
+        return "Follow mode on."
+
+    def follow_off(self):
+        """
+        Disables follow mode.
+        """
+        self.following = False
+        return "Follow mode off."
+
+    def show_follow(self):
+        """
+        Returns a string showing the status of follow mode.
+        """
+        return f'Follow mode: {"on." if self.following else "off."}'
+
+    def update_from_file(self):
+        """
+        Adds the rows appended to the followed file since the last update.
+        A rotated or truncated file is read again from its start. Returns
+        the message of the update, or None if nothing changed.
+        """
+        if not self.following:
+            return None
+        rotated = False
+        try:
+            try:
+                tail = self.follower.read_new()
+            except FileRotatedError:
+                self.follower.restart()
+                rotated = True
+                tail = self.follower.read_new()
+        except (OSError, ValueError) as e:
+            self.following = False
+            return f"Follow mode off: {e}"
+        if tail:
+            self.append_text(tail)
+            self.record_edit(("append", tail))
+        n_rows = tail.count("\n")
+        mess = f"Rows added: {n_rows}."
+        if rotated:
+            return (
+                f"The file was rotated or truncated, reading it from the start. {mess}"
+            )
+        return mess if tail else None
+
+    def append_text(self, tail):
+        """
+        Appends the text to the original and the current text, and to
+        the texts in the history and the redo stack, so an undo keeps it.
+        The index and the counts are updated from the new rows only,
+        and the last row if the text continues it.
+        """
+        with self.metrics.timer("append"):
+            previous = self.text
+            counted = self.result_counter is not None and self.counted_text is previous
+            if self.text_index is not None and self.text_index.text is previous:
+                self.text_index = TextIndex.extended(self.text_index, tail)
+                self.text = self.text_index.text
+            else:
+                self.text = previous + tail
+            self.old_text = (
+                self.text if previous is self.old_text else self.old_text + tail
+            )
+            self.history = [text + tail for text in self.history]
+            self.redo_stack = [text + tail for text in self.redo_stack]
+            self.token_array = None
+            self.search_cache, self.search_cache_keys = {}, []
+            if counted:
+                last_row = ""
+                if previous[-1:] != "\n" and tail[:1] != "\n":
+                    last_row = previous[previous.rfind("\n") + 1 :]
+                counts = TextIndex.count_words(last_row + tail, self.get_skip())
+                counts.subtract(TextIndex.count_words(last_row, self.get_skip()))
+                self.add_counts(counts)
+                self.counted_text = self.text
+
+    def add_counts(self, counts):
+        """
+        Adds the changes of the word counts to the result counter, in place
+        if no word is added, keeping it sorted by word.
+        """
+        self.lemma_counter = None
+        if self.token_filter is not None and (
+            self.token_filter.min_count > 1 or self.token_filter.max_count is not None
+        ):
+            self.set_result_counter(self.get_text_index().counts())
+            return
+        counter = self.result_counter
+        if self.memory_lean:
+            counter = dict(counter.items())
+        new_words = {}
+        for word, count in counts.items():
+            total = counter.get(word, 0) + count
+            if word not in counter:
+                if total > 0:
+                    new_words[word] = total
+            elif total > 0:
+                counter[word] = total
+            else:
+                del counter[word]
+        if self.memory_lean:
+            self.result_counter = CompactCounter.from_counts({**counter, **new_words})
+        elif new_words:
+            self.result_counter = dict(sorted([*counter.items(), *new_words.items()]))
+
+    def stopwords_on(self, args=""):
+        """
+        Leaves the stopwords of the language of the text and the words
+        in args out of the counter and the index.
+        """
+        words = STOPWORDS.get(self.language, frozenset()).union(
+            re.split(r"[\s,]+", args.strip().lower()) if args.strip() else ()
+        )
+        if not words:
+            return (
+                f"There are no stopwords for the {self.language} language,"
+                f" enter your own, e.g. the, and."
+            )
+        token_filter = self.token_filter or TokenFilter()
+        self.set_token_filter(
+            TokenFilter(words, token_filter.min_count, token_filter.max_count)
+        )
+        return f"Stopwords on: {len(words)} words."
+
+    def stopwords_off(self):
+        """
+        Counts and indexes the stopwords again.
+        """
+        token_filter = self.token_filter or TokenFilter()
+        self.set_token_filter(
+            TokenFilter((), token_filter.min_count, token_filter.max_count)
+        )
+        return "Stopwords off."
+
+    def set_count_range(self, args=""):
+        """
+        Leaves the words counted fewer times than the minimum or more times
+        than the maximum in args, e.g. "2" or "2 100", out of the counter.
+        """
+        params = args.split()
+        try:
+            min_count = int(params[0]) if params else 1
+            max_count = int(params[1]) if len(params) > 1 else None
+        except ValueError:
+            min_count, max_count = 0, None
+        if min_count < 1 or (max_count is not None and max_count < min_count):
+            return "Enter the minimum and the maximum count as numbers, e.g. 2 100."
+        stopwords = self.token_filter.stopwords if self.token_filter else ()
+        self.set_token_filter(TokenFilter(stopwords, min_count, max_count))
+        if max_count is None:
+            return f"Count range: at least {min_count}."
+        return f"Count range: {min_count} to {max_count}."
+
+    def show_filters(self):
+        """
+        Returns a string showing the filters of the counted tokens.
+        """
+        return f"Filters: {self.token_filter or 'off'}."
+
+    def set_token_filter(self, token_filter):
+        """
+        Sets the filter of the counted and indexed tokens. The text is counted
+        and indexed again on demand and the search cache is cleared.
+        """
+        self.token_filter = token_filter if token_filter else None
+        self.result_counter = None
+        self.lemma_counter = None
+        self.counted_text = None
+        self.text_index = None
+        self.token_array = None
+        self.search_cache = {}
+        self.search_cache_keys = []
+        self.last_query = None
+        self.last_search_key = None
+
+    def compact(self):
+        """
+        Shares equal texts and stores the counter and the index compactly.
+        """
+        if self.text is not self.old_text and self.text == self.old_text:
+            self.text = self.old_text
+        if self.result_counter is not None and not isinstance(
+            self.result_counter, CompactCounter
+        ):
+            self.result_counter = CompactCounter.from_counts(self.result_counter)
+        self.text_index = None
+        self.token_array = None
+
+    def show_memory(self):
+        """
+        Returns the report of the memory used by the analysis components.
+        """
+        return memory_report(
+            [
+                ("old_text", self.old_text),
+                ("text", self.text),
+                ("result_counter", self.result_counter),
+                ("lemma_counter", self.lemma_counter),
+                ("text_index", self.text_index),
+                ("token_array", self.token_array),
+                ("search_cache", (self.search_cache, self.search_cache_keys)),
+                ("history", self.history),
+                ("redo_stack", self.redo_stack),
+                ("metrics", self.metrics),
+            ]
+        )
+
     def show_user_text(self):
         """
         Returns the current text.
         """
+        if self.mapped_text is not None:
+            return self.mapped_text.read_text()
         return self.text
 
+    def load_mapped_text(self):
+        """
+        Decodes the mapped file and switches to the in-memory text,
+        which is required before the text is edited or saved. The ids
+        of the records of a record file are kept, one per row.
+        """
+        if self.mapped_text is not None:
+            if isinstance(self.mapped_text, RecordFile):
+                records = list(self.mapped_text.iter_records())
+                self.record_ids = [record_id for record_id, _ in records]
+                self.old_text = "".join(f"{row}\n" for _, row in records)
+            else:
+                self.old_text = self.mapped_text.read_text()
+            self.text = self.old_text
+            self.mapped_text.close()
+            self.mapped_text = None
+
     def restart_user_text(self):
         """
         Restarts the text if it differs from the original.
@@ -163,6 +609,7 @@ class AnalysisText:
         if self.text != self.old_text:
             self.save_state()
             self.text = self.old_text
+            self.record_edit(("restart",))
             return "Text restarted."
         return "The text is not restarted because it is already equal to the original text."
 
@@ -180,6 +627,10 @@ class AnalysisText:
             obj = pickle.load(file)
             self.old_text = obj.old_text
             self.result_counter = copy.copy(obj.result_counter)
+            self.lemma_counter = obj.lemma_counter
+            self.record_ids = obj.record_ids
+            self.ngram_counter = copy.copy(obj.ngram_counter)
+            self.ngram_size = obj.ngram_size
             self.datetime_created = obj.datetime_created
             self.language = obj.language
             self.text = obj.text
@@ -189,6 +640,7 @@ class AnalysisText:
             )
             self.history = copy.copy(obj.history)
             self.redo_stack = copy.copy(obj.redo_stack)
+            self.token_filter = obj.token_filter
 
     def load_json_file(self, for_gui):
         """
@@ -198,11 +650,15 @@ class AnalysisText:
             data = json.load(file)
             self.old_text = data["old_text"]
             self.result_counter = copy.copy(data["result_counter"])
+            self.lemma_counter = data.get("lemma_counter")
+            self.record_ids = data.get("record_ids")
+            self.ngram_counter = data.get("ngram_counter")
+            self.ngram_size = data.get("ngram_size")
             self.datetime_created = datetime.datetime.strptime(
                 data["datetime_created"], "%Y-%m-%d %H:%M:%S.%f"
             )
             self.language = data["language"]
-            self.text = data["text"]
+            self.text = self.old_text if data["text"] == self.old_text else data["text"]
             self.search_cache = (
                 copy.deepcopy(data["search_cache"]) if not for_gui else {}
             )
@@ -211,80 +667,430 @@ class AnalysisText:
             )
             self.history = copy.copy(data["history"])
             self.redo_stack = copy.copy(data["redo_stack"])
+            if data.get("token_filter"):
+                self.token_filter = TokenFilter(**data["token_filter"])
+
+    def load_journal_file(self, for_gui):
+        """
+        Loads data from a .journal file, replaying the saved edits
+        on its base state. Later journal saves append to the same file.
+        """
+        journal = Journal(self.path)
+        state, edits = journal.read()
+        for name, value in state.items():
+            setattr(self, name, value)
+        if self.text == self.old_text:
+            self.text = self.old_text
+        if for_gui:
+            self.search_cache, self.search_cache_keys = {}, []
+        for edit in edits:
+            self.apply_edit(edit)
+        self.journal = journal
 
     def load_txt_file(self):
         """
-        Loads data from a .txt file.
+        Loads data from a .txt file, remembering how much of it was read
+        to follow it later.
         """
         self.new_file = True
-        with open(self.path, "r", encoding="utf-8") as file:
-            self.old_text = file.read()
+        if is_compressed_txt(self.path):
+            self.load_compressed_txt_file()
+            return
+        if self.use_mmap:
+            self.mapped_text = MappedText(self.path)
+            self.follower = FileFollower(self.path, len(self.mapped_text.data))
+            if self.cache is not None:
+                self.cache_key = self.cache.make_key(self.mapped_text.data)
+            return
+        with open(self.path, "rb") as file:
+            data = file.read()
+        self.follower = FileFollower(self.path, len(data))
+        if self.cache is not None:
+            self.cache_key = self.cache.make_key(data)
+        self.old_text = normalize_newlines(data.decode("utf-8"))
+
+    def load_records_file(self):
+        """
+        Opens a .jsonl or .csv file, whose records are read as a stream.
+        """
+        self.new_file = True
+        self.mapped_text = RecordFile(self.path, self.text_field, self.id_field)
+
+    def load_compressed_txt_file(self):
+        """
+        Loads data from a .txt.gz, .txt.bz2 or .txt.xz file, counting words
+        while the file is decompressed.
+        """
+        digest = AnalysisCache.new_digest() if self.cache is not None else None
+        counter_text = Counter()
+        chunks = []
+        for chunk in iter_compressed_chunks(self.path, digest=digest):
+            counter_text.update(TOKEN_PATTERN.findall(chunk))
+            chunks.append(chunk)
+        self.old_text = "".join(chunks)
+        if digest is not None:
+            self.cache_key = digest.hexdigest()
+        self.set_result_counter(counter_text)
+        self.counted_text = self.old_text
 
     def load_file(self, for_gui=False):
         """Loads the text from the file."""
         suffix = self.path.suffix
-        if suffix in (".pkl", ".pickle"):
-            self.load_pickle_file(for_gui)
-        elif suffix == ".json":
-            self.load_json_file(for_gui)
-        elif suffix == ".txt":
-            self.load_txt_file()
-            self.analyze_txt_file()
-        else:
-            raise InvalidFileFormatError
+        if is_compressed_txt(self.path):
+            suffix = "".join(self.path.suffixes[-2:])
+        with self.metrics.timer("load", format=suffix):
+            if suffix in (".pkl", ".pickle"):
+                self.load_pickle_file(for_gui)
+            elif suffix == ".json":
+                self.load_json_file(for_gui)
+            elif suffix == ".journal":
+                self.load_journal_file(for_gui)
+            elif suffix == ".txt" or is_compressed_txt(self.path):
+                self.load_txt_file()
+                self.analyze_txt_file()
+            elif suffix in RECORD_SUFFIXES:
+                self.load_records_file()
+                self.analyze_txt_file()
+            else:
+                raise InvalidFileFormatError
+            if self.memory_lean:
+                self.compact()
 
     def update_result_counter(self):
         """
         Updates the result counter with word and number frequencies.
         """
-        pattern = r"\b\w+(?:[-']\w+)*\b|\b\d*\.\d+\b|\b\d+\b"
-        counter_text = Counter(re.findall(pattern, self.text))
+        if self.result_counter is not None and (
+            self.mapped_text is not None
+            or (self.text is not None and self.counted_text is self.text)
+        ):
+            return
+        with self.metrics.timer("count"):
+            if self.mapped_text is not None:
+                counter_text = Counter()
+                for chunk in self.mapped_text.iter_chunks():
+                    counter_text.update(TOKEN_PATTERN.findall(chunk))
+            elif self.use_numpy:
+                counter_text = self.get_token_array().to_dict()
+            else:
+                counter_text = self.get_text_index().counts()
+            self.set_result_counter(counter_text)
+            self.counted_text = self.text
+
+    def set_result_counter(self, counter_text):
+        """
+        Sets the result counter from a Counter of words and numbers.
+        The lemma counter is kept only if the counts did not change.
+        """
         if not counter_text:
             raise EmptyFileError
-        self.result_counter = dict(
-            sorted(counter_text.items(), key=lambda item: item[0])
+        if self.token_filter is not None:
+            counter_text = self.token_filter.apply(counter_text)
+        if self.result_counter is None or self.result_counter != counter_text:
+            self.lemma_counter = None
+        if self.memory_lean:
+            self.result_counter = CompactCounter.from_counts(counter_text)
+        else:
+            self.result_counter = dict(
+                sorted(counter_text.items(), key=lambda item: item[0])
+            )
+
+    def update_lemma_counter(self):
+        """
+        Updates the counter of the lemmas of the counted words,
+        which smart mode shows instead of the word forms.
+        """
+        self.update_result_counter()
+        if self.lemma_counter is None:
+            with self.metrics.timer("count_lemmas", language=self.language):
+                self.lemma_counter = count_lemmas(self.result_counter, self.language)
+
+    def get_shown_counter(self):
+        """
+        Returns the counter of the results, of the lemmas in smart mode,
+        and the name of its keys.
+        """
+        if self.smart_mode:
+            self.update_lemma_counter()
+            return self.lemma_counter, "lemma"
+        self.update_result_counter()
+        return self.result_counter, "word"
+
+    def update_ngram_counter(self, n=2, min_count=1):
+        """
+        Updates the counter of n-grams of words.
+        """
+        with self.metrics.timer("count_ngrams", n=n):
+            chunks = (
+                self.mapped_text.iter_chunks()
+                if self.mapped_text is not None
+                else (self.text,)
+            )
+            self.ngram_counter = count_ngrams(chunks, n, min_count)
+            self.ngram_size = n
+
+    def show_ngrams(self, args=""):
+        """
+        Counts n-grams and generates a string with the results.
+        The arguments are the n-gram size and the minimum count, e.g. "2 3".
+        """
+        params = args.split()
+        try:
+            n = int(params[0]) if params else 2
+            min_count = int(params[1]) if len(params) > 1 else 1
+            self.update_ngram_counter(n, min_count)
+        except ValueError:
+            return "Enter the n-gram size and the minimum count as numbers, e.g. 2 3."
+        if not self.ngram_counter:
+            return "No n-grams found."
+        width_1 = max(max(len(ngram) for ngram in self.ngram_counter), 5)
+        width_2 = max(max(len(str(num)) for num in self.ngram_counter.values()), 5)
+        res = f"{n}-gram Results:\n\n"
+        res += f'{"ngram":^{width_1}}|{"count":^{width_2}}\n{"-" * (width_1 + width_2 + 1)}\n'
+        res += "\n".join(
+            f"{ngram:^{width_1}}|{count:^{width_2}}"
+            for ngram, count in self.ngram_counter.items()
         )
+        return res + "\n"
 
     def analyze_txt_file(self):
         """Analyzes the text to determine word and number frequencies."""
-        if self.new_file:
-            self.datetime_created = datetime.datetime.now()
-            self.language, _ = langid.classify(self.old_text)
-            self.text = self.old_text
+        with self.metrics.timer("analyze"):
+            if self.new_file:
+                self.datetime_created = datetime.datetime.now()
+                self.text = self.old_text
+                if self.load_from_cache():
+                    return
+                self.language, _ = langid.classify(
+                    self.mapped_text.sample()
+                    if self.mapped_text is not None
+                    else self.old_text
+                )
+                if self.cache is not None:
+                    self.update_result_counter()
+                    self.save_to_cache()
+
+    def load_from_cache(self):
+        """
+        Loads the language, the counter and the index of the text from the cache.
+        Returns True on a cache hit.
+        """
+        if self.cache is None or self.cache_key is None:
+            return False
+        entry = self.cache.get(self.cache_key)
+        self.metrics.count("analysis_cache", result="miss" if entry is None else "hit")
+        if entry is None:
+            return False
+        self.language = entry["language"]
+        self.result_counter = entry["result_counter"]
+        postings = entry["postings"]
+        if self.token_filter is not None:
+            self.set_result_counter(self.result_counter)
+            if postings is not None:
+                postings = {
+                    token: rows
+                    for token, rows in postings.items()
+                    if not self.token_filter.skip(token)
+                }
+        self.counted_text = self.text
+        if postings is not None and self.text is not None:
+            self.text_index = TextIndex(
+                self.text, self.memory_lean, postings, skip=self.get_skip()
+            )
+        return True
+
+    def save_to_cache(self):
+        """
+        Stores the language, the counter and the index of the original text in the cache.
+        """
+        if (
+            self.cache is None
+            or self.cache_key is None
+            or self.text is not self.old_text
+            or self.token_filter is not None
+        ):
+            return
+        index = self.text_index
+        self.cache.put(
+            self.cache_key,
+            {
+                "language": self.language,
+                "result_counter": dict(self.result_counter.items()),
+                "postings": (
+                    index.postings
+                    if index is not None and index.text is self.old_text
+                    else None
+                ),
+            },
+        )
+
+    def __getstate__(self):
+        """
+        Excludes the text index and the token array, they are rebuilt on demand,
+        and the files the analysis is attached to or follows, the published
+        version and the lock of the writers.
+        """
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state["text_index"] = None
+        state["token_array"] = None
+        state["mapped_text"] = None
+        state["row_labels"] = None
+        state["cache"] = None
+        state["journal"] = None
+        state["journal_edits"] = []
+        state["follower"] = None
+        state["following"] = False
+        del state["version"], state["write_lock"]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the state, including objects pickled before
+        some of the attributes existed.
+        """
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        state.pop("last_pattern", None)
+        AnalysisText.__init__(self, state["path"])
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def save_file_to_pickle(self):
         """
         Saves analysis results to a .pkl or .pickle file.
         """
-        path, mess = self.get_path_to_save(".pkl")
-        with open(path, "wb") as file:
-            pickle.dump(self, file)
-        return mess
+        self.load_mapped_text()
+        with self.metrics.timer("save", format="pickle"):
+            path, mess = self.get_path_to_save(".pkl")
+            with atomic_write(path) as file:
+                pickle.dump(self, file)
+            return mess
 
     def save_file_to_json(self):
         """
         Saves analysis results to a .json file.
         """
-        data = {
+        self.load_mapped_text()
+        with self.metrics.timer("save", format="json"):
+            data = self.get_saved_state()
+            data["datetime_created"] = self.datetime_created.strftime(
+                "%Y-%m-%d %H:%M:%S.%f"
+            )
+            if self.token_filter is not None:
+                data["token_filter"] = {
+                    "stopwords": sorted(self.token_filter.stopwords),
+                    "min_count": self.token_filter.min_count,
+                    "max_count": self.token_filter.max_count,
+                }
+            path, mess = self.get_path_to_save(".json")
+            with atomic_write(path, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False, indent=4)
+            return mess
+
+    def snapshot(self, for_journal=False):
+        """
+        Returns a copy of the analysis to be saved in the background.
+        The texts and the n-gram counter are shared, since they are replaced
+        rather than changed; the result counter, which follow mode updates
+        in place, the history, the redo stack and the search cache are
+        copied. For a journal save the copy takes over the journal
+        and the edits recorded since the last save.
+        """
+        self.load_mapped_text()
+        snapshot = copy.copy(self)
+        snapshot.history = list(self.history)
+        snapshot.redo_stack = list(self.redo_stack)
+        snapshot.search_cache = dict(self.search_cache)
+        snapshot.search_cache_keys = list(self.search_cache_keys)
+        if isinstance(self.result_counter, dict):
+            snapshot.result_counter = dict(self.result_counter)
+        if for_journal:
+            if self.journal is None:
+                self.journal = Journal(self.get_path_to_save(".journal")[0])
+            snapshot.journal = self.journal
+            snapshot.journal_edits = self.journal_edits
+            self.journal_edits = []
+        return snapshot
+
+    def get_saved_state(self):
+        """
+        Returns a dict of the attributes saved to a .json or .journal file.
+        """
+        return {
             "old_text": self.old_text,
-            "result_counter": self.result_counter,
-            "datetime_created": self.datetime_created.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "result_counter": (
+                dict(self.result_counter.items())
+                if self.result_counter is not None
+                else None
+            ),
+            "lemma_counter": self.lemma_counter,
+            "record_ids": self.record_ids,
+            "ngram_counter": self.ngram_counter,
+            "ngram_size": self.ngram_size,
+            "datetime_created": self.datetime_created,
             "language": self.language,
             "text": self.text,
             "search_cache": self.search_cache,
             "search_cache_keys": self.search_cache_keys,
             "history": self.history,
             "redo_stack": self.redo_stack,
+            "token_filter": self.token_filter,
         }
-        path, mess = self.get_path_to_save(".json")
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
-        return mess
+
+    def save_file_to_journal(self):
+        """
+        Saves analysis results to a .journal file. The first save writes
+        the whole state, later saves append only the edits made since
+        the previous save, until the journal is compacted into a new base.
+        """
+        self.load_mapped_text()
+        with self.metrics.timer("save", format="journal"):
+            if self.journal is None:
+                self.journal = Journal(self.get_path_to_save(".journal")[0])
+            if not self.journal.base_size:
+                self.journal.write_base(self.get_saved_state())
+            else:
+                if self.journal_edits:
+                    self.journal.append(self.journal_edits)
+                if self.journal.needs_compaction():
+                    self.journal.write_base(self.get_saved_state())
+            self.journal_edits = []
+            return "File save to journal."
+
+    def record_edit(self, edit):
+        """Records an edit operation for the next journal save."""
+        if self.journal is not None:
+            self.journal_edits.append(edit)
+
+    def apply_edit(self, edit):
+        """Repeats an edit operation read from a journal."""
+        kind, *args = edit
+        if kind == "replace":
+            changes, new_word, terms = args
+            self.save_state()
+            rows = self.text.split("\n")
+            for i, spans in changes:
+                rows[i] = replace_spans(rows[i], spans, new_word)
+            self.text = "\n".join(rows)
+            self.update_cache(terms)
+        elif kind == "undo":
+            self.undo()
+        elif kind == "redo":
+            self.redo()
+        elif kind == "restart":
+            self.restart_user_text()
+        elif kind == "append":
+            self.append_text(*args)
 
     def get_path_to_save(self, suffix):
         """Saves the analysis results to a file."""
         file_name = self.path.stem
         old_suffix = self.path.suffix
+        if is_compressed_txt(self.path):
+            file_name = Path(file_name).stem
+            old_suffix = ".txt"
+        elif old_suffix in RECORD_SUFFIXES:
+            old_suffix = ".txt"
         if old_suffix == ".txt":
             path = f"{self.datetime_created.date()}_{file_name}_000{suffix}"
         else:
@@ -296,10 +1102,8 @@ class AnalysisText:
             else:
                 path = f"{file_name[:-3]}{count:03}{suffix}"
             count += 1
-        return (
-            path,
-            f'File save to {"pickle" if suffix in (".pkl", ".pickle") else "json"}.',
-        )
+        file_format = {".pkl": "pickle", ".pickle": "pickle", ".journal": "journal"}
+        return path, f"File save to {file_format.get(suffix, 'json')}."
 
     @staticmethod
     def get_words_ru_uk(word, lang):
@@ -321,28 +1125,187 @@ class AnalysisText:
         words = f"*{pattern}*"
         return pattern, words
 
-    def get_pattern_and_text_and_words(self, word: str):
+    def get_text_index(self):
         """
-        Returns the pattern and text for searching a word.
+        Returns the index of the current text, rebuilding it if the text was changed.
         """
-        if self.case_sensitive:
-            return rf"\b{re.escape(word)}\b", self.text, word
+        if self.text_index is None or self.text_index.text is not self.text:
+            with self.metrics.timer("index"):
+                self.text_index = TextIndex(
+                    self.text,
+                    self.memory_lean,
+                    previous=self.text_index,
+                    skip=self.get_skip(),
+                )
+            if (
+                self.cache is not None
+                and self.text is self.old_text
+                and self.counted_text is self.old_text
+                and self.result_counter is not None
+            ):
+                self.save_to_cache()
+        return self.text_index
+
+    def get_skip(self):
+        """
+        Returns the function checking whether a token is left out
+        of the index, or None.
+        """
+        if self.token_filter is not None and self.token_filter.stopwords:
+            return self.token_filter.skip
+        return None
+
+    def get_token_array(self):
+        """
+        Returns the current text encoded as an array of token ids,
+        re-encoding it if the text was changed.
+        """
+        if self.token_array is None or self.token_array.text is not self.text:
+            with self.metrics.timer("encode"):
+                self.token_array = TokenArray(self.text)
+        return self.token_array
+
+    def show_rows_with(self, args=""):
+        """
+        Generates a string with the rows containing all the words
+        and the counts of every word in them.
+        """
+        words = args.lower().split()
+        if not words:
+            return "Enter the words to find the rows containing all of them."
+        self.load_mapped_text()
+        rows = self.get_text_index().rows_with_all(words)
+        if not rows:
+            return f"No rows contain all of: {', '.join(words)}."
+        widths = [max(len(str(n_row)) for n_row, _ in rows), 8] + [
+            max(len(word), max(len(str(counts[i])) for _, counts in rows))
+            for i, word in enumerate(words)
+        ]
+        width_1 = max(widths[:2])
+        res = f"Rows containing all of: {', '.join(words)}: {len(rows)}.\n\n"
+        res += "|".join(
+            [f'{"№ string":^{width_1}}']
+            + [f"{word:^{width}}" for word, width in zip(words, widths[2:])]
+        )
+        res += f'\n{"-" * (width_1 + sum(widths[2:]) + len(words))}\n'
+        res += "\n".join(
+            "|".join(
+                [f"{n_row:^{width_1}}"]
+                + [f"{count:^{width}}" for count, width in zip(counts, widths[2:])]
+            )
+            for n_row, counts in rows
+        )
+        return res + "\n"
+
+    def show_row_stats(self, args=""):
+        """
+        Generates a string with the word frequencies of one row.
+        """
+        self.load_mapped_text()
+        index = self.get_text_index()
+        try:
+            n_row = int(args)
+        except ValueError:
+            n_row = 0
+        if not 1 <= n_row <= len(index.rows):
+            return f"Enter the number of a row from 1 to {len(index.rows)}."
+        frequencies = index.row_frequencies(n_row)
+        if not frequencies:
+            return f"Row №{n_row} does not contain words."
+        width_1 = max(max(len(word) for word, _ in frequencies), 4)
+        width_2 = max(max(len(str(count)) for _, count in frequencies), 5)
+        res = f"Row №{n_row}: {index.rows[n_row - 1]}\n\n"
+        res += f'{"word":^{width_1}}|{"count":^{width_2}}\n{"-" * (width_1 + width_2 + 1)}\n'
+        res += "\n".join(
+            f"{word:^{width_1}}|{count:^{width_2}}" for word, count in frequencies
+        )
+        return res + "\n"
+
+    @staticmethod
+    def make_query(word, mode="default", language=None, distance=FUZZY_DISTANCE):
+        """
+        Returns the pattern naming the search, the searched words
+        and the TokenQuery of the word in the search mode. In fuzzy mode
+        the words within the edit distance are searched, at most
+        the length of the word minus one. Several words are searched
+        as a phrase, and "A NEAR/n B" finds A and B within n words.
+        """
+        near = NEAR_PATTERN.fullmatch(word)
+        if near or len(TOKEN_PATTERN.findall(word)) > 1:
+            return AnalysisText.make_phrase_query(
+                (near.group(1), near.group(3)) if near else (word,),
+                int(near.group(2)) if near else None,
+                mode,
+                language,
+                distance,
+            )
+        if mode == "case_sensitive":
+            return rf"\b{re.escape(word)}\b", word, TokenQuery("exact", word)
         lower_word = word.lower()
-        lower_text = self.text.lower()
-        if self.root_mode:
+        if mode == "fuzzy":
+            distance = max(min(distance, len(lower_word) - 1), 0)
+            return (
+                rf"\b{re.escape(lower_word)}\b~{distance}",
+                f"{lower_word}~{distance}",
+                TokenQuery("fuzzy", (lower_word, distance)),
+            )
+        if mode == "root":
             return (
                 rf"\b\w*{re.escape(lower_word)}\w*\b",
-                lower_text,
                 f"*{lower_word}*",
+                TokenQuery("contains", lower_word),
             )
-        if self.smart_mode:
-            pattern, words = (
-                self.get_words_en(lower_word)
-                if self.language == "en"
-                else self.get_words_ru_uk(lower_word, self.language)
-            )
-            return pattern, lower_text, words
-        return rf"\b{re.escape(lower_word)}\b", lower_text, lower_word
+        if mode == "smart":
+            if language == "en":
+                pattern, words = AnalysisText.get_words_en(lower_word)
+                stem = SnowballStemmer("english").stem(lower_word)
+                return pattern, words, TokenQuery("contains", stem)
+            pattern, words = AnalysisText.get_words_ru_uk(lower_word, language)
+            return pattern, words, TokenQuery("forms", frozenset(words.split(", ")))
+        return (
+            rf"\b{re.escape(lower_word)}\b",
+            lower_word,
+            TokenQuery("lower", lower_word),
+        )
+
+    @staticmethod
+    def make_phrase_query(phrases, near, mode, language, distance):
+        """
+        Returns the pattern naming the search, the searched words and
+        the PhraseQuery of the phrases, with every word in the search mode.
+        """
+        queries = [
+            [
+                AnalysisText.make_query(token, mode, language, distance)
+                for token in TOKEN_PATTERN.findall(phrase)
+            ]
+            for phrase in phrases
+        ]
+        separator = f" NEAR/{near} "
+        return (
+            separator.join(
+                " ".join(pattern for pattern, _, _ in phrase) for phrase in queries
+            ),
+            separator.join(
+                " ".join(words for _, words, _ in phrase) for phrase in queries
+            ),
+            PhraseQuery(
+                [[query for _, _, query in phrase] for phrase in queries], near
+            ),
+        )
+
+    def get_query(self, word):
+        """
+        Returns the pattern, the searched words and the TokenQuery of the word
+        in the current search mode.
+        """
+        return self.make_query(
+            word, self.get_search_mode(), self.language, self.fuzzy_distance
+        )
+
+    def get_search_key(self, pattern):
+        """Returns the key of the search results of the pattern in the cache."""
+        return f"{pattern} {self.case_sensitive} {self.smart_mode} {self.root_mode}"
 
     def save_cache(self, search_key, res):
         """
@@ -354,15 +1317,14 @@ class AnalysisText:
         self.search_cache_keys.append(search_key)
         self.search_cache[search_key] = res
 
-    def update_cache(self, case_sens):
+    def update_cache(self, terms):
         """
-        Updates the cache based on case sensitivity.
+        Removes the cached results that contain the last searched words,
+        given as a set of tokens.
         """
         keys_for_remove = []
         for key, (value, *_) in self.search_cache.items():
-            if re.findall(
-                self.last_pattern, (value.lower() if not case_sens else value)
-            ):
+            if not terms.isdisjoint(TOKEN_PATTERN.findall(value)):
                 keys_for_remove.append(key)
         for key in keys_for_remove:
             del self.search_cache[key]
@@ -381,63 +1343,298 @@ class AnalysisText:
         elif self.text != self.old_text:
             self.history.append(self.text)
 
+    def undo(self):
+        """
+        Undoes the last text modification.
+        """
+        if self.history:
+            self.redo_stack.append(self.text)
+            self.text = self.history.pop(-1)
+            self.record_edit(("undo",))
+            return "Successful undo."
+        return 'Press "Restart" to return original text.'
+
+    def redo(self):
+        """
+        Redoes the last undone text modification.
+        """
+        if self.redo_stack:
+            self.history.append(self.text)
+            self.text = self.redo_stack.pop(-1)
+            self.record_edit(("redo",))
+            return "Successful redo."
+        return "Not successful redo."
+
     def remove_or_replace_last_words(self, new_word=""):
         """
-        Removes or replaces the last searched words in the text.
+        Removes or replaces the last searched words or phrases in the text.
         """
-        if not self.last_pattern:
+        if not self.last_query:
             return "First find the word in the text."
-        self.save_state()
-        case_sens = self.last_search_key.endswith("True False False")
-        if case_sens:
-            self.text = re.sub(self.last_pattern, new_word, self.text)
-        else:
-            match = re.finditer(self.last_pattern, self.text.lower())
-            list_index = [(w.start(), w.end()) for w in match]
-            for start, end in sorted(list_index, reverse=True):
-                self.text = self.text[:start] + new_word + self.text[end:]
-        self.update_cache(case_sens)
-        self.last_pattern = None
+        mess = self.replace_query(self.last_query, new_word)
+        self.last_query = None
         self.last_search_key = None
-        return "Words replaced." if new_word else "Words removed."
+        return mess
+
+    def replace_query(self, query, new_word=""):
+        """
+        Removes or replaces the words or phrases of the query in the text.
+        Only the rows containing them are changed.
+        """
+        with self.metrics.timer("replace"):
+            self.load_mapped_text()
+            self.save_state()
+            index = self.get_text_index()
+            terms = set(query.terms(index.vocabulary))
+            n_rows = {n_row for n_row, _ in index.search(query)}
+            rows = self.text.split("\n")
+            changes = []
+            n_row = 0
+            for i, row in enumerate(rows):
+                if row:
+                    n_row += 1
+                    if n_row in n_rows:
+                        spans = query.spans(row, terms)
+                        if spans:
+                            rows[i] = replace_spans(row, spans, new_word)
+                            changes.append((i, spans))
+            self.text = "\n".join(rows)
+            self.update_cache(terms)
+            self.record_edit(("replace", changes, new_word, terms))
+            return "Words replaced." if new_word else "Words removed."
 
-    def get_all_rows(self, text):
+    @contextmanager
+    def writing(self):
         """
-        Gets all non-empty rows from the text.
+        Holds the lock of the writers while the block changes the analysis
+        and publishes the new version of the text after it.
         """
-        all_rows = [row for row in text.split("\n") if row]
-        all_orig_rows = [row for row in self.text.split("\n") if row]
-        return all_rows, all_orig_rows
+        with self.write_lock:
+            try:
+                yield self
+            finally:
+                self.publish()
+
+    def publish(self):
+        """
+        Publishes the current text with its index as a new TextVersion,
+        if it was changed. The text is loaded into memory first.
+        """
+        with self.write_lock:
+            self.load_mapped_text()
+            version = self.version
+            if version is None or version.text is not self.text:
+                number = 1 if version is None else version.number + 1
+                self.version = TextVersion(number, self.text, self.get_text_index())
+            return self.version
+
+    def get_version(self):
+        """
+        Returns the published version of the current text. Only a reader
+        that finds the text changed but not published yet waits for the writer.
+        """
+        version = self.version
+        if version is None or version.text is not self.text:
+            version = self.publish()
+        return version
 
     @staticmethod
-    def perform_search(words, all_rows, all_orig_rows, pattern):
+    def perform_search(words, all_rows, query):
         """
-        Performs a search for words in the rows of text.
+        Performs a search for the tokens of the query in the rows of text.
         """
-        res, for_index_gui = "", ""
-        for_log_gui = f'Search for "{words}":\n\n'
         n_rows_n_words = []
-        found = False
-        n_row = 0
-        for row in all_rows:
-            n_row += 1
-            count_words_in_row = len(re.findall(pattern, row))
+        for n_row, row in enumerate(all_rows, 1):
+            count_words_in_row = query.count(row)
             if count_words_in_row > 0:
-                found = True
-                res += f"№{n_row}: {all_orig_rows[n_row - 1]}\n\n"
-                for_index_gui += f"№{n_row}: {row}\n\n"
                 n_rows_n_words.append((n_row, count_words_in_row))
-        return found, res, for_index_gui, for_log_gui, n_rows_n_words
+        return AnalysisText.format_found_rows(words, all_rows, n_rows_n_words)
+
+    @staticmethod
+    def format_found_rows(words, all_rows, n_rows_n_words, labels=None):
+        """
+        Formats the found rows in the same way for all search methods,
+        with the offsets of the rows in the result for highlighting.
+        Rows are named by their labels, if given, instead of their numbers.
+        """
+        parts, offsets_rows, offset = [], [], 0
+        for_log_gui = f'Search for "{words}":\n\n'
+        for n_row, _ in n_rows_n_words:
+            label = n_row if labels is None else labels[n_row]
+            row = all_rows[n_row - 1]
+            prefix = f"№{label}: "
+            offsets_rows.append((offset + len(prefix), row))
+            parts.append(f"{prefix}{row}\n\n")
+            offset += len(parts[-1])
+        if labels is not None:
+            n_rows_n_words = [(labels[n_row], count) for n_row, count in n_rows_n_words]
+        return (
+            bool(n_rows_n_words),
+            "".join(parts),
+            offsets_rows,
+            for_log_gui,
+            n_rows_n_words,
+        )
+
+    def perform_index_search(self, query, words, index=None):
+        """
+        Performs a search of the tokens of the query in the token index,
+        by default the index of the current text. The rows of records
+        are named by the record ids.
+        """
+        if index is None:
+            index = self.get_text_index()
+        return self.format_found_rows(
+            words, index.rows, index.search(query), self.get_row_labels(index.text)
+        )
+
+    def get_row_labels(self, text):
+        """
+        Returns the ids of the records of the non-empty rows of the text,
+        indexed by row number, or None if the text is not made of records.
+        Edits never add or remove rows, but can empty them, so the labels
+        are found again for every version of the text.
+        """
+        if self.record_ids is None:
+            return None
+        row_labels = self.row_labels
+        if row_labels is None or row_labels[0] is not text:
+            labels = [None]
+            labels.extend(
+                record_id
+                for record_id, row in zip(self.record_ids, text.split("\n"))
+                if row
+            )
+            row_labels = self.row_labels = text, labels
+        return row_labels[1]
+
+    def iter_mapped_rows(self, query):
+        """
+        Yields (row index, record id, row) of the rows of the mapped file
+        that can contain the query. The bytes of the file are scanned
+        for the word first, so only the rows that can contain it are decoded.
+        A record file is read record by record.
+        """
+        mapped = self.mapped_text
+        if isinstance(mapped, RecordFile):
+            for i, (record_id, row) in enumerate(mapped.iter_records()):
+                yield i, record_id, row
+            return
+        literal = query.literal()
+        if literal is None:
+            for i, row in enumerate(mapped.iter_rows()):
+                yield i, None, row
+            return
+        for i in mapped.find_rows(mapped.literal_pattern(*literal)):
+            yield i, None, mapped.row(i)
+
+    def get_mapped_terms(self, query):
+        """
+        Returns the set of the counted words matching a fuzzy query
+        for searching the mapped file, or None.
+        """
+        if query.kind == "fuzzy" and self.result_counter is not None:
+            return set(query.terms(Vocabulary(self.result_counter)))
+        return None
+
+    def perform_mapped_search(self, query, words):
+        """
+        Performs a search in the mapped file. The found rows of a record file
+        are named by the record ids. Fuzzy queries are matched against
+        the counted words. A query without a literal scans all rows
+        of a large file in parallel chunks.
+        """
+        labels = {} if isinstance(self.mapped_text, RecordFile) else None
+        terms = self.get_mapped_terms(query)
+        if labels is None and query.literal() is None:
+            hits = search_rows(
+                query, self.mapped_text.iter_rows(), len(self.mapped_text), terms
+            )
+            found_rows = {n_row - 1: row for n_row, _, row in hits}
+            n_rows_n_words = [(n_row, count) for n_row, count, _ in hits]
+            return self.format_found_rows(words, found_rows, n_rows_n_words)
+        found_rows, n_rows_n_words = {}, []
+        for i, record_id, row in self.iter_mapped_rows(query):
+            count_words_in_row = query.count(row, terms)
+            if count_words_in_row > 0:
+                found_rows[i] = row
+                n_rows_n_words.append((i + 1, count_words_in_row))
+                if labels is not None:
+                    labels[i + 1] = record_id
+        return self.format_found_rows(words, found_rows, n_rows_n_words, labels)
+
+    def concordance(self, word, width=5, unit="tokens", sort=None):
+        """
+        Returns an iterator of (row label, left context, hit, right context)
+        for the hits of the word in the current search mode, with width
+        tokens or characters of context. The lines are produced lazily,
+        unless they are sorted by the "left" or "right" context.
+        """
+        _, _, query = self.get_query(word)
+        if self.mapped_text is not None:
+            terms = self.get_mapped_terms(query)
+            found_rows = (
+                (i + 1 if record_id is None else record_id, row)
+                for i, record_id, row in self.iter_mapped_rows(query)
+            )
+        else:
+            index = self.get_text_index()
+            terms = set(query.terms(index.vocabulary))
+            labels = self.get_row_labels(index.text)
+            found_rows = (
+                (n_row if labels is None else labels[n_row], index.rows[n_row - 1])
+                for n_row, _ in index.search(query)
+            )
+        lines = iter_concordance(found_rows, query, width, unit, terms)
+        return lines if sort is None else iter(sort_concordance(lines, sort))
+
+    def show_concordance(self, args="", limit=500):
+        """
+        Generates a string with the hits of the word in context, at most limit
+        lines. The arguments start with the optional window, e.g. "5" tokens
+        or "40c" characters, and sorting "left" or "right", e.g. "5 left player".
+        """
+        params = args.split()
+        width, unit, sort = 5, "tokens", None
+        while len(params) > 1 and re.fullmatch(r"\d+c?|left|right", params[0]):
+            param = params.pop(0)
+            if param in ("left", "right"):
+                sort = param
+            else:
+                width = int(param.rstrip("c"))
+                unit = "chars" if param.endswith("c") else "tokens"
+        word = " ".join(params)
+        if not word:
+            return "Enter the word to show in context, e.g. 5 left player."
+        with self.metrics.timer("concordance", unit=unit):
+            lines = list(islice(self.concordance(word, width, unit, sort), limit + 1))
+        if not lines:
+            return f'"{word}" - not exist in text.'
+        res = f'Concordance of "{word}":\n\n'
+        if len(lines) > limit:
+            lines = lines[:limit]
+            res = f'Concordance of "{word}", the first {limit} hits:\n\n'
+        width_1 = max(len(str(label)) for label, *_ in lines)
+        width_2 = max(len(left) for _, left, _, _ in lines)
+        res += "\n".join(
+            f"№{label:<{width_1}}  {left:>{width_2}} [{hit}] {right}".rstrip()
+            for label, left, hit, right in lines
+        )
+        return res + "\n"
 
     @staticmethod
-    def format_for_gui(pattern, index_log_nrw):
+    def format_for_gui(query, index_log_nrw, terms=None):
         """
-        Formats the search results for GUI display.
+        Formats the search results for GUI display, with the positions
+        of the found words in the result.
         """
-        index, log, n_row_word = index_log_nrw
+        offsets_rows, log, n_row_word = index_log_nrw
+        list_index = [
+            (offset + start, offset + end)
+            for offset, row in offsets_rows
+            for start, end in query.spans(row, terms)
+        ]
         sum_words = sum(n_word[1] for n_word in n_row_word)
-        match = re.finditer(pattern, index)
-        list_index = [(w.start(), w.end()) for w in match]
         width_1 = max(max(len(str(n_row[0])) for n_row in n_row_word), 8)
         width_2 = max(max(len(str(count_words[1])) for count_words in n_row_word), 11)
         log += f"Found words: {sum_words}.\n\n"
@@ -453,63 +1650,200 @@ class AnalysisText:
 
     def search_word(self, word, for_gui=False):
         """Searches for a word in the text using cache."""
-        pattern, text, words = self.get_pattern_and_text_and_words(word)
-        search_key = (
-            f"{pattern} {self.case_sensitive} {self.smart_mode} {self.root_mode}"
-        )
-        if search_key in self.search_cache:
+        with self.metrics.timer("search", mode=self.get_search_mode()):
+            pattern, words, query = self.get_query(word)
+            search_key = self.get_search_key(pattern)
+            if search_key in self.search_cache:
+                self.metrics.count("search_cache", result="hit")
+                self.last_search_key = search_key
+                self.last_query = query
+                return (
+                    self.search_cache[search_key][0],
+                    self.search_cache[search_key][1],
+                    self.search_cache[search_key][2],
+                )
+
+            self.metrics.count("search_cache", result="miss")
+            if not word:
+                found = False
+            elif self.mapped_text is not None:
+                found, res, *index_log_nrw = self.perform_mapped_search(query, words)
+            else:
+                found, res, *index_log_nrw = self.perform_index_search(query, words)
+
+            if not found:
+                self.last_search_key = None
+                self.last_query = None
+                return (self.get_not_found_message(word),)
+
+            list_index_for_gui, log_for_gui = None, None
+            if for_gui:
+                terms = (
+                    set(query.terms(self.get_text_index().vocabulary))
+                    if self.mapped_text is None
+                    else None
+                )
+                list_index_for_gui, log_for_gui = self.format_for_gui(
+                    query, index_log_nrw, terms
+                )
+
+            if not self.redo_stack:
+                self.save_cache(search_key, (res, list_index_for_gui, log_for_gui))
             self.last_search_key = search_key
-            self.last_pattern = pattern
+            self.last_query = query
+            return res, list_index_for_gui, log_for_gui
+
+    def get_not_found_message(self, word):
+        """
+        Returns the message of a search that found nothing. The stopwords
+        of the filter are not indexed, so they are named as filtered out
+        rather than reported as absent.
+        """
+        if not word:
+            return "Enter a word for search."
+        skip = self.get_skip()
+        stopwords = [
+            token
+            for token in dict.fromkeys(TOKEN_PATTERN.findall(word.lower()))
+            if skip is not None and skip(token)
+        ]
+        if stopwords:
             return (
-                self.search_cache[search_key][0],
-                self.search_cache[search_key][1],
-                self.search_cache[search_key][2],
+                f'"{word}" - filtered out as a stopword: {", ".join(stopwords)}.'
+                " Enter '!stopwords_off' to search for it."
             )
+        return f'"{word}" - not exist in text.'
 
-        all_rows, all_orig_rows = self.get_all_rows(text)
+    def get_search_mode(self):
+        """
+        Returns the name of the current search mode.
+        """
+        if self.case_sensitive:
+            return "case_sensitive"
+        if self.root_mode:
+            return "root"
+        if self.smart_mode:
+            return "smart"
+        if self.fuzzy_mode:
+            return "fuzzy"
+        return "default"
 
-        found, res, *index_log_nrw = self.perform_search(
-            words, all_rows, all_orig_rows, pattern
-        )
+    def show_stats(self):
+        """
+        Returns the table of operation timings and counters.
+        """
+        return str(self.metrics)
 
-        if not found or not word:
-            self.last_search_key = None
-            self.last_pattern = None
-            return (
-                (f'"{word}" - not exist in text.',)
-                if word
-                else ("Enter a word for search.",)
-            )
+    def export_stats(self, path):
+        """
+        Exports the operation timings and counters to a .json or Prometheus text file.
+        """
+        if not path:
+            return "Enter the path to the stats file."
+        return self.metrics.export(path)
 
-        list_index_for_gui, log_for_gui = None, None
-        if for_gui:
-            list_index_for_gui, log_for_gui = self.format_for_gui(
-                pattern, index_log_nrw
-            )
+    def get_original_counts(self):
+        """
+        Returns the counts of the words of the original text,
+        filtered like the result counter.
+        """
+        self.update_result_counter()
+        if self.mapped_text is not None or self.text is self.old_text:
+            return self.result_counter
+        counts = Counter(TOKEN_PATTERN.findall(self.old_text))
+        return self.token_filter.apply(counts) if self.token_filter else counts
 
-        if not self.redo_stack:
-            self.save_cache(search_key, (res, list_index_for_gui, log_for_gui))
-        self.last_search_key = search_key
-        self.last_pattern = pattern
-        return res, list_index_for_gui, log_for_gui
+    def compare_with(self, other=None):
+        """
+        Returns the Comparison of the word counts of another analysis,
+        an AnalysisText or the path to a file, or of the original text
+        if other is None, with the counts of the current text.
+        """
+        if other is None:
+            counts = self.get_original_counts()
+        else:
+            if not isinstance(other, AnalysisText):
+                other = AnalysisText(
+                    other, cache=self.cache, token_filter=self.token_filter
+                )
+                other.load_file()
+            other.update_result_counter()
+            counts = other.result_counter
+        self.update_result_counter()
+        with self.metrics.timer("compare"):
+            return Comparison(counts, self.result_counter)
+
+    def show_comparison(self, args=""):
+        """
+        Generates a string with the words whose frequencies differ most
+        between another file and the current text. The arguments are the path,
+        the measure and the number of words, e.g. "old.pkl chi_square 30";
+        without a path the original text is compared with the current one.
+        """
+        measure, k, path = "log_likelihood", 20, []
+        for arg in args.split():
+            if arg in MEASURES:
+                measure = arg
+            elif arg.isdigit():
+                k = int(arg)
+            else:
+                path.append(arg)
+        path = " ".join(path)
+        if not path and self.text is self.old_text:
+            return "The text is equal to the original text, enter the path to compare."
+        try:
+            comparison = self.compare_with(path or None)
+            with self.metrics.timer("compare_table", measure=measure):
+                table = comparison.table(measure, k)
+        except (OSError, EmptyFileError, InvalidFileFormatError, ValueError) as e:
+            return f"Cannot compare: {e}"
+        rows = [
+            (word, str(a), str(b), f"{d:+}", f"{ratio:+.2f}", f"{score:+.2f}")
+            for word, a, b, d, ratio, score in table
+        ]
+        header = ("word", "before", "after", "delta", "log2 ratio", measure)
+        widths = [
+            max(len(header[i]), max((len(row[i]) for row in rows), default=0))
+            for i in range(len(header))
+        ]
+        res = (
+            f"Comparison of {path or 'the original text'} ({comparison.total_a} words)"
+            f" with the current text ({comparison.total_b} words)"
+            f" by {measure}:\n\n"
+        )
+        res += "|".join(f"{name:^{width}}" for name, width in zip(header, widths))
+        res += f'\n{"-" * (sum(widths) + len(widths) - 1)}\n'
+        res += "\n".join(
+            "|".join(f"{value:^{width}}" for value, width in zip(row, widths))
+            for row in rows
+        )
+        return res + "\n"
 
     def show_list_words(self):
-        """Shows a list of unique words."""
-        self.update_result_counter()
-        return list(self.result_counter.keys())
+        """Shows a list of unique words, of their lemmas in smart mode."""
+        counter, _ = self.get_shown_counter()
+        return list(counter.keys())
 
     def __str__(self):
-        """Generates a string with the analysis results."""
-        self.update_result_counter()
-        width_1 = max(max(len(word) for word in self.result_counter.keys()), 4)
-        width_2 = max(max(len(str(num)) for num in self.result_counter.values()), 5)
-        res = "Analysis Results:\n\n"
-        res += f'{"word":^{width_1}}|{"count":^{width_2}}\n{"-" * (width_1 + width_2 + 1)}\n'
+        """
+        Generates a string with the analysis results,
+        counted by lemma in smart mode.
+        """
+        counter, name = self.get_shown_counter()
+        if not counter:
+            return f"No words pass the filters: {self.token_filter}.\n"
+        width_1 = max(max(len(word) for word in counter.keys()), len(name))
+        width_2 = max(max(len(str(num)) for num in counter.values()), 5)
+        res = (
+            "Analysis Results by lemma:\n\n"
+            if name == "lemma"
+            else "Analysis Results:\n\n"
+        )
+        res += (
+            f'{name:^{width_1}}|{"count":^{width_2}}\n{"-" * (width_1 + width_2 + 1)}\n'
+        )
         res += "\n".join(
-            [
-                f"{key:^{width_1}}|{self.result_counter[key]:^{width_2}}"
-                for key in self.result_counter
-            ]
+            [f"{key:^{width_1}}|{count:^{width_2}}" for key, count in counter.items()]
         )
         res += (
             "\n\nAnalysis performed on: "
@@ -527,6 +1861,9 @@ def show_info_commands(for_gui=False):
         return (
             "Smart mode: Toggle smart mode for advanced text analysis.\n"
             "Root mode: Toggle root mode for root word analysis.\n"
+            "Search: Toggle fuzzy mode to find words within a few edits"
+            " of the searched word, set the edit distance, or show the hits"
+            " of the searched word in context.\n"
             "To pickle: Save the current text analysis to a pickle file.\n"
             "Remove: Remove selected words from the text.\n"
             "Case sens: Toggle case sensitivity in text analysis.\n"
@@ -535,7 +1872,18 @@ def show_info_commands(for_gui=False):
             "Result: Update the text display with the current analysis results.\n"
             "Load File: Load a new text file into the application.\n"
             "Undo: Undo the last text modification.\n"
-            "Redo: Redo the last undone text modification."
+            "Redo: Redo the last undone text modification.\n"
+            "Stats: Show or export operation timings and counters,"
+            " or the rows containing all the entered words.\n"
+            "Save: Save the analysis to a journal file, appending only the new edits,"
+            " or autosave it at an interval. Saves run in the background.\n"
+            "Filters: Leave the stopwords and the words seen too rarely or too often"
+            " out of the counts.\n"
+            "Follow: Add the rows appended to a growing .txt file, like a log,"
+            " to the counts every few seconds.\n"
+            "Stats > Compare: Show the words whose frequencies differ most"
+            " between another file or the original text and the current text.\n"
+            "Corpus: Load a folder of documents and show word frequencies across them."
         )
     return (
         "1. '!help' to show information about commands;\n"
@@ -557,5 +1905,30 @@ def show_info_commands(for_gui=False):
         "17. '!root_mode' to show the status root mode;\n"
         "18. '!root_mode_on' to enable root mode;\n"
         "19. '!root_mode_off' to disable root mode;\n"
-        "20. '!close' to close the program.\n"
+        "20. '!stats' to show operation timings and counters;\n"
+        "21. '!export_stats' to export the stats to a .json or Prometheus text file;\n"
+        "22. '!memory' to show the memory used by the analysis components;\n"
+        "23. '!memory_lean' to show the status memory-lean mode;\n"
+        "24. '!memory_lean_on' to enable memory-lean mode;\n"
+        "25. '!memory_lean_off' to disable memory-lean mode;\n"
+        "26. '!corpus' to load the documents of a folder or glob pattern into a corpus;\n"
+        "27. '!corpus_word' to show the corpus frequency and documents of a word;\n"
+        "28. '!ngrams' to show n-gram frequencies, e.g. '!ngrams 2 3' for bigrams seen 3+ times;\n"
+        "29. '!rows_with' to show the rows containing all the words, e.g. '!rows_with cat dog';\n"
+        "30. '!row_stats' to show the word frequencies of a row, e.g. '!row_stats 5';\n"
+        "31. '!save_to_journal' to save the text analysis to a journal file, appending only the new edits;\n"
+        "32. '!autosave' to autosave the analysis to a journal every N minutes, e.g. '!autosave 5', 0 to turn it off;\n"
+        "33. '!fuzzy_mode' to show the status fuzzy mode;\n"
+        "34. '!fuzzy_mode_on' to enable fuzzy mode, e.g. '!fuzzy_mode_on 1' for words within 1 edit;\n"
+        "35. '!fuzzy_mode_off' to disable fuzzy mode;\n"
+        "36. '!kwic' to show the hits in context, e.g. '!kwic 5 left player' for 5 words sorted by the left context;\n"
+        "37. '!stopwords_on' to leave the stopwords of the language and your own words out of the counts, e.g. '!stopwords_on foo bar';\n"
+        "38. '!stopwords_off' to count the stopwords again;\n"
+        "39. '!count_range' to count only the words seen from min to max times, e.g. '!count_range 2' to leave out hapaxes;\n"
+        "40. '!filters' to show the filters of the counted words;\n"
+        "41. '!compare' to show the words whose frequencies differ most from another file or the original text, e.g. '!compare old.pkl chi_square 30';\n"
+        "42. '!follow' to show the status follow mode;\n"
+        "43. '!follow_on' to add the rows appended to the .txt file every N seconds, e.g. '!follow_on 5';\n"
+        "44. '!follow_off' to stop following the file;\n"
+        "45. '!close' to close the program.\n"
     )
@@ -0,0 +1,100 @@
+"""
+This module finds the words of a vocabulary within a small edit distance
+of a query, to search texts with misspellings. The index stores the strings
+obtained by deleting up to max_distance characters from the prefix of every
+word (a SymSpell-style deletion index), so a query only looks up its own
+deletions and compares itself with the few words that share one of them.
+"""
+
+FUZZY_DISTANCE = 2
+MAX_FUZZY_DISTANCE = 3
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Returns the Levenshtein distance between the strings,
+    or max_distance + 1 if it is larger than max_distance.
+    """
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > max_distance:
+        return max_distance + 1
+    if not a:
+        return len(b)
+    previous = list(range(len(a) + 1))
+    for i, char_b in enumerate(b, 1):
+        current = [i]
+        for j, char_a in enumerate(a, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+
+def deletions(word, max_distance):
+    """Returns the set of the strings made by deleting up to max_distance characters."""
+    res = edge = {word}
+    for _ in range(max_distance):
+        edge = {form[:i] + form[i + 1 :] for form in edge for i in range(len(form))}
+        res = res | edge
+    return res
+
+
+class DeletionIndex:
+    """
+    A deletion index over the distinct words, used to find all words
+    within an edit distance of a query. Only the first prefix_length
+    characters of a word are indexed, which keeps the index small
+    without missing any word.
+    """
+
+    prefix_length = 7
+
+    def __init__(self, words, max_distance=FUZZY_DISTANCE):
+        """
+        Builds the index from an iterable of distinct words. Words sharing
+        a prefix share its deletions.
+        """
+        self.words = list(words)
+        self.max_distance = max_distance
+        self.prefixes = {}
+        for word_id, word in enumerate(self.words):
+            self.prefixes.setdefault(word[: self.prefix_length], []).append(word_id)
+        self.deletes = {}
+        for prefix in self.prefixes:
+            for key in deletions(prefix, max_distance):
+                self.deletes.setdefault(key, []).append(prefix)
+
+    def find(self, word, max_distance=FUZZY_DISTANCE):
+        """
+        Returns all words within max_distance edits of the word,
+        which must not exceed the distance the index was built for.
+        """
+        if max_distance > self.max_distance:
+            raise ValueError(
+                f"The index finds words within {self.max_distance} edits at most."
+            )
+        prefixes = set()
+        for key in deletions(word[: self.prefix_length], max_distance):
+            prefixes.update(self.deletes.get(key, ()))
+        return [
+            self.words[word_id]
+            for prefix in prefixes
+            for word_id in self.prefixes[prefix]
+            if edit_distance(word, self.words[word_id], max_distance) <= max_distance
+        ]
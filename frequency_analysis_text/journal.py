@@ -0,0 +1,93 @@
+"""
+This module stores an analysis as an append-only journal: a base snapshot
+of the state written once, followed by batches of the edits made after it.
+Saving appends only the new edits, loading replays them on the snapshot.
+"""
+
+import pickle
+from pathlib import Path
+
+from frequency_analysis_text.persistence import atomic_write
+
+JOURNAL_VERSION = 1
+
+
+class JournalFormatError(ValueError):
+    """
+    An exception raised when a file is not a journal of a known version.
+    """
+
+
+class Journal:
+    """
+    A .journal file: a pickled ("base", version, state) record followed
+    by pickled ("edits", operations) records. When the edits grow larger
+    than max_ratio times the base, the journal is compacted into a new base.
+    """
+
+    def __init__(self, path, max_ratio=1.0):
+        """Initializes the journal at the path."""
+        self.path = Path(path)
+        self.max_ratio = max_ratio
+        self.base_size = 0
+        self.edits_size = 0
+
+    def write_base(self, state):
+        """
+        Replaces the journal with a new base snapshot of the state,
+        written to a temporary file and renamed.
+        """
+        with atomic_write(self.path) as file:
+            pickle.dump(
+                ("base", JOURNAL_VERSION, state), file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+            self.base_size = file.tell()
+        self.edits_size = 0
+
+    def append(self, operations):
+        """
+        Appends a batch of edit operations after the last complete batch,
+        cutting off a batch left incomplete by an interrupted save. If the
+        append fails, the next save writes a new base, since the lost batch
+        cannot be replayed.
+        """
+        try:
+            with open(self.path, "r+b") as file:
+                start = file.seek(self.base_size + self.edits_size)
+                file.truncate()
+                pickle.dump(
+                    ("edits", operations), file, protocol=pickle.HIGHEST_PROTOCOL
+                )
+                self.edits_size += file.tell() - start
+        except BaseException:
+            self.base_size = self.edits_size = 0
+            raise
+
+    def needs_compaction(self):
+        """Checks whether the edits have outgrown the base snapshot."""
+        return self.edits_size > self.max_ratio * self.base_size
+
+    def read(self):
+        """
+        Returns the base state and the list of the edit operations
+        saved after it. A batch cut short by an interrupted save is ignored
+        and left in the file until the next append or compaction.
+        """
+        operations = []
+        with open(self.path, "rb") as file:
+            try:
+                kind, version, state = pickle.load(file)
+            except (EOFError, pickle.UnpicklingError, ValueError, TypeError) as e:
+                raise JournalFormatError("The file is not a journal.") from e
+            if kind != "base" or version != JOURNAL_VERSION:
+                raise JournalFormatError("Unsupported journal version.")
+            self.base_size = end = file.tell()
+            while True:
+                try:
+                    _, batch = pickle.load(file)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                operations.extend(batch)
+                end = file.tell()
+        self.edits_size = end - self.base_size
+        return state, operations
@@ -0,0 +1,98 @@
+"""
+This module groups the counted words by lemma, the way smart mode groups
+the forms of a searched word: Ukrainian and Russian words by their normal
+form (pymorphy2), English words by their stem, named after the most
+frequent word of the group. The vocabulary is lowercased and deduplicated
+first, the lemmas of the words are cached per language, and a large
+vocabulary is lemmatized by the shared pool of the parallel search.
+"""
+
+from collections import Counter
+from functools import lru_cache
+
+import pymorphy2
+from nltk.stem import SnowballStemmer
+
+from frequency_analysis_text.parallel_search import get_pool, get_workers
+
+PARALLEL_MIN_WORDS = 50_000
+CHUNK_WORDS = 10_000
+MAX_CACHED_LEMMAS = 1_000_000
+
+LEMMA_CACHE = {}
+
+
+@lru_cache(maxsize=None)
+def get_morph_analyzer(language):
+    """Returns the pymorphy2 analyzer of the language, created once per process."""
+    return pymorphy2.MorphAnalyzer(lang=language)
+
+
+def lemmatize_words(words, language):
+    """
+    Returns the lemmas of the lowercase words: the normal forms
+    for Ukrainian and Russian, the stems for English.
+    Words without letters are their own lemmas.
+    """
+    if language == "en":
+        lemmatize = SnowballStemmer("english").stem
+    else:
+        parse = get_morph_analyzer(language).parse
+
+        def lemmatize(word):
+            return parse(word)[0].normal_form
+
+    return [
+        lemmatize(word) if any(c.isalpha() for c in word) else word for word in words
+    ]
+
+
+def get_lemmas(words, language, workers=None):
+    """
+    Returns a dict of the lowercase words to their lemmas, lemmatizing
+    only the words not cached yet, in parallel for a large vocabulary.
+    """
+    cache = LEMMA_CACHE.setdefault(language, {})
+    new_words = [word for word in words if word not in cache]
+    if len(cache) + len(new_words) > MAX_CACHED_LEMMAS:
+        cache.clear()
+        new_words = list(words)
+    workers = get_workers(workers)
+    if workers == 1 or len(new_words) < PARALLEL_MIN_WORDS:
+        lemmas = lemmatize_words(new_words, language)
+    else:
+        chunks = [
+            new_words[i : i + CHUNK_WORDS]
+            for i in range(0, len(new_words), CHUNK_WORDS)
+        ]
+        lemmas = [
+            lemma
+            for chunk_lemmas in get_pool(workers).map(
+                lemmatize_words, chunks, [language] * len(chunks)
+            )
+            for lemma in chunk_lemmas
+        ]
+    cache.update(zip(new_words, lemmas))
+    return {word: cache[word] for word in words}
+
+
+def count_lemmas(counts, language, workers=None):
+    """
+    Returns the counts of the lemmas of the words of a mapping
+    of words to counts, sorted by lemma.
+    """
+    lower_counts = Counter()
+    for word, count in counts.items():
+        lower_counts[word.lower()] += count
+    lemmas = get_lemmas(list(lower_counts), language, workers)
+    lemma_counts = Counter()
+    for word, count in lower_counts.items():
+        lemma_counts[lemmas[word]] += count
+    if language == "en":
+        names = {}
+        for word, count in lower_counts.items():
+            name = names.get(lemmas[word])
+            if name is None or (-count, word) < (-lower_counts[name], name):
+                names[lemmas[word]] = word
+        lemma_counts = {names[stem]: count for stem, count in lemma_counts.items()}
+    return dict(sorted(lemma_counts.items()))
@@ -1,6 +1,10 @@
 """This project is a program designed for analyzing text files."""
 
+import os
 import sys
+from functools import partial
+from frequency_analysis_text.analysis_cache import get_default_cache
+from frequency_analysis_text.corpus import Corpus
 from frequency_analysis_text.functionality import (
     show_info_commands,
     AnalysisText,
@@ -8,6 +12,88 @@ from frequency_analysis_text.functionality import (
     EmptyFileError,
     InvalidFileFormatError,
 )
+from frequency_analysis_text.follow import FOLLOW_INTERVAL, FollowWorker
+from frequency_analysis_text.journal import JournalFormatError
+from frequency_analysis_text.persistence import PersistenceWorker
+from frequency_analysis_text.records import RECORD_SUFFIXES, RecordFormatError
+
+MMAP_MIN_FILE_SIZE = 256 * 1024 * 1024
+
+
+def should_map_file(path: str):
+    """Checks whether the file is a .txt file large enough to be mapped to memory."""
+    return path.endswith(".txt") and os.path.getsize(path) >= MMAP_MIN_FILE_SIZE
+
+
+def ask_record_fields(path: str):
+    """Asks for the text and id fields of a .jsonl or .csv file."""
+    if not path.endswith(RECORD_SUFFIXES):
+        return {}
+    text_field = input('Enter the text field (default "text"):').strip()
+    id_field = input("Enter the id field (default record number):").strip()
+    return {"text_field": text_field or "text", "id_field": id_field or None}
+
+
+def load_corpus(source: str, state: ProgramState):
+    """Loads the documents into a new corpus and shows its top words."""
+    if not source:
+        return "Enter the path to the folder or a glob pattern."
+    state.corpus = Corpus()
+    mess = state.corpus.load(source)
+    return f"{mess}\n{state.corpus.show_top()}" if state.corpus else mess
+
+
+def show_corpus_word(word: str, obj_text: AnalysisText, state: ProgramState):
+    """Shows the corpus statistics of the word in the current search mode."""
+    if state.corpus is None:
+        return "First load the corpus."
+    if not word:
+        return "Enter a word for search."
+    return state.corpus.show_word(word, obj_text.get_search_mode())
+
+
+def save_analysis(file_format: str, obj_text: AnalysisText, state: ProgramState):
+    """
+    Saves the analysis in the background if the program has a persistence worker.
+    """
+    if state.persistence is None:
+        return getattr(obj_text, f"save_file_to_{file_format}")()
+    state.persistence.save(obj_text, file_format)
+    return f"Saving to {file_format} in the background."
+
+
+def set_autosave(minutes: str, state: ProgramState):
+    """Sets the interval in minutes of autosaving the analysis to a journal."""
+    if state.persistence is None:
+        return "Autosave is not available."
+    try:
+        interval = float(minutes) * 60
+    except ValueError:
+        return "Enter the autosave interval in minutes, 0 to turn autosave off."
+    if interval <= 0:
+        state.persistence.stop_autosave()
+        return "Autosave off."
+    state.persistence.start_autosave(lambda: state.obj_text, interval)
+    return f"Autosave to a journal every {float(minutes):g} min."
+
+
+def set_follow(seconds: str, obj_text: AnalysisText, state: ProgramState):
+    """
+    Follows the file of the analysis, adding the appended rows every N seconds.
+    """
+    if state.follow is None:
+        return "Follow mode is not available."
+    try:
+        interval = float(seconds) if seconds else FOLLOW_INTERVAL
+    except ValueError:
+        interval = 0
+    if interval <= 0:
+        return "Enter the follow interval in seconds, e.g. 5."
+    mess = obj_text.follow_on()
+    if obj_text.following:
+        state.follow.start(lambda: state.obj_text, interval)
+        mess = f"Follow mode on, every {interval:g} s."
+    return mess
 
 
 def parse_input(user_input: str):
@@ -23,7 +109,22 @@ def parse_input(user_input: str):
 def user_command_handler(user_input: str, obj_text: AnalysisText, state: ProgramState):
     """Handles user commands."""
     command, args = parse_input(user_input)
-    command_args_dict = {"!replace_words": obj_text.remove_or_replace_last_words}
+    command_args_dict = {
+        "!replace_words": obj_text.remove_or_replace_last_words,
+        "!export_stats": obj_text.export_stats,
+        "!ngrams": obj_text.show_ngrams,
+        "!rows_with": obj_text.show_rows_with,
+        "!row_stats": obj_text.show_row_stats,
+        "!fuzzy_mode_on": obj_text.fuzzy_mode_on,
+        "!kwic": obj_text.show_concordance,
+        "!stopwords_on": obj_text.stopwords_on,
+        "!count_range": obj_text.set_count_range,
+        "!compare": obj_text.show_comparison,
+        "!follow_on": partial(set_follow, obj_text=obj_text, state=state),
+        "!autosave": partial(set_autosave, state=state),
+        "!corpus": partial(load_corpus, state=state),
+        "!corpus_word": partial(show_corpus_word, obj_text=obj_text, state=state),
+    }
     command_dict = {
         "!root_mode_on": obj_text.root_mode_on,
         "!root_mode_off": obj_text.root_mode_off,
@@ -34,14 +135,26 @@ def user_command_handler(user_input: str, obj_text: AnalysisText, state: Program
         "!smart_mode_on": obj_text.smart_mode_on,
         "!smart_mode_off": obj_text.smart_mode_off,
         "!smart_mode": obj_text.show_smart_mode,
+        "!fuzzy_mode_off": obj_text.fuzzy_mode_off,
+        "!fuzzy_mode": obj_text.show_fuzzy_mode,
+        "!stopwords_off": obj_text.stopwords_off,
+        "!filters": obj_text.show_filters,
+        "!follow_off": obj_text.follow_off,
+        "!follow": obj_text.show_follow,
         "!enter_file": state.new_file,
         "!restart_text": obj_text.restart_user_text,
         "!text": obj_text.show_user_text,
         "!result": obj_text.show_result,
         "!remove_words": obj_text.remove_or_replace_last_words,
-        "!save_to_json": obj_text.save_file_to_json,
-        "!save_to_pickle": obj_text.save_file_to_pickle,
+        "!save_to_json": partial(save_analysis, "json", obj_text, state),
+        "!save_to_pickle": partial(save_analysis, "pickle", obj_text, state),
+        "!save_to_journal": partial(save_analysis, "journal", obj_text, state),
         "!list_words": obj_text.show_list_words,
+        "!stats": obj_text.show_stats,
+        "!memory": obj_text.show_memory,
+        "!memory_lean": obj_text.show_memory_lean,
+        "!memory_lean_on": obj_text.memory_lean_on,
+        "!memory_lean_off": obj_text.memory_lean_off,
         "!help": show_info_commands,
         "!close": sys.exit,
     }
@@ -58,15 +171,26 @@ def user_command_handler(user_input: str, obj_text: AnalysisText, state: Program
 
 def main():
     """The main script for user interaction."""
-    state = ProgramState()
+    persistence = PersistenceWorker(lambda mess: print(f"\n{mess}"))
+    state = ProgramState(
+        persistence, FollowWorker(persistence.lock, lambda mess: print(f"\n{mess}"))
+    )
+    cache = get_default_cache()
     obj_text = None
     while True:
         if state.enter_new_file:
             try:
                 user_path = input("Enter path to file:").strip()
-                obj_text = AnalysisText(user_path)
+                obj_text = AnalysisText(
+                    user_path,
+                    collect_metrics=True,
+                    use_mmap=should_map_file(user_path),
+                    cache=cache,
+                    **ask_record_fields(user_path),
+                )
                 obj_text.load_file()
                 print(obj_text)
+                state.obj_text = obj_text
                 state.enter_new_file = False
             except (PermissionError, FileNotFoundError):
                 print("File not found or access denied.")
@@ -74,7 +198,12 @@ def main():
             except IOError as e:
                 print(f"An I/O error occurred: {e}.")
                 continue
-            except (EmptyFileError, InvalidFileFormatError) as e:
+            except (
+                EmptyFileError,
+                InvalidFileFormatError,
+                RecordFormatError,
+                JournalFormatError,
+            ) as e:
                 print(e)
                 continue
             except (AttributeError, KeyError):
@@ -82,7 +211,8 @@ def main():
                 continue
 
         user_input = input("Enter word for search or command:")
-        user_command_handler(user_input, obj_text, state)
+        with state.persistence.lock:
+            user_command_handler(user_input, obj_text, state)
 
 
 if __name__ == "__main__":
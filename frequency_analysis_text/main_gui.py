@@ -8,15 +8,22 @@ and perform various text analysis operations.
 
 import json
 import os.path
+import queue
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, simpledialog
 from PIL import ImageTk, Image
+from frequency_analysis_text.analysis_cache import get_default_cache
+from frequency_analysis_text.corpus import Corpus
 from frequency_analysis_text.functionality import (
     show_info_commands,
     AnalysisText,
     InvalidFileFormatError,
     EmptyFileError,
 )
+from frequency_analysis_text.follow import FOLLOW_INTERVAL
+from frequency_analysis_text.journal import JournalFormatError
+from frequency_analysis_text.persistence import PersistenceWorker
+from frequency_analysis_text.records import RECORD_SUFFIXES, RecordFormatError
 
 
 class MyApp:
@@ -54,6 +61,15 @@ class MyApp:
         self.btn_undo = None
         self.undo_icon = None
         self.help_menu = None
+        self.stats_menu = None
+        self.corpus_menu = None
+        self.ngrams_menu = None
+        self.search_menu = None
+        self.filters_menu = None
+        self.stopwords_var = tk.BooleanVar()
+        self.fuzzy_mode_var = tk.BooleanVar()
+        self.follow_menu = None
+        self.follow_var = tk.BooleanVar()
         self.ent_new_word = None
         self.btn_replace_word = None
         self.scrollbar_text_x = None
@@ -77,9 +93,18 @@ class MyApp:
         }
 
         self.obj_text = None
+        self.corpus = None
+        self.cache = get_default_cache()
+        self.save_messages = queue.SimpleQueue()
+        self.persistence = PersistenceWorker(self.save_messages.put)
+        self.autosave_interval = None
+        self.autosave_job = None
+        self.follow_interval = int(FOLLOW_INTERVAL * 1000)
+        self.follow_job = None
 
         self.create_widgets()
         self.set_theme_color(first_start=True)
+        self.show_save_messages()
 
     def create_widgets(self):
         """
@@ -89,6 +114,73 @@ class MyApp:
         self.menu_bar.add_cascade(label="Help", menu=self.help_menu)
         self.help_menu.add_command(label="Command info", command=self.show_help)
 
+        self.stats_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Stats", menu=self.stats_menu)
+        self.stats_menu.add_command(label="Show stats", command=self.show_stats)
+        self.stats_menu.add_command(label="Export stats", command=self.export_stats)
+        self.stats_menu.add_command(label="Memory report", command=self.show_memory)
+        self.stats_menu.add_command(
+            label="Rows with words", command=self.show_rows_with
+        )
+        self.stats_menu.add_command(
+            label="Compare with file...", command=self.compare_with_file
+        )
+        self.stats_menu.add_command(
+            label="Compare with original", command=self.compare_with_original
+        )
+
+        self.search_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Search", menu=self.search_menu)
+        self.search_menu.add_checkbutton(
+            label="Fuzzy mode", variable=self.fuzzy_mode_var, command=self.fuzzy_mode
+        )
+        self.search_menu.add_command(
+            label="Fuzzy distance...", command=self.set_fuzzy_distance
+        )
+        self.search_menu.add_command(
+            label="Concordance...", command=self.show_concordance
+        )
+
+        self.filters_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Filters", menu=self.filters_menu)
+        self.filters_menu.add_checkbutton(
+            label="Stopwords", variable=self.stopwords_var, command=self.stopwords
+        )
+        self.filters_menu.add_command(
+            label="Custom stopwords...", command=self.custom_stopwords
+        )
+        self.filters_menu.add_command(label="Count range...", command=self.count_range)
+
+        self.follow_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Follow", menu=self.follow_menu)
+        self.follow_menu.add_checkbutton(
+            label="Follow file", variable=self.follow_var, command=self.follow_file
+        )
+        self.follow_menu.add_command(
+            label="Follow interval...", command=self.set_follow_interval
+        )
+
+        self.save_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Save", menu=self.save_menu)
+        self.save_menu.add_command(
+            label="Save to journal", command=self.save_to_journal
+        )
+        self.save_menu.add_command(label="Autosave...", command=self.set_autosave)
+
+        self.ngrams_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="N-grams", menu=self.ngrams_menu)
+        for label, n in (("Bigrams", 2), ("Trigrams", 3)):
+            self.ngrams_menu.add_command(
+                label=label, command=lambda size=n: self.show_ngrams(size)
+            )
+
+        self.corpus_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Corpus", menu=self.corpus_menu)
+        self.corpus_menu.add_command(label="Load folder", command=self.load_corpus)
+        self.corpus_menu.add_command(
+            label="Search word in corpus", command=self.search_corpus
+        )
+
         self.theme_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Theme", menu=self.theme_menu)
         for theme in self.support_themes:
@@ -295,13 +387,8 @@ class MyApp:
         """
         if self.obj_text:
             self.text_on()
-            mess = 'Press "Restart" to return original text.'
-            if self.obj_text.history:
-                el = self.obj_text.history.pop(-1)
-                self.obj_text.redo_stack.append(self.obj_text.text)
-                self.obj_text.text = el
-                self.txt_text.replace("1.0", tk.END, self.obj_text.text)
-                mess = "Successful undo."
+            mess = self.obj_text.undo()
+            self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
@@ -311,13 +398,8 @@ class MyApp:
         """
         if self.obj_text:
             self.text_on()
-            mess = "Not successful redo."
-            if self.obj_text.redo_stack:
-                el = self.obj_text.redo_stack.pop(-1)
-                self.obj_text.history.append(self.obj_text.text)
-                self.obj_text.text = el
-                self.txt_text.replace("1.0", tk.END, self.obj_text.text)
-                mess = "Successful redo."
+            mess = self.obj_text.redo()
+            self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
@@ -328,6 +410,143 @@ class MyApp:
         """
         messagebox.showinfo("Help", show_info_commands(True))
 
+    def show_panel(self, title, text):
+        """
+        Show a read-only panel with the text.
+        """
+        panel = tk.Toplevel(self.root)
+        panel.title(title)
+        panel.geometry("600x300")
+        txt_panel = tk.Text(
+            panel,
+            wrap=tk.NONE,
+            bg=self.theme_color2,
+            font=self.lab_and_txt_2_font,
+        )
+        txt_panel.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        txt_panel.insert("1.0", text)
+        txt_panel.config(state="disabled")
+
+    def show_stats(self):
+        """
+        Show the panel with operation timings and counters.
+        """
+        if self.obj_text:
+            self.show_panel("Stats", self.obj_text.show_stats())
+
+    def show_memory(self):
+        """
+        Show the panel with the memory used by the analysis components.
+        """
+        if self.obj_text:
+            self.show_panel("Memory", self.obj_text.show_memory())
+
+    def show_rows_with(self):
+        """
+        Show the panel with the rows containing all the entered words.
+        """
+        if self.obj_text:
+            self.show_panel(
+                "Rows", self.obj_text.show_rows_with(self.ent_search_word.get())
+            )
+
+    def compare_with_file(self):
+        """
+        Show the panel with the words whose frequencies differ most
+        between the selected file and the current text.
+        """
+        if not self.obj_text:
+            return
+        file_path = filedialog.askopenfilename(
+            title="Compare with",
+            filetypes=(
+                ("Analysis files", "*.txt *.pkl *.pickle *.json *.journal"),
+                ("All files", "*.*"),
+            ),
+        )
+        if file_path:
+            self.show_panel("Compare", self.obj_text.show_comparison(file_path))
+
+    def compare_with_original(self):
+        """
+        Show the panel with the words whose frequencies differ most
+        between the original and the current text.
+        """
+        if self.obj_text:
+            self.show_panel("Compare", self.obj_text.show_comparison())
+
+    def show_concordance(self):
+        """
+        Show the panel with the hits of the searched word in context.
+        """
+        word = self.ent_search_word.get().strip()
+        if not self.obj_text or not word:
+            return
+        window = simpledialog.askstring(
+            "Concordance",
+            "Window and sorting, e.g. 5 (words), 40c (characters), 5 left or 5 right:",
+            initialvalue="5",
+        )
+        if window is not None:
+            self.show_panel(
+                "Concordance", self.obj_text.show_concordance(f"{window} {word}")
+            )
+
+    def export_stats(self):
+        """
+        Export operation timings and counters to a .json or Prometheus text file.
+        """
+        if self.obj_text:
+            file_path = filedialog.asksaveasfilename(
+                title="Export stats",
+                defaultextension=".json",
+                filetypes=(("JSON files", "*.json"), ("Prometheus text", "*.prom")),
+            )
+            if file_path:
+                self.text_on()
+                mess = self.obj_text.export_stats(file_path)
+                self.txt_log_command.replace("1.0", tk.END, mess)
+                self.text_off()
+
+    def show_ngrams(self, n):
+        """
+        Show the n-gram frequencies of the current text.
+        """
+        if self.obj_text:
+            self.text_on()
+            self.txt_log_command.replace(
+                "1.0", tk.END, self.obj_text.show_ngrams(str(n))
+            )
+            self.text_off()
+
+    def load_corpus(self):
+        """
+        Load all documents of a folder into a corpus and show its top words.
+        """
+        folder = filedialog.askdirectory(title="Select a folder")
+        if folder:
+            self.text_on()
+            self.corpus = Corpus()
+            mess = self.corpus.load(folder)
+            self.txt_log_command.replace("1.0", tk.END, mess)
+            self.txt_text.replace("1.0", tk.END, self.corpus.show_top(50))
+            self.text_off()
+
+    def search_corpus(self):
+        """
+        Show the corpus frequency and the documents of the searched word.
+        """
+        word = self.ent_search_word.get().strip()
+        self.text_on()
+        if self.corpus is None:
+            self.txt_log_command.replace("1.0", tk.END, "First load the corpus.")
+        elif not word:
+            self.txt_log_command.replace("1.0", tk.END, "Enter a word for search.")
+        else:
+            mode = self.obj_text.get_search_mode() if self.obj_text else "default"
+            self.txt_text.replace("1.0", tk.END, self.corpus.show_word(word, mode))
+        self.text_off()
+
     def text_off(self):
         """
         Disable editing and interaction with the text widgets.
@@ -348,7 +567,7 @@ class MyApp:
         """
         if self.obj_text:
             self.text_on()
-            self.txt_text.replace("1.0", tk.END, self.obj_text.text)
+            self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
             self.txt_log_command.replace("1.0", tk.END, str(self.obj_text))
             self.text_off()
 
@@ -374,6 +593,7 @@ class MyApp:
                 self.buttons["Root mode"].config(
                     bg=self.soft_red, activebackground=self.soft_red
                 )
+            self.fuzzy_mode_var.set(self.obj_text.fuzzy_mode)
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
@@ -400,6 +620,7 @@ class MyApp:
                 self.buttons["Smart mode"].config(
                     bg=self.soft_red, activebackground=self.soft_red
                 )
+            self.fuzzy_mode_var.set(self.obj_text.fuzzy_mode)
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
@@ -425,9 +646,98 @@ class MyApp:
                 self.buttons["Case sens"].config(
                     bg=self.soft_red, activebackground=self.soft_red
                 )
+            self.fuzzy_mode_var.set(self.obj_text.fuzzy_mode)
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
+    def fuzzy_mode(self):
+        """
+        Toggle fuzzy mode for text analysis.
+        """
+        if not self.obj_text:
+            self.fuzzy_mode_var.set(False)
+            return
+        if self.fuzzy_mode_var.get():
+            mess = self.obj_text.fuzzy_mode_on(str(self.obj_text.fuzzy_distance))
+        else:
+            mess = self.obj_text.fuzzy_mode_off()
+        self.show_fuzzy_mode(mess)
+
+    def set_fuzzy_distance(self):
+        """
+        Ask for the edit distance of fuzzy mode and enable it.
+        """
+        if not self.obj_text:
+            return
+        distance = simpledialog.askinteger(
+            "Fuzzy mode", "Find words within N edits of the searched word:"
+        )
+        if distance is not None:
+            self.show_fuzzy_mode(self.obj_text.fuzzy_mode_on(str(distance)))
+
+    def show_fuzzy_mode(self, mess):
+        """
+        Show the status of fuzzy mode, which turns the other modes off.
+        """
+        self.text_on()
+        self.fuzzy_mode_var.set(self.obj_text.fuzzy_mode)
+        if self.obj_text.fuzzy_mode:
+            for name in ("Case sens", "Smart mode", "Root mode"):
+                self.buttons[name].config(
+                    bg=self.soft_red, activebackground=self.soft_red
+                )
+        self.txt_log_command.replace("1.0", tk.END, mess)
+        self.text_off()
+
+    def stopwords(self):
+        """
+        Toggle leaving the stopwords of the language out of the counts.
+        """
+        if not self.obj_text:
+            self.stopwords_var.set(False)
+            return
+        if self.stopwords_var.get():
+            mess = self.obj_text.stopwords_on()
+        else:
+            mess = self.obj_text.stopwords_off()
+        self.show_filters(mess)
+
+    def custom_stopwords(self):
+        """
+        Ask for your own stopwords and leave them out of the counts
+        with the stopwords of the language.
+        """
+        if not self.obj_text:
+            return
+        words = simpledialog.askstring(
+            "Stopwords", "Words to leave out of the counts, separated by spaces:"
+        )
+        if words is not None:
+            self.show_filters(self.obj_text.stopwords_on(words))
+
+    def count_range(self):
+        """
+        Ask for the minimum and the maximum count of the counted words.
+        """
+        if not self.obj_text:
+            return
+        counts = simpledialog.askstring(
+            "Count range", "Minimum and maximum count, e.g. 2 or 2 100:"
+        )
+        if counts is not None:
+            self.show_filters(self.obj_text.set_count_range(counts))
+
+    def show_filters(self, mess):
+        """
+        Show the message of the changed filters and the filtered results.
+        """
+        token_filter = self.obj_text.token_filter
+        self.stopwords_var.set(bool(token_filter and token_filter.stopwords))
+        self.text_on()
+        self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
+        self.txt_log_command.replace("1.0", tk.END, f"{mess}\n\n{self.obj_text}")
+        self.text_off()
+
     def restart_text(self):
         """
         Restart the text analysis from the original text.
@@ -441,7 +751,7 @@ class MyApp:
         ):
             self.text_on()
             mess = self.obj_text.restart_user_text()
-            self.txt_text.replace("1.0", tk.END, self.obj_text.text)
+            self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
@@ -459,7 +769,7 @@ class MyApp:
         ):
             self.text_on()
             mess = self.obj_text.remove_or_replace_last_words()
-            self.txt_text.replace("1.0", tk.END, self.obj_text.text)
+            self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
@@ -481,7 +791,7 @@ class MyApp:
             self.text_on()
             mess = self.obj_text.remove_or_replace_last_words(new_word)
             self.ent_new_word.delete(0, tk.END)
-            self.txt_text.replace("1.0", tk.END, self.obj_text.text)
+            self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
             self.txt_log_command.replace("1.0", tk.END, mess)
             self.text_off()
 
@@ -493,14 +803,11 @@ class MyApp:
             self.text_on()
             tag = False
             word = self.ent_search_word.get().strip()
-            mess_for_text = self.obj_text.text
+            mess_for_text = self.obj_text.show_user_text()
             mess_for_log, *list_index_and_for_log = self.obj_text.search_word(
                 word, True
             )
-            if (
-                not mess_for_log.endswith('" - not exist in text.')
-                and mess_for_log != "Enter a word for search."
-            ):
+            if list_index_and_for_log:
                 tag = True
                 mess_for_text = mess_for_log
                 mess_for_log = list_index_and_for_log[1]
@@ -529,7 +836,7 @@ class MyApp:
                 save = messagebox.askquestion("Save to pickle", quest)
             if save == "yes":
                 self.text_on()
-                mess = self.obj_text.save_file_to_pickle()
+                mess = self.save_in_background("pickle")
                 self.txt_log_command.replace("1.0", tk.END, mess)
                 self.buttons["To pickle"].config(
                     bg=self.soft_green, activebackground=self.soft_green
@@ -551,19 +858,130 @@ class MyApp:
                 save = messagebox.askquestion("Save to json", quest)
             if save == "yes":
                 self.text_on()
-                mess = self.obj_text.save_file_to_json()
+                mess = self.save_in_background("json")
                 self.txt_log_command.replace("1.0", tk.END, mess)
                 self.buttons["To json"].config(
                     bg=self.soft_green, activebackground=self.soft_green
                 )
                 self.text_off()
 
+    def save_to_journal(self):
+        """
+        Save the current text analysis to a journal file, appending only
+        the edits made since the last save.
+        """
+        if self.obj_text:
+            self.text_on()
+            mess = self.save_in_background("journal")
+            self.txt_log_command.replace("1.0", tk.END, mess)
+            self.text_off()
+
+    def save_in_background(self, file_format):
+        """
+        Save a snapshot of the analysis in the background and return the message.
+        """
+        self.persistence.save(self.obj_text, file_format)
+        return f"Saving to {file_format} in the background."
+
+    def show_save_messages(self):
+        """
+        Show the messages of the finished background saves, checking every 200 ms.
+        """
+        while True:
+            try:
+                mess = self.save_messages.get_nowait()
+            except queue.Empty:
+                break
+            self.text_on()
+            self.txt_log_command.replace("1.0", tk.END, mess)
+            self.text_off()
+        self.root.after(200, self.show_save_messages)
+
+    def set_autosave(self):
+        """
+        Ask for the autosave interval in minutes and start or stop autosaving.
+        """
+        minutes = simpledialog.askfloat(
+            "Autosave", "Autosave to a journal every N minutes (0 to turn off):"
+        )
+        if minutes is None:
+            return
+        if self.autosave_job is not None:
+            self.root.after_cancel(self.autosave_job)
+            self.autosave_job = None
+        self.autosave_interval = int(minutes * 60_000) if minutes > 0 else None
+        if self.autosave_interval:
+            self.autosave_job = self.root.after(self.autosave_interval, self.autosave)
+
+    def autosave(self):
+        """
+        Save the analysis to a journal if it was changed and schedule the next autosave.
+        """
+        self.persistence.autosave(self.obj_text)
+        self.autosave_job = self.root.after(self.autosave_interval, self.autosave)
+
+    def follow_file(self):
+        """
+        Toggle adding the rows appended to the file every few seconds.
+        """
+        if self.follow_job is not None:
+            self.root.after_cancel(self.follow_job)
+            self.follow_job = None
+        if not self.obj_text:
+            self.follow_var.set(False)
+            return
+        if self.follow_var.get():
+            mess = self.obj_text.follow_on()
+            self.follow_var.set(self.obj_text.following)
+            if self.obj_text.following:
+                self.follow_job = self.root.after(self.follow_interval, self.follow)
+        else:
+            mess = self.obj_text.follow_off()
+        self.text_on()
+        self.txt_log_command.replace("1.0", tk.END, mess)
+        self.text_off()
+
+    def set_follow_interval(self):
+        """
+        Ask for the interval in seconds of reading the appended rows.
+        """
+        seconds = simpledialog.askfloat(
+            "Follow",
+            "Read the rows appended to the file every N seconds:",
+            initialvalue=self.follow_interval / 1000,
+        )
+        if seconds is not None and seconds > 0:
+            self.follow_interval = int(seconds * 1000)
+
+    def follow(self):
+        """
+        Add the rows appended to the file, show them and schedule the next check.
+        """
+        self.follow_job = None
+        size = len(self.obj_text.text)
+        mess = self.obj_text.update_from_file()
+        if mess:
+            self.text_on()
+            self.txt_text.insert(tk.END, self.obj_text.text[size:])
+            self.txt_log_command.replace("1.0", tk.END, f"{mess}\n\n{self.obj_text}")
+            self.text_off()
+        if self.obj_text.following:
+            self.follow_job = self.root.after(self.follow_interval, self.follow)
+        else:
+            self.follow_var.set(False)
+
     def return_all(self):
         """
         Return all relevant information from the text analysis.
         """
         self.ent_new_word.delete(0, tk.END)
         self.ent_search_word.delete(0, tk.END)
+        self.fuzzy_mode_var.set(False)
+        self.stopwords_var.set(False)
+        self.follow_var.set(False)
+        if self.follow_job is not None:
+            self.root.after_cancel(self.follow_job)
+            self.follow_job = None
         self.buttons["Case sens"].config(
             bg=self.theme_color2, activebackground=self.theme_color2
         )
@@ -591,6 +1009,21 @@ class MyApp:
         self.obj_text = None
         self.lab_path_to_file.config(text=file_path, background=self.soft_red)
 
+    @staticmethod
+    def ask_record_fields(file_path):
+        """
+        Ask for the text and id fields of a .jsonl or .csv file.
+        """
+        if not file_path.endswith(RECORD_SUFFIXES):
+            return {}
+        text_field = simpledialog.askstring(
+            "Record fields", 'Text field (default "text"):'
+        )
+        id_field = simpledialog.askstring(
+            "Record fields", "Id field (default record number):"
+        )
+        return {"text_field": text_field or "text", "id_field": id_field or None}
+
     def load_file(self):
         """
         Load and display the content of a file.
@@ -599,25 +1032,39 @@ class MyApp:
             title="Select a file",
             filetypes=(
                 ("Text files", "*.txt"),
+                ("Compressed text files", "*.txt.gz *.txt.bz2 *.txt.xz"),
                 ("Pickle files", "*.pkl *.pickle"),
                 ("JSON files", "*.json"),
+                ("Journal files", "*.journal"),
+                ("Record files", "*.jsonl *.csv"),
             ),
         )
         try:
             if file_path:
                 self.text_on()
                 self.return_all()
-                self.obj_text = AnalysisText(file_path)
+                self.obj_text = AnalysisText(
+                    file_path,
+                    collect_metrics=True,
+                    cache=self.cache,
+                    **self.ask_record_fields(file_path),
+                )
                 self.obj_text.load_file(True)
                 self.txt_log_command.replace("1.0", tk.END, str(self.obj_text))
-                self.txt_text.replace("1.0", tk.END, self.obj_text.text)
+                self.txt_text.replace("1.0", tk.END, self.obj_text.show_user_text())
                 self.lab_path_to_file.config(text=file_path, background=self.soft_green)
         except (PermissionError, FileNotFoundError):
             self.if_error_load_file(file_path)
             self.txt_log_command.replace(
                 "1.0", tk.END, "File not found or access denied."
             )
-        except (EmptyFileError, InvalidFileFormatError, IOError) as e:
+        except (
+            EmptyFileError,
+            InvalidFileFormatError,
+            RecordFormatError,
+            JournalFormatError,
+            IOError,
+        ) as e:
             self.if_error_load_file(file_path)
             self.txt_log_command.replace("1.0", tk.END, (str(e)))
         except (AttributeError, KeyError):
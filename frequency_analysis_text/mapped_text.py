@@ -0,0 +1,112 @@
+"""
+This module provides read-only access to a UTF-8 text file mapped to memory,
+so that large files can be counted and searched without decoding
+the whole file to a string. Windows and old Mac newlines are read as \n,
+like in a loaded .txt file.
+"""
+
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_right
+
+from frequency_analysis_text.compressed_text import normalize_newlines
+
+
+class MappedText:
+    """A read-only UTF-8 text file mapped to memory."""
+
+    def __init__(self, path, chunk_size=1 << 22):
+        """Maps the file to memory."""
+        self.chunk_size = chunk_size
+        self.file = open(path, "rb")  # pylint: disable=consider-using-with
+        if os.fstat(self.file.fileno()).st_size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b""
+        self._row_starts = None
+        self._row_ends = None
+
+    def close(self):
+        """Unmaps and closes the file."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __len__(self):
+        """Returns the size of the file in bytes."""
+        return len(self.data)
+
+    def read_text(self):
+        """Decodes the whole file."""
+        return normalize_newlines(self.data[:].decode("utf-8"))
+
+    def sample(self, size=1 << 20):
+        """Decodes the beginning of the file, dropping a cut last character."""
+        return self.data[:size].decode("utf-8", errors="ignore")
+
+    def iter_chunks(self):
+        """
+        Yields the decoded file in chunks of about chunk_size bytes
+        that end on the end of a row.
+        """
+        data = self.data
+        start = 0
+        while start < len(data):
+            end = data.find(b"\n", start + self.chunk_size)
+            end = len(data) if end == -1 else end + 1
+            yield normalize_newlines(data[start:end].decode("utf-8"))
+            start = end
+
+    def iter_rows(self):
+        """Yields the decoded non-empty rows."""
+        for chunk in self.iter_chunks():
+            for row in chunk.split("\n"):
+                if row:
+                    yield row
+
+    def build_rows(self):
+        """Finds the byte offsets of the non-empty rows."""
+        if self._row_starts is None:
+            self._row_starts = array("Q")
+            self._row_ends = array("Q")
+            for match in re.finditer(rb"[^\r\n]+", self.data):
+                self._row_starts.append(match.start())
+                self._row_ends.append(match.end())
+
+    def row(self, i):
+        """Decodes the non-empty row with the index i."""
+        self.build_rows()
+        return self.data[self._row_starts[i] : self._row_ends[i]].decode("utf-8")
+
+    def find_rows(self, bytes_pattern):
+        """
+        Returns the sorted indexes of the non-empty rows
+        in which the bytes pattern matches.
+        """
+        self.build_rows()
+        rows = []
+        for match in bytes_pattern.finditer(self.data):
+            i = bisect_right(self._row_starts, match.start()) - 1
+            if i >= 0 and (not rows or rows[-1] != i):
+                rows.append(i)
+        return rows
+
+    @staticmethod
+    def literal_pattern(literal, ignore_case=False):
+        """
+        Returns a bytes pattern of the UTF-8 encoded literal. With ignore_case
+        every character also matches its simple upper and title case forms.
+        """
+        if not ignore_case:
+            return re.compile(re.escape(literal.encode("utf-8")))
+        parts = []
+        for char in literal:
+            variants = sorted({char, char.lower(), char.upper(), char.title()})
+            parts.append(
+                b"(?:"
+                + b"|".join(re.escape(v.encode("utf-8")) for v in variants)
+                + b")"
+            )
+        return re.compile(b"".join(parts))
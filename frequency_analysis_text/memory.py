@@ -0,0 +1,126 @@
+"""
+This module contains the compact structures of the memory-lean mode
+and the report of the memory used by the analysis components.
+"""
+
+import sys
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+
+class CompactCounter(Mapping):
+    """
+    A read-only word counter stored as parallel arrays:
+    a sorted list of interned words and an array('I') of their counts.
+    """
+
+    __slots__ = ("words", "counts")
+
+    def __init__(self, words=(), counts=()):
+        """Initializes with the sorted words and their counts."""
+        self.words = [sys.intern(word) for word in words]
+        self.counts = counts if isinstance(counts, array) else array("I", counts)
+
+    @classmethod
+    def from_counts(cls, counter):
+        """Creates a compact counter from a mapping of words to counts."""
+        items = sorted(counter.items(), key=lambda item: item[0])
+        return cls((word for word, _ in items), (count for _, count in items))
+
+    def __reduce__(self):
+        return self.__class__, (self.words, self.counts)
+
+    def __getitem__(self, word):
+        i = bisect_left(self.words, word)
+        if i < len(self.words) and self.words[i] == word:
+            return self.counts[i]
+        raise KeyError(word)
+
+    def __contains__(self, word):
+        i = bisect_left(self.words, word)
+        return i < len(self.words) and self.words[i] == word
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def values(self):
+        return self.counts
+
+    def items(self):
+        return zip(self.words, self.counts)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({len(self)} words)"
+
+
+def deep_sizeof(obj, seen):
+    """
+    Returns the size in bytes of the object and everything it references,
+    skipping objects whose ids are already in `seen`.
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or item is None or isinstance(item, type):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, array, int, float, bool)):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                stack.append(item.__dict__)
+            for cls in type(item).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    if hasattr(item, name):
+                        stack.append(getattr(item, name))
+    return size
+
+
+def format_size(size):
+    """Returns the size in bytes in a readable form."""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def memory_report(components):
+    """
+    Returns a table with the memory used by every component.
+    `components` is a list of (name, object) pairs, an object shared
+    with an earlier component is counted only once.
+    """
+    seen = set()
+    rows = [(name, deep_sizeof(obj, seen)) for name, obj in components]
+    total = sum(size for _, size in rows)
+    rows.append(("total", total))
+    width_1 = max(max(len(name) for name, _ in rows), 9)
+    width_2 = max(max(len(format_size(size)) for _, size in rows), 6)
+    res = "Memory usage:\n\n"
+    res += f'{"component":^{width_1}}|{"size":^{width_2}}|{"share":^7}\n'
+    res += f'{"-" * (width_1 + width_2 + 9)}\n'
+    res += "\n".join(
+        f"{name:<{width_1}}|{format_size(size):>{width_2}}|"
+        f"{size / total * 100 if total else 0:>6.1f}%"
+        for name, size in rows
+    )
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        res += (
+            f"\n\nTraced by tracemalloc: {format_size(current)},"
+            f" peak {format_size(peak)}."
+        )
+    return res + "\n"
@@ -0,0 +1,197 @@
+"""
+This module collects timings and counters of the text analysis operations
+and exports them as JSON or in the Prometheus text format.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+
+def escape_label_value(value):
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _NullTimer:
+    """A timer that does nothing, returned when metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Measures the time of one operation and records it on exit."""
+
+    __slots__ = ("metrics", "key", "start")
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Timings and counters of operations, grouped by name and labels."""
+
+    def __init__(self, enabled=False):
+        """Initializes empty metrics, nothing is recorded while disabled."""
+        self.enabled = enabled
+        self.timings = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        """Excludes the lock, it cannot be pickled."""
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        """Restores the state with a new lock."""
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(name, labels):
+        """Returns a hashable key of the name and labels."""
+        return (name, tuple(sorted(labels.items())))
+
+    def timer(self, name, **labels):
+        """
+        Returns a context manager that records the time of the operation.
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, self.make_key(name, labels))
+
+    def record(self, key, seconds):
+        """Adds a measured time to the operation statistics."""
+        with self.lock:
+            stats = self.timings.get(key)
+            if stats is None:
+                self.timings[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                if seconds > stats[2]:
+                    stats[2] = seconds
+
+    def count(self, name, value=1, **labels):
+        """Increments the counter."""
+        if self.enabled:
+            key = self.make_key(name, labels)
+            with self.lock:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        """Removes all collected metrics."""
+        self.timings.clear()
+        self.counters.clear()
+
+    @staticmethod
+    def format_key(key):
+        """Returns the key as `name{label=value}`."""
+        name, labels = key
+        if not labels:
+            return name
+        return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+    def to_dict(self):
+        """Returns the metrics as a dict ready for JSON."""
+        return {
+            "timings": [
+                {
+                    "operation": key[0],
+                    "labels": dict(key[1]),
+                    "count": count,
+                    "total_seconds": total,
+                    "max_seconds": maximum,
+                }
+                for key, (count, total, maximum) in self.timings.items()
+            ],
+            "counters": [
+                {"name": key[0], "labels": dict(key[1]), "value": value}
+                for key, value in self.counters.items()
+            ],
+        }
+
+    def to_prometheus(self, prefix="frequency_analysis"):
+        """Returns the metrics in the Prometheus text exposition format."""
+
+        def labels_text(labels):
+            return ",".join(f'{k}="{escape_label_value(v)}"' for k, v in labels)
+
+        lines = [
+            f"# HELP {prefix}_operation_seconds Time spent in operations.",
+            f"# TYPE {prefix}_operation_seconds summary",
+        ]
+        for (name, labels), (count, total, _) in self.timings.items():
+            text = labels_text((("operation", name),) + labels)
+            lines.append(f"{prefix}_operation_seconds_count{{{text}}} {count}")
+            lines.append(f"{prefix}_operation_seconds_sum{{{text}}} {total!r}")
+        lines.append(f"# HELP {prefix}_events_total Counted events.")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for (name, labels), value in self.counters.items():
+            text = labels_text((("event", name),) + labels)
+            lines.append(f"{prefix}_events_total{{{text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """
+        Writes the metrics to a file: JSON for .json files,
+        the Prometheus text format otherwise.
+        """
+        path = Path(path)
+        if path.suffix == ".json":
+            content = json.dumps(self.to_dict(), ensure_ascii=False, indent=4)
+        else:
+            content = self.to_prometheus()
+        path.write_text(content, encoding="utf-8")
+        return f"Stats exported to {path}."
+
+    def __str__(self):
+        """Generates a table with the collected metrics."""
+        if not self.enabled:
+            return "Stats are disabled."
+        if not self.timings and not self.counters:
+            return "No stats yet."
+        rows = [
+            (
+                self.format_key(key),
+                str(count),
+                f"{total:.4f}",
+                f"{total / count * 1000:.2f}",
+                f"{maximum * 1000:.2f}",
+            )
+            for key, (count, total, maximum) in self.timings.items()
+        ]
+        header = ("operation", "count", "total, s", "mean, ms", "max, ms")
+        widths = [max(len(row[i]) for row in rows + [header]) for i in range(5)]
+        res = "Operation stats:\n\n"
+        res += "|".join(f"{h:^{w}}" for h, w in zip(header, widths)) + "\n"
+        res += "-" * (sum(widths) + 4) + "\n"
+        res += "\n".join(
+            "|".join(f"{v:^{w}}" for v, w in zip(row, widths)) for row in rows
+        )
+        if self.counters:
+            res += "\n\nCounters:\n" + "\n".join(
+                f"{self.format_key(key)}: {value}"
+                for key, value in self.counters.items()
+            )
+        return res + "\n"
@@ -0,0 +1,50 @@
+"""
+This module counts n-grams of the words of a text with a streaming sliding
+window over integer token ids.
+"""
+
+from collections import Counter
+
+from frequency_analysis_text.tokenizer import TOKEN_PATTERN
+
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+
+def count_ngrams(chunks, n=2, min_count=1, pattern=TOKEN_PATTERN):
+    """
+    Counts the n-grams of the tokens in every row of the text, given as
+    an iterable of chunks that end on the end of a row. N-grams do not cross
+    rows. Every token is encoded as an integer id, and an n-gram is one
+    integer made of n ids, so only the distinct n-grams are kept as numbers.
+    Returns a dict of phrases to counts, without n-grams occurring less than
+    min_count times.
+    """
+    if n < 1:
+        raise ValueError("The n-gram size must be at least 1.")
+    vocabulary = {}
+    counts = Counter()
+    window_mask = (1 << (ID_BITS * n)) - 1
+    for text in chunks:
+        key = size = last_end = 0
+        for match in pattern.finditer(text):
+            if text.find("\n", last_end, match.start()) != -1:
+                key = size = 0
+            last_end = match.end()
+            token_id = vocabulary.setdefault(match.group(), len(vocabulary))
+            key = ((key << ID_BITS) | token_id) & window_mask
+            size += 1
+            if size >= n:
+                counts[key] += 1
+    words = list(vocabulary)
+    ngrams = [
+        (
+            " ".join(
+                words[(key >> (ID_BITS * i)) & ID_MASK] for i in range(n - 1, -1, -1)
+            ),
+            count,
+        )
+        for key, count in counts.items()
+        if count >= min_count
+    ]
+    return dict(sorted(ngrams, key=lambda item: (-item[1], item[0])))
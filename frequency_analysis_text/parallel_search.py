@@ -0,0 +1,136 @@
+"""
+This module scans the rows of a large text for the tokens of a query
+in parallel: the rows are cut into contiguous chunks of about CHUNK_SIZE
+characters, the chunks are counted in a pool of processes (or of threads
+on a Python build without the GIL) and the hits are merged in row order.
+Texts smaller than PARALLEL_MIN_SIZE characters are scanned in one thread,
+where the pool would cost more than it saves. The pool is created once,
+on the first parallel scan, and its processes are started by a fork server
+or spawned, never forked from a process that may run other threads.
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+PARALLEL_MIN_SIZE = 1 << 23
+CHUNK_SIZE = 1 << 20
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def count_rows(query, rows, terms=None):
+    """
+    Returns the list of (row index in rows, count of the searched tokens)
+    of the rows containing the searched tokens.
+    """
+    hits = []
+    for i, row in enumerate(rows):
+        count_words_in_row = query.count(row, terms)
+        if count_words_in_row > 0:
+            hits.append((i, count_words_in_row))
+    return hits
+
+
+def iter_chunks(rows, chunk_size=None):
+    """
+    Yields lists of contiguous rows of about chunk_size characters,
+    by default CHUNK_SIZE.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunk, size = [], 0
+    for row in rows:
+        chunk.append(row)
+        size += len(row) + 1
+        if size >= chunk_size:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def is_free_threaded():
+    """Checks whether Python runs without the GIL, so threads run in parallel."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def get_workers(workers=None):
+    """Returns the number of workers, by default the number of CPU cores."""
+    return max(workers or os.cpu_count() or 1, 1)
+
+
+def get_pool(workers):
+    """
+    Returns the shared pool of the workers, creating it on first use
+    or when the number of workers changes.
+    """
+    global _pool, _pool_workers  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            if is_free_threaded():
+                _pool = ThreadPoolExecutor(workers)
+            else:
+                method = (
+                    "forkserver"
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else "spawn"
+                )
+                _pool = ProcessPoolExecutor(
+                    workers, mp_context=multiprocessing.get_context(method)
+                )
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Stops the workers of the shared pool."""
+    global _pool, _pool_workers  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool, _pool_workers = None, None
+
+
+def search_rows(query, rows, size, terms=None, workers=None, min_size=None):
+    """
+    Returns the list of (row number, count, row) of the rows containing
+    the searched tokens, in row order, numbered from 1. Rows can be any
+    iterable of the size characters and are read lazily; from min_size
+    characters, by default PARALLEL_MIN_SIZE, they are read one chunk
+    at a time and counted by several workers.
+    """
+    workers = get_workers(workers)
+    if min_size is None:
+        min_size = PARALLEL_MIN_SIZE
+    if workers == 1 or size < min_size:
+        hits = []
+        for i, row in enumerate(rows, 1):
+            count_words_in_row = query.count(row, terms)
+            if count_words_in_row > 0:
+                hits.append((i, count_words_in_row, row))
+        return hits
+    executor = get_pool(workers)
+    hits, first_row = [], 1
+    chunks = iter_chunks(rows)
+    pending = deque(
+        (chunk, executor.submit(count_rows, query, chunk, terms))
+        for chunk in islice(chunks, workers * 2)
+    )
+    while pending:
+        chunk, future = pending.popleft()
+        hits.extend((first_row + i, count, chunk[i]) for i, count in future.result())
+        first_row += len(chunk)
+        for next_chunk in islice(chunks, 1):
+            pending.append(
+                (next_chunk, executor.submit(count_rows, query, next_chunk, terms))
+            )
+    return hits
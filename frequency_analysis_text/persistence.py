@@ -0,0 +1,127 @@
+"""
+This module saves analyses without blocking the user: a snapshot of the state
+is taken on the calling thread and written by one background thread
+to a temporary file that is renamed over the target, so an interrupted save
+never leaves a half-written file. Analyses can also be saved at an interval.
+"""
+
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+SAVE_FORMATS = ("json", "pickle", "journal")
+
+
+@contextmanager
+def atomic_write(path, mode="wb", encoding=None):
+    """
+    Opens a temporary file next to the path for writing, which replaces
+    the file at the path once the block finishes without errors.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f"{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class PersistenceWorker:
+    """
+    Saves snapshots of analyses on a background thread, in the order
+    the saves were requested. The callback receives the message of every
+    finished save. The lock is held while a snapshot is taken, so a caller
+    that changes the analysis from another thread should hold it too.
+    """
+
+    def __init__(self, callback=None):
+        """Starts the worker with the callback for the save messages."""
+        self.callback = callback
+        self.lock = threading.RLock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="persistence"
+        )
+        self.autosave_interval = None
+        self.last_saved = None
+        self._timer = None
+        self._generation = 0
+
+    def save(self, obj_text, file_format="journal"):
+        """
+        Takes a snapshot of the analysis and saves it in the background.
+        Returns a Future of the message of the save.
+        """
+        if file_format not in SAVE_FORMATS:
+            raise ValueError(f"Format must be one of: {', '.join(SAVE_FORMATS)}.")
+        with self.lock:
+            snapshot = obj_text.snapshot(for_journal=file_format == "journal")
+            self.last_saved = (obj_text, obj_text.text, len(obj_text.history))
+        future = self.executor.submit(getattr(snapshot, f"save_file_to_{file_format}"))
+        future.add_done_callback(self.report)
+        return future
+
+    def report(self, future):
+        """Passes the message or the error of a finished save to the callback."""
+        try:
+            mess = future.result()
+        except (OSError, ValueError, TypeError) as e:
+            mess = f"Save failed: {e}"
+            with self.lock:
+                self.last_saved = None
+        if self.callback is not None:
+            self.callback(mess)
+
+    def is_changed(self, obj_text):
+        """Checks whether the analysis was changed since it was last saved."""
+        return self.last_saved != (obj_text, obj_text.text, len(obj_text.history))
+
+    def autosave(self, obj_text, file_format="journal"):
+        """Saves the analysis if it was changed. Returns the Future or None."""
+        if obj_text is None or not self.is_changed(obj_text):
+            return None
+        return self.save(obj_text, file_format)
+
+    def start_autosave(self, get_obj_text, interval, file_format="journal"):
+        """
+        Autosaves the analysis returned by get_obj_text every interval seconds
+        on a timer thread.
+        """
+        self.stop_autosave()
+        self.autosave_interval = interval
+        generation = self._generation
+
+        def tick():
+            with self.lock:
+                if generation != self._generation:
+                    return
+                self.autosave(get_obj_text(), file_format)
+                self.schedule(tick)
+
+        self.schedule(tick)
+
+    def schedule(self, tick):
+        """Runs tick after the autosave interval."""
+        self._timer = threading.Timer(self.autosave_interval, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_autosave(self):
+        """Stops autosaving."""
+        self._generation += 1
+        self.autosave_interval = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def close(self):
+        """Stops autosaving and waits for the started saves."""
+        self.stop_autosave()
+        self.executor.shutdown(wait=True)
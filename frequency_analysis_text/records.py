@@ -0,0 +1,110 @@
+"""
+This module reads record-oriented files (.jsonl and .csv) one record at a time,
+taking the text of every record from one field, so that exports with
+a document or a message per record can be analyzed like a .txt file.
+"""
+
+import csv
+import json
+import sys
+
+RECORD_SUFFIXES = (".jsonl", ".csv")
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+class RecordFormatError(ValueError):
+    """
+    An exception raised when a record file is malformed or lacks a field.
+    """
+
+
+class RecordFile:
+    """
+    A .jsonl or .csv file read as a stream of records. Every non-empty record
+    is one row of the text, with its newlines replaced by spaces. Nothing
+    is kept in memory between passes over the file.
+    """
+
+    def __init__(self, path, text_field="text", id_field=None, chunk_size=1 << 22):
+        """
+        Opens the file and checks the fields. Records are identified
+        by the id field or by their number.
+        """
+        self.path = path
+        self.text_field = text_field
+        self.id_field = id_field
+        self.chunk_size = chunk_size
+        if path.suffix == ".csv":
+            with open(path, "r", encoding="utf-8", newline="") as file:
+                fieldnames = csv.DictReader(file).fieldnames or []
+            for field in (text_field, id_field):
+                if field is not None and field not in fieldnames:
+                    raise RecordFormatError(f'The file has no column "{field}".')
+
+    def close(self):
+        """Does nothing, the file is opened for every pass."""
+
+    def iter_raw_records(self):
+        """Yields the records of the file as dicts."""
+        with open(self.path, "r", encoding="utf-8", newline="") as file:
+            if self.path.suffix == ".csv":
+                yield from csv.DictReader(file)
+                return
+            for n_line, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise RecordFormatError(f"Invalid JSON in line {n_line}.") from e
+                if not isinstance(record, dict):
+                    raise RecordFormatError(f"Line {n_line} is not a JSON object.")
+                yield record
+
+    def iter_records(self):
+        """Yields (record id, text) of the records with a non-empty text."""
+        for n_record, record in enumerate(self.iter_raw_records(), 1):
+            value = record.get(self.text_field)
+            if value is None:
+                continue
+            text = " ".join(str(value).splitlines())
+            if text:
+                record_id = (
+                    n_record if self.id_field is None else record.get(self.id_field)
+                )
+                yield record_id, text
+
+    def iter_rows(self):
+        """Yields the texts of the records."""
+        for _, text in self.iter_records():
+            yield text
+
+    def iter_chunks(self):
+        """
+        Yields the texts of the records joined into rows, in chunks
+        of about chunk_size characters.
+        """
+        rows, size = [], 0
+        for text in self.iter_rows():
+            rows.append(text)
+            size += len(text) + 1
+            if size >= self.chunk_size:
+                yield "\n".join(rows) + "\n"
+                rows, size = [], 0
+        if rows:
+            yield "\n".join(rows) + "\n"
+
+    def read_text(self):
+        """Returns the texts of all records as rows of one text."""
+        return "".join(self.iter_chunks())
+
+    def sample(self, size=1 << 20):
+        """Returns the texts of the first records, about size characters."""
+        rows, total = [], 0
+        for text in self.iter_rows():
+            rows.append(text)
+            total += len(text) + 1
+            if total >= size:
+                break
+        return "\n".join(rows)
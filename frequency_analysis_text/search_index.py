@@ -0,0 +1,615 @@
+"""
+This module contains the indexes used to speed up searches in the text:
+a substring index and a fuzzy deletion index over the distinct vocabulary, a token index
+that maps every word to the rows it occurs in, positional postings
+for phrases and a sparse matrix of the counts of the words in every row.
+"""
+
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Sequence
+
+from frequency_analysis_text.fuzzy import FUZZY_DISTANCE, DeletionIndex
+from frequency_analysis_text.tokenizer import (
+    POSITION_BITS,
+    TOKEN_PATTERN,
+    PhraseQuery,
+    tokenize_positions,
+    tokenize_rows,
+)
+
+POSITION_MASK = (1 << POSITION_BITS) - 1
+
+
+def contains(keys, key):
+    """Checks whether the sorted keys contain the key."""
+    i = bisect_left(keys, key)
+    return i < len(keys) and keys[i] == key
+
+
+def find_row(rows, n_row, low=0):
+    """
+    Returns the index in a postings array of the pair of the row number,
+    or of the first pair of a larger row number, searching from the index low.
+    """
+    low, high = low // 2, len(rows) // 2
+    while low < high:
+        middle = (low + high) // 2
+        if rows[2 * middle] < n_row:
+            low = middle + 1
+        else:
+            high = middle
+    return 2 * low
+
+
+def replace_rows(rows, changes):
+    """
+    Returns a copy of the postings array with the counts of the rows
+    replaced by changes, a sorted list of (row number, count).
+    A count of 0 removes the row.
+    """
+    res = array("I")
+    last = 0
+    for n_row, count in changes:
+        i = find_row(rows, n_row, last)
+        res.extend(rows[last:i])
+        if count:
+            res.extend((n_row, count))
+        last = i + 2 if i < len(rows) and rows[i] == n_row else i
+    res.extend(rows[last:])
+    return res
+
+
+def replace_keys(keys, changes):
+    """
+    Returns a copy of the array of the positional keys with the keys
+    of the rows replaced by changes, a sorted list of (row base, new keys).
+    """
+    res = array("Q")
+    last = 0
+    for base, row_keys in changes:
+        start = bisect_left(keys, base, last)
+        end = bisect_left(keys, base + (1 << POSITION_BITS), start)
+        res.extend(keys[last:start])
+        res.extend(row_keys)
+        last = end
+    res.extend(keys[last:])
+    return res
+
+
+class SubstringIndex:
+    """
+    An n-gram index over the distinct words, used to find all words
+    that contain a given substring.
+    """
+
+    max_gram = 3
+
+    def __init__(self, words):
+        """Builds the index from an iterable of distinct words."""
+        self.words = list(words)
+        self.grams = {}
+        for word_id, word in enumerate(self.words):
+            word_grams = set()
+            for size in range(1, self.max_gram + 1):
+                for start in range(len(word) - size + 1):
+                    word_grams.add(word[start : start + size])
+            for gram in word_grams:
+                self.grams.setdefault(gram, []).append(word_id)
+
+    def find(self, sub):
+        """
+        Returns all words that contain the substring.
+        """
+        if len(sub) <= self.max_gram:
+            return [self.words[word_id] for word_id in self.grams.get(sub, [])]
+        candidates = None
+        for start in range(len(sub) - self.max_gram + 1):
+            ids = self.grams.get(sub[start : start + self.max_gram])
+            if not ids:
+                return []
+            if candidates is None or len(ids) < len(candidates):
+                candidates = ids
+        return [
+            self.words[word_id] for word_id in candidates if sub in self.words[word_id]
+        ]
+
+
+class Vocabulary:
+    """
+    The distinct tokens of a text with their normalized forms. The lowercase
+    and casefolded forms are grouped once per vocabulary, on first use.
+    """
+
+    def __init__(self, words):
+        """Initializes the vocabulary from a dict or a set of the tokens."""
+        self.words = words
+        self._forms = {}
+        self._substring_index = None
+        self._deletion_index = None
+
+    def forms(self, kind="lower"):
+        """
+        Returns a dict of the "lower" or "casefold" forms to the tokens having them.
+        """
+        groups = self._forms.get(kind)
+        if groups is None:
+            normalize = {"lower": str.lower, "casefold": str.casefold}[kind]
+            groups = {}
+            for word in self.words:
+                groups.setdefault(normalize(word), []).append(word)
+            self._forms[kind] = groups
+        return groups
+
+    def find(self, sub):
+        """Returns the tokens whose lowercase form contains the lowercase substring."""
+        if self._substring_index is None:
+            self._substring_index = SubstringIndex(self.forms("lower"))
+        forms = self.forms("lower")
+        return [
+            word for form in self._substring_index.find(sub) for word in forms[form]
+        ]
+
+    def fuzzy(self, word, max_distance=FUZZY_DISTANCE):
+        """
+        Returns the tokens whose lowercase form is within max_distance edits
+        of the lowercase word.
+        """
+        index = self._deletion_index
+        if index is None or index.max_distance < max_distance:
+            index = DeletionIndex(
+                self.forms("lower"), max(max_distance, FUZZY_DISTANCE)
+            )
+            self._deletion_index = index
+        forms = self.forms("lower")
+        return [
+            token for form in index.find(word, max_distance) for token in forms[form]
+        ]
+
+
+class RowsView(Sequence):
+    """
+    The non-empty rows of a text, sliced from the text on demand
+    instead of being stored as separate strings.
+    """
+
+    def __init__(self, text):
+        """Finds the offsets of the non-empty rows in the text."""
+        self.text = text
+        self.starts = array("Q")
+        self.ends = array("Q")
+        for match in re.finditer(r"[^\n]+", text):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+
+    def extended(self, text, start):
+        """
+        Returns the rows of the longer text, which begins with the current one:
+        the rows that began before the offset start and the rows found from it.
+        """
+        rows = RowsView.__new__(RowsView)
+        rows.text = text
+        n_rows = bisect_left(self.starts, start)
+        rows.starts = self.starts[:n_rows]
+        rows.ends = self.ends[:n_rows]
+        for match in re.compile(r"[^\n]+").finditer(text, start):
+            rows.starts.append(match.start())
+            rows.ends.append(match.end())
+        return rows
+
+    def __getitem__(self, i):
+        return self.text[self.starts[i] : self.ends[i]]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        text = self.text
+        for start, end in zip(self.starts, self.ends):
+            yield text[start:end]
+
+
+class RowTermMatrix:
+    """
+    A sparse matrix of the numbers of occurrences of the words in the rows,
+    stored by rows: the word ids and counts of the row number n are
+    indices[indptr[n - 1] : indptr[n]] and data[indptr[n - 1] : indptr[n]].
+    """
+
+    def __init__(self, vocabulary=None, word_ids=None):
+        """Initializes an empty matrix over the vocabulary."""
+        self.vocabulary = [] if vocabulary is None else vocabulary
+        self.word_ids = {} if word_ids is None else word_ids
+        self.indptr = array("Q", (0,))
+        self.indices = array("I")
+        self.data = array("I")
+
+    def __len__(self):
+        """Returns the number of rows."""
+        return len(self.indptr) - 1
+
+    def get_word_id(self, word):
+        """Returns the id of the word, adding it to the vocabulary if needed."""
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.vocabulary)
+            self.word_ids[word] = word_id
+            self.vocabulary.append(word)
+        return word_id
+
+    def append_row(self, counts):
+        """Adds a row from a dict of words to their counts."""
+        self.indices.extend(map(self.get_word_id, counts))
+        self.data.extend(counts.values())
+        self.indptr.append(len(self.indices))
+
+    def row(self, n_row):
+        """Returns a dict of the words of the row to their counts."""
+        start, end = self.indptr[n_row - 1], self.indptr[n_row]
+        return {
+            self.vocabulary[word_id]: count
+            for word_id, count in zip(self.indices[start:end], self.data[start:end])
+        }
+
+    @classmethod
+    def from_postings(cls, postings, n_rows):
+        """Builds the matrix from the postings of a TextIndex."""
+        rows = [[] for _ in range(n_rows)]
+        matrix = cls()
+        for word, word_rows in postings.items():
+            word_id = matrix.get_word_id(word)
+            for n_row, count in zip(word_rows[::2], word_rows[1::2]):
+                rows[n_row - 1].append((word_id, count))
+        for row in rows:
+            for word_id, count in row:
+                matrix.indices.append(word_id)
+                matrix.data.append(count)
+            matrix.indptr.append(len(matrix.indices))
+        return matrix
+
+    def updated(self, changed_rows):
+        """
+        Returns a new matrix with the rows replaced by the dicts of counts
+        in changed_rows, a sorted list of (row number, counts). The unchanged
+        rows are copied as array slices and the vocabulary is shared.
+        """
+        matrix = RowTermMatrix(self.vocabulary, self.word_ids)
+        last = 0
+        for n_row, counts in changed_rows:
+            start = self.indptr[last]
+            end = self.indptr[n_row - 1]
+            matrix.indices.extend(self.indices[start:end])
+            matrix.data.extend(self.data[start:end])
+            shift = len(matrix.indices) - end
+            matrix.indptr.extend(
+                offset + shift for offset in self.indptr[last + 1 : n_row]
+            )
+            matrix.append_row(counts)
+            last = n_row
+        start = self.indptr[last]
+        matrix.indices.extend(self.indices[start:])
+        matrix.data.extend(self.data[start:])
+        shift = len(matrix.indices) - len(self.indices)
+        matrix.indptr.extend(offset + shift for offset in self.indptr[last + 1 :])
+        return matrix
+
+
+class TextIndex:
+    """
+    The tokenization of one version of the text: its non-empty rows,
+    the rows in which every token occurs and the sparse row by token matrix
+    of counts. Postings are flat arrays of (row number, number of occurrences)
+    pairs. The counter, the search, highlighting and replacing all use it,
+    so the text is tokenized once per version. The positions of the tokens
+    in the rows are indexed on the first phrase search.
+    """
+
+    def __init__(self, text, lean=False, postings=None, previous=None, skip=None):
+        """
+        Builds the index for the text. A lean index keeps row offsets
+        instead of copies of the rows. Postings built earlier for the same
+        text can be passed to skip tokenizing. With the index of the previous
+        version of the text only the changed rows are tokenized, and only
+        the postings of the changed words are copied; an index never changes
+        once it is built, so it can be searched from several threads.
+        The tokens for which skip returns True are not indexed.
+        """
+        self.text = text
+        self.skip = skip
+        if lean:
+            self.rows = RowsView(text)
+        else:
+            self.rows = [row for row in text.split("\n") if row]
+        self._vocabulary = None
+        self._matrix = None
+        self._positions = None
+        if postings is not None:
+            self.postings = postings
+        elif previous is not None and len(previous.rows) == len(self.rows):
+            self.update_from(previous)
+        else:
+            self.postings = tokenize_rows(self.rows, skip)
+
+    @classmethod
+    def extended(cls, previous, tail):
+        """
+        Returns the index of the text of the previous index followed
+        by tail. Only the last row of the previous text, if tail continues it,
+        and the rows of tail are tokenized; the arrays of the other words
+        are shared with the previous index, which stays unchanged.
+        """
+        index = cls.__new__(cls)
+        index.text = previous.text + tail
+        index.skip = previous.skip
+        index._vocabulary = None
+        index._matrix = None
+        postings = dict(previous.postings)
+        positions = None if previous._positions is None else dict(previous._positions)
+        start = len(previous.text)
+        first_row = len(previous.rows) + 1
+        if previous.rows and previous.text[-1:] != "\n" and tail[:1] != "\n":
+            last_row = previous.rows[-1]
+            start -= len(last_row)
+            first_row -= 1
+            for word in index.count_words(last_row, index.skip):
+                postings[word] = replace_rows(postings[word], [(first_row, 0)])
+            if positions is not None:
+                base = first_row << POSITION_BITS
+                for word in index.row_positions(last_row):
+                    positions[word] = replace_keys(positions[word], [(base, ())])
+        if isinstance(previous.rows, RowsView):
+            index.rows = previous.rows.extended(index.text, start)
+            new_rows = [index.rows[i] for i in range(first_row - 1, len(index.rows))]
+        else:
+            new_rows = [row for row in index.text[start:].split("\n") if row]
+            index.rows = previous.rows[: first_row - 1] + new_rows
+        for word, rows in tokenize_rows(new_rows, index.skip, first_row).items():
+            postings[word] = postings[word] + rows if word in postings else rows
+        index.postings = {word: rows for word, rows in postings.items() if rows}
+        if positions is not None:
+            for word, keys in tokenize_positions(
+                new_rows, index.skip, first_row
+            ).items():
+                positions[word] = positions[word] + keys if word in positions else keys
+            positions = {word: keys for word, keys in positions.items() if keys}
+        index._positions = positions
+        return index
+
+    @staticmethod
+    def count_words(row, skip=None):
+        """
+        Returns a Counter of the tokens of the row, without the tokens
+        for which skip returns True.
+        """
+        counts = Counter(TOKEN_PATTERN.findall(row))
+        if skip is not None:
+            for token in [token for token in counts if skip(token)]:
+                del counts[token]
+        return counts
+
+    def update_from(self, previous):
+        """
+        Takes over the postings and the matrix of the previous index
+        and updates them for the rows that differ. The arrays of the changed
+        words are replaced by updated copies, so the previous index
+        stays unchanged and can still be searched.
+        """
+        changed_rows = []
+        row_changes, key_changes = {}, {}
+        for n_row, (old_row, row) in enumerate(zip(previous.rows, self.rows), 1):
+            if old_row == row:
+                continue
+            old_counts = self.count_words(old_row, self.skip)
+            counts = self.count_words(row, self.skip)
+            for word in old_counts.keys() | counts.keys():
+                if old_counts[word] != counts[word]:
+                    row_changes.setdefault(word, []).append((n_row, counts[word]))
+            if previous._positions is not None:
+                old_positions = self.row_positions(old_row)
+                positions = self.row_positions(row)
+                base = n_row << POSITION_BITS
+                for word in old_positions.keys() | positions.keys():
+                    if old_positions.get(word) != positions.get(word):
+                        key_changes.setdefault(word, []).append(
+                            (base, [base | i for i in positions.get(word, ())])
+                        )
+            changed_rows.append((n_row, counts))
+        self.postings = dict(previous.postings)
+        for word, changes in row_changes.items():
+            rows = replace_rows(self.postings.get(word, array("I")), changes)
+            if rows:
+                self.postings[word] = rows
+            else:
+                self.postings.pop(word, None)
+        if previous._positions is not None:
+            self._positions = dict(previous._positions)
+            for word, changes in key_changes.items():
+                keys = replace_keys(self._positions.get(word, array("Q")), changes)
+                if keys:
+                    self._positions[word] = keys
+                else:
+                    self._positions.pop(word, None)
+        if previous._matrix is not None:
+            self._matrix = previous._matrix.updated(changed_rows)
+
+    def row_positions(self, row):
+        """
+        Returns a dict of the indexed tokens of the row to the lists
+        of their positions.
+        """
+        positions = {}
+        for position, token in enumerate(TOKEN_PATTERN.findall(row)):
+            if self.skip is None or not self.skip(token):
+                positions.setdefault(token, []).append(position)
+        return positions
+
+    def counts(self):
+        """Returns a dict of the tokens to their numbers of occurrences."""
+        return {word: sum(rows[1::2]) for word, rows in self.postings.items()}
+
+    @property
+    def row_matrix(self):
+        """Returns the row by word matrix, building it from the postings if needed."""
+        if self._matrix is None:
+            self._matrix = RowTermMatrix.from_postings(self.postings, len(self.rows))
+        return self._matrix
+
+    @property
+    def vocabulary(self):
+        """Returns the Vocabulary of the tokens, building it on first use."""
+        if self._vocabulary is None:
+            self._vocabulary = Vocabulary(self.postings)
+        return self._vocabulary
+
+    def hits(self, words):
+        """
+        Returns a sorted list of (row number, number of words) for the rows
+        that contain any of the tokens.
+        """
+        rows_counts = {}
+        for word in words:
+            rows = self.postings.get(word, ())
+            for n_row, count in zip(rows[::2], rows[1::2]):
+                rows_counts[n_row] = rows_counts.get(n_row, 0) + count
+        return sorted(rows_counts.items())
+
+    @property
+    def positions(self):
+        """
+        Returns the positional postings, a dict of the tokens to the sorted
+        keys row number << POSITION_BITS | position, building them if needed.
+        """
+        if self._positions is None:
+            self._positions = tokenize_positions(self.rows, self.skip)
+        return self._positions
+
+    def occurrences(self, words):
+        """Returns the sorted keys of the positions of any of the tokens."""
+        if len(words) == 1:
+            return self.positions.get(words[0], ())
+        keys = []
+        for word in words:
+            keys.extend(self.positions.get(word, ()))
+        keys.sort()
+        return keys
+
+    def find_phrase(self, phrase):
+        """
+        Returns the sorted keys of the starts of the non-overlapping
+        occurrences of the phrase, a list of TokenQuery objects. The positions
+        of the rarest word are checked against the postings of the others.
+        """
+        if not phrase:
+            return []
+        vocabulary = self.vocabulary
+        occurrences = [self.occurrences(query.terms(vocabulary)) for query in phrase]
+        pivot = min(range(len(phrase)), key=lambda i: len(occurrences[i]))
+        starts = []
+        for key in occurrences[pivot]:
+            if key & POSITION_MASK < pivot:
+                continue
+            start = key - pivot
+            if starts and start < starts[-1] + len(phrase):
+                continue
+            if all(
+                contains(keys, start + i)
+                for i, keys in enumerate(occurrences)
+                if i != pivot
+            ):
+                starts.append(start)
+        return starts
+
+    @staticmethod
+    def find_near(keys, others, intervals):
+        """
+        Returns the keys that have one of the sorted other keys in the same row
+        between key + low and key + high, for one of the (low, high) intervals.
+        """
+        res = []
+        for key in keys:
+            row_start = key & ~POSITION_MASK
+            for low, high in intervals:
+                i = bisect_left(others, max(key + low, row_start))
+                if i < len(others) and others[i] <= min(
+                    key + high, key | POSITION_MASK
+                ):
+                    res.append(key)
+                    break
+        return res
+
+    def search_phrase(self, query):
+        """
+        Returns a sorted list of (row number, number of occurrences)
+        for the rows that contain the PhraseQuery.
+        """
+        found = [self.find_phrase(phrase) for phrase in query.phrases]
+        if query.distance is None:
+            keys = found[0]
+        else:
+            (first, second), distance = found, query.distance
+            size_first, size_second = map(len, query.phrases)
+            keys = {
+                (key, size_first)
+                for key in self.find_near(
+                    first,
+                    second,
+                    (
+                        (size_first, size_first + distance - 1),
+                        (-size_second - distance + 1, -size_second),
+                    ),
+                )
+            }
+            keys.update(
+                (key, size_second)
+                for key in self.find_near(
+                    second,
+                    first,
+                    (
+                        (size_second, size_second + distance - 1),
+                        (-size_first - distance + 1, -size_first),
+                    ),
+                )
+            )
+            keys = [key for key, _ in keys]
+        rows_counts = Counter(key >> POSITION_BITS for key in keys)
+        return sorted(rows_counts.items())
+
+    def search(self, query):
+        """
+        Returns a sorted list of (row number, number of words) for the rows
+        that contain the tokens of the TokenQuery or the PhraseQuery.
+        """
+        if isinstance(query, PhraseQuery):
+            return self.search_phrase(query)
+        return self.hits(query.terms(self.vocabulary))
+
+    def rows_with_all(self, words):
+        """
+        Returns a sorted list of (row number, counts of the words)
+        for the rows that contain all the lowercase words, in any case.
+        """
+        forms = self.vocabulary.forms("lower")
+        groups = [forms.get(word, ()) for word in words]
+        if not words or not all(groups):
+            return []
+        shortest = min(
+            groups, key=lambda group: sum(len(self.postings[word]) for word in group)
+        )
+        matrix = self.row_matrix
+        res = []
+        for n_row, _ in self.hits(shortest):
+            counts = matrix.row(n_row)
+            row_counts = tuple(
+                sum(counts.get(word, 0) for word in group) for group in groups
+            )
+            if all(row_counts):
+                res.append((n_row, row_counts))
+        return res
+
+    def row_frequencies(self, n_row):
+        """Returns a list of (word, count) of the row, the most frequent first."""
+        return sorted(
+            self.row_matrix.row(n_row).items(), key=lambda item: (-item[1], item[0])
+        )
@@ -0,0 +1,500 @@
+"""
+A local asyncio HTTP/JSON server for text analysis.
+
+It keeps a pool of open AnalysisText sessions, evicts idle ones and runs
+the CPU-heavy work in an executor, so the event loop stays responsive.
+Searches only read a published version of the text, so they run
+in parallel with each other and with the edits; the edits of a session
+are serialized by its lock.
+
+    python -m frequency_analysis_text.server --port 8080
+
+Routes:
+    GET    /health
+    POST   /sessions                  {"path": "text.txt", "text_field": "text"}
+    GET    /sessions/{id}
+    DELETE /sessions/{id}
+    GET    /sessions/{id}/count       ?top=10
+    POST   /sessions/{id}/mode        {"mode": "root_mode_on"}
+                                      {"mode": "fuzzy_mode_on", "distance": 1}
+    POST   /sessions/{id}/search      {"word": "player"}
+    POST   /sessions/{id}/replace     {"new_word": "athlete"}
+    POST   /sessions/{id}/undo
+    POST   /sessions/{id}/redo
+    POST   /sessions/{id}/save        {"format": "json", "pickle" or "journal"}
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import pickle
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from frequency_analysis_text.functionality import (
+    AnalysisText,
+    EmptyFileError,
+    InvalidFileFormatError,
+)
+from frequency_analysis_text.versions import SearchHandle
+
+MAX_BODY = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+MODES = (
+    "root_mode_on",
+    "root_mode_off",
+    "case_sens_on",
+    "case_sens_off",
+    "smart_mode_on",
+    "smart_mode_off",
+    "fuzzy_mode_on",
+    "fuzzy_mode_off",
+    "memory_lean_on",
+    "memory_lean_off",
+)
+
+
+class HTTPError(Exception):
+    """An error returned to the client with the HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    """
+    An open AnalysisText with a lock serializing the edits of it
+    and the handle keeping the last search of the session.
+    """
+
+    def __init__(self, session_id, obj_text):
+        self.session_id = session_id
+        self.obj_text = obj_text
+        self.handle = SearchHandle(obj_text)
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionPool:
+    """Open sessions with a size limit and eviction of idle sessions."""
+
+    def __init__(self, max_sessions=100, idle_timeout=600):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+
+    def add(self, obj_text):
+        """
+        Adds a session, evicting the least recently used idle one if the pool
+        is full. Sessions serving a request are never evicted.
+        """
+        if len(self.sessions) >= self.max_sessions:
+            idle = [s for s in self.sessions.values() if not s.lock.locked()]
+            if not idle:
+                raise HTTPError(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "All sessions are busy."
+                )
+            oldest = min(idle, key=lambda s: s.last_used)
+            del self.sessions[oldest.session_id]
+        session = Session(uuid.uuid4().hex, obj_text)
+        self.sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id):
+        """Returns the session and marks it as used."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Session not found.")
+        session.last_used = time.monotonic()
+        return session
+
+    def remove(self, session_id):
+        """Closes the session."""
+        if self.sessions.pop(session_id, None) is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Session not found.")
+
+    def evict_idle(self):
+        """Closes the sessions that were not used for idle_timeout seconds."""
+        now = time.monotonic()
+        idle = [
+            session_id
+            for session_id, session in self.sessions.items()
+            if now - session.last_used > self.idle_timeout and not session.lock.locked()
+        ]
+        for session_id in idle:
+            del self.sessions[session_id]
+        return len(idle)
+
+
+class AnalysisServer:
+    """The HTTP/JSON server of text analysis sessions."""
+
+    def __init__(
+        self, base_dir=None, max_sessions=100, idle_timeout=600, max_workers=None
+    ):
+        """
+        Initializes the server. If base_dir is set, only files inside it can be loaded.
+        """
+        self.base_dir = Path(base_dir).resolve() if base_dir else None
+        self.pool = SessionPool(max_sessions, idle_timeout)
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.server = None
+        self.eviction_task = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Starts listening, returns the bound port."""
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        self.eviction_task = asyncio.create_task(self.evict_idle_sessions())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stops the server and the executor."""
+        if self.eviction_task:
+            self.eviction_task.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def evict_idle_sessions(self):
+        """Periodically closes idle sessions."""
+        while True:
+            await asyncio.sleep(max(self.pool.idle_timeout / 10, 0.1))
+            self.pool.evict_idle()
+
+    async def run_in_executor(self, func, *args):
+        """Runs the blocking function in the executor."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    async def handle_connection(self, reader, writer):
+        """Serves the requests of one keep-alive connection."""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    writer.write(make_response(e.status, {"error": str(e)}, False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, data = await self.dispatch(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(make_response(status, data, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        """Routes the request, returns the status and the JSON data."""
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object.")
+            query = {key: value[-1] for key, value in parse_qs(url.query).items()}
+            return HTTPStatus.OK, await self.route(method, parts, data, query)
+        except json.JSONDecodeError:
+            return HTTPStatus.BAD_REQUEST, {"error": "Invalid JSON."}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except (EmptyFileError, InvalidFileFormatError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except (PermissionError, FileNotFoundError):
+            return HTTPStatus.NOT_FOUND, {"error": "File not found or access denied."}
+        except (AttributeError, KeyError, pickle.UnpicklingError, EOFError):
+            return HTTPStatus.BAD_REQUEST, {"error": "The file is corrupted."}
+        except OSError as e:
+            return HTTPStatus.BAD_REQUEST, {
+                "error": f"The file cannot be read: {e.strerror or e}."
+            }
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Error handling %s %s", method, target)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."}
+
+    async def route(self, method, parts, data, query):
+        """Calls the handler of the route."""
+        if parts == ["health"] and method == "GET":
+            return {"status": "ok", "sessions": len(self.pool.sessions)}
+        if parts == ["sessions"] and method == "POST":
+            return await self.open_session(data)
+        if len(parts) < 2 or parts[0] != "sessions":
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Not found.")
+        session = self.pool.get(parts[1])
+        action = parts[2] if len(parts) == 3 else None
+        routes = {
+            ("GET", None): self.show_session,
+            ("DELETE", None): self.close_session,
+            ("GET", "count"): self.count,
+            ("POST", "mode"): self.set_mode,
+            ("POST", "search"): self.search,
+            ("POST", "replace"): self.replace,
+            ("POST", "undo"): self.undo,
+            ("POST", "redo"): self.redo,
+            ("POST", "save"): self.save,
+        }
+        handler = routes.get((method, action))
+        if handler is None:
+            if any(key[1] == action for key in routes) and len(parts) <= 3:
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed.")
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Not found.")
+        if handler in (self.show_session, self.search):
+            return await handler(session, data, query)
+        async with session.lock:
+            return await handler(session, data, query)
+
+    def resolve_path(self, path):
+        """Checks that the file can be loaded and returns its path."""
+        if not path:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Enter the path to the file.")
+        resolved = Path(path).resolve()
+        if self.base_dir and self.base_dir not in (resolved, *resolved.parents):
+            raise HTTPError(HTTPStatus.FORBIDDEN, "Access denied.")
+        return resolved
+
+    async def open_session(self, data):
+        """Loads the file into a new session."""
+        path = self.resolve_path(data.get("path"))
+
+        def load():
+            obj_text = AnalysisText(
+                path,
+                collect_metrics=True,
+                memory_lean=bool(data.get("memory_lean")),
+                use_mmap=bool(data.get("use_mmap")),
+                text_field=data.get("text_field", "text"),
+                id_field=data.get("id_field"),
+            )
+            obj_text.load_file()
+            obj_text.update_result_counter()
+            return obj_text
+
+        session = self.pool.add(await self.run_in_executor(load))
+        return {"session": session.session_id, **describe(session.obj_text)}
+
+    async def show_session(self, session, data, query):
+        """Returns the state of the session."""
+        return {"session": session.session_id, **describe(session.obj_text)}
+
+    async def close_session(self, session, data, query):
+        """Closes the session."""
+        self.pool.remove(session.session_id)
+        return {"message": "Session closed."}
+
+    async def count(self, session, data, query):
+        """Returns the word frequencies, optionally only the top ones."""
+        obj_text = session.obj_text
+
+        def count_words():
+            obj_text.update_result_counter()
+            items = obj_text.result_counter.items()
+            if "top" in query:
+                items = sorted(items, key=lambda item: -item[1])[: int(query["top"])]
+            return dict(items)
+
+        return {"result_counter": await self.run_in_executor(count_words)}
+
+    async def set_mode(self, session, data, query):
+        """Switches a search mode."""
+        mode = data.get("mode")
+        if mode not in MODES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Mode must be one of {MODES}.")
+        args = (str(data.get("distance", "")),) if mode == "fuzzy_mode_on" else ()
+        return {
+            "message": await self.run_in_executor(
+                getattr(session.obj_text, mode), *args
+            )
+        }
+
+    async def search(self, session, data, query):
+        """Searches for the word."""
+        res = await self.run_in_executor(
+            session.handle.search, str(data.get("word", "")).strip()
+        )
+        return {"found": len(res) == 3, "result": res[0]}
+
+    async def replace(self, session, data, query):
+        """Replaces or removes the last searched words."""
+        return {
+            "message": await self.run_in_executor(
+                session.handle.replace,
+                str(data.get("new_word", "")),
+            )
+        }
+
+    async def undo(self, session, data, query):
+        """Undoes the last edit."""
+        return {"message": await self.run_writing(session.obj_text, "undo")}
+
+    async def redo(self, session, data, query):
+        """Redoes the last undone edit."""
+        return {"message": await self.run_writing(session.obj_text, "redo")}
+
+    async def run_writing(self, obj_text, method):
+        """
+        Runs the method editing the analysis in the executor and publishes
+        the new version of the text there too.
+        """
+
+        def write():
+            with obj_text.writing():
+                return getattr(obj_text, method)()
+
+        return await self.run_in_executor(write)
+
+    async def save(self, session, data, query):
+        """Saves the analysis to a .json, .pkl or .journal file."""
+        fmt = data.get("format", "json")
+        if fmt not in ("json", "pickle", "journal"):
+            raise HTTPError(
+                HTTPStatus.BAD_REQUEST, "Format must be json, pickle or journal."
+            )
+        method = getattr(session.obj_text, f"save_file_to_{fmt}")
+        return {"message": await self.run_in_executor(method)}
+
+
+def describe(obj_text):
+    """Returns the summary of the analysis."""
+    return {
+        "path": str(obj_text.path),
+        "language": obj_text.language,
+        "words": len(obj_text.result_counter or ()),
+        "modes": {
+            "root_mode": obj_text.root_mode,
+            "case_sensitive": obj_text.case_sensitive,
+            "smart_mode": obj_text.smart_mode,
+            "fuzzy_mode": obj_text.fuzzy_mode,
+            "memory_lean": obj_text.memory_lean,
+        },
+    }
+
+
+async def read_request(reader):
+    """
+    Reads one HTTP request, returns (method, target, headers, body)
+    or None if the connection was closed. Raises HTTPError if the length
+    of the body is invalid or above MAX_BODY.
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+    if length > MAX_BODY:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+    body = (await reader.readexactly(length)).decode("utf-8") if length else ""
+    return method.upper(), target, headers, body
+
+
+def make_response(status, data, keep_alive=True):
+    """Encodes an HTTP response with a JSON body."""
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+    )
+    return head.encode("latin-1") + body
+
+
+async def fetch(host, port, method, path, data=None):
+    """
+    A minimal client: sends one request and returns (status, JSON data).
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode(
+                "latin-1"
+            )
+            + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        payload = await reader.readexactly(int(headers.get("content-length", 0)))
+        return int(status_line.split()[1]), json.loads(payload)
+    finally:
+        writer.close()
+
+
+async def serve(host, port, **kwargs):
+    """Runs the server until it is cancelled."""
+    server = AnalysisServer(**kwargs)
+    port = await server.start(host, port)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    """Parses the arguments and runs the server."""
+    parser = argparse.ArgumentParser(description="Text analysis HTTP/JSON server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--base-dir", help="only files inside it can be loaded")
+    parser.add_argument("--max-sessions", type=int, default=100)
+    parser.add_argument("--idle-timeout", type=float, default=600)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                base_dir=args.base_dir,
+                max_sessions=args.max_sessions,
+                idle_timeout=args.idle_timeout,
+                max_workers=args.workers,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
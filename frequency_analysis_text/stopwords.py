@@ -0,0 +1,94 @@
+"""
+This module contains the stopwords of the supported languages and the filter
+of the tokens left out of an analysis while it is counted and indexed.
+"""
+
+STOPWORDS = {
+    "en": frozenset("""
+        a about above after again against all am an and any are as at be because
+        been before being below between both but by can could did do does doing
+        down during each few for from further had has have having he her here
+        hers herself him himself his how i if in into is it its itself just me
+        more most my myself no nor not now of off on once only or other our ours
+        ourselves out over own same she should so some such than that the their
+        theirs them themselves then there these they this those through to too
+        under until up very was we were what when where which while who whom why
+        will with would you your yours yourself yourselves
+        """.split()),
+    "de": frozenset("""
+        aber alle allem allen aller alles als also am an ander andere anderem
+        anderen anderer anderes auch auf aus bei bin bis bist da damit dann das
+        dass dem den denn der des dessen dich die dies diese diesem diesen dieser
+        dieses dir doch dort du durch ein eine einem einen einer eines er es
+        etwas euch euer eure für gegen hat hatte hatten hier hin hinter ich ihm
+        ihn ihnen ihr ihre ihrem ihren ihrer ihres im in indem ins ist jede jedem
+        jeden jeder jedes jene jetzt kann kein keine man manche mein meine mich
+        mir mit muss nach nicht nichts noch nun nur ob oder ohne sehr sein seine
+        seinem seinen seiner sich sie sind so solche soll sollte sondern sonst
+        über um und uns unser unter viel vom von vor war waren warst was weil
+        welche wenn werde werden wie wieder will wir wird wo wollen würde zu zum
+        zur zwar zwischen
+        """.split()),
+    "uk": frozenset("""
+        а але б би був була були було бути в вам вас ви від він вона вони воно
+        все всі втім де для до же з за зі і із їй їм їх його її й кожен коли
+        котрий куди лише мене мені ми мій на над навіть нам нас не неї нею ним
+        них ні ніж ну о об один однак під після по поки при про себе сам собі
+        та так також там те теж ти тим то тобі тож той тому тут у усе усі хоч
+        хто це цей ці цього цим цих ця цю чи чим що щоб як яка який які якщо
+        """.split()),
+    "ru": frozenset("""
+        а без более бы был была были было быть в вам вас весь во вот все всего
+        всех вы где да даже для до его ее если есть еще же за здесь и из или им
+        их к как когда который ли либо мне может мы на над надо наш не него нее
+        нет ни них но ну о об однако он она они оно от очень по под при с со
+        так также такой там те тем то того тоже той только том ты у уже хотя
+        чего чей чем что чтобы чье чья эта эти это этот я
+        """.split()),
+}
+
+
+class TokenFilter:
+    """
+    The tokens left out of an analysis: the stopwords, compared in lowercase,
+    and the words counted fewer than min_count or more than max_count times.
+    Stopwords are left out of both the counter and the index, the count
+    thresholds only apply to the counter.
+    """
+
+    def __init__(self, stopwords=(), min_count=1, max_count=None):
+        """Initializes the filter."""
+        self.stopwords = frozenset(word.lower() for word in stopwords)
+        self.min_count = min_count
+        self.max_count = max_count
+
+    def __bool__(self):
+        """Checks whether the filter leaves out any tokens."""
+        return bool(self.stopwords) or self.min_count > 1 or self.max_count is not None
+
+    def skip(self, token):
+        """Checks whether the token is a stopword."""
+        return token.lower() in self.stopwords
+
+    def apply(self, counts):
+        """
+        Returns a dict of the tokens of the dict of counts that pass the filter.
+        Stopwords are checked once per distinct token.
+        """
+        min_count = self.min_count
+        max_count = float("inf") if self.max_count is None else self.max_count
+        stopwords = self.stopwords
+        return {
+            token: count
+            for token, count in counts.items()
+            if min_count <= count <= max_count
+            and not (stopwords and token.lower() in stopwords)
+        }
+
+    def __str__(self):
+        """Returns the description of the filter."""
+        parts = [f"stopwords: {len(self.stopwords)}" if self.stopwords else ""]
+        if self.min_count > 1 or self.max_count is not None:
+            high = "" if self.max_count is None else self.max_count
+            parts.append(f"counts: {self.min_count}-{high}")
+        return ", ".join(part for part in parts if part) or "off"
@@ -0,0 +1,94 @@
+"""
+This module encodes a text once into a NumPy array of integer token ids
+with a vocabulary table, so that counting, filtering, top-k and per-row
+counts are vectorized. NumPy is optional: HAS_NUMPY tells whether
+the engine can be used.
+"""
+
+import re
+from itertools import chain
+
+from frequency_analysis_text.tokenizer import TOKEN_PATTERN
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+HAS_NUMPY = np is not None
+ROW_START = r"(?m)^(?=[^\n])"
+
+
+class TokenArray:
+    """
+    The tokens of a text as an array of ids into the vocabulary, with the
+    number of the non-empty row of every token.
+    """
+
+    def __init__(self, text, pattern=TOKEN_PATTERN.pattern):
+        """
+        Tokenizes the text in one pass. The start of every non-empty row
+        matches as an empty token, which gives the row numbers of the tokens.
+        """
+        if np is None:
+            raise ImportError("The NumPy engine requires numpy.")
+        self.text = text
+        tokens = re.findall(f"{ROW_START}|{pattern}", text)
+        ids = {word: i for i, word in enumerate(dict.fromkeys(chain(("",), tokens)))}
+        all_ids = np.fromiter(map(ids.__getitem__, tokens), np.uint32, len(tokens))
+        is_row_start = all_ids == 0
+        self.n_rows = int(np.count_nonzero(is_row_start))
+        self.rows = np.cumsum(is_row_start, dtype=np.uint32)[~is_row_start]
+        self.ids = all_ids[~is_row_start] - 1
+        self.vocabulary = list(ids)[1:]
+
+    def __len__(self):
+        """Returns the number of tokens."""
+        return len(self.ids)
+
+    def counts(self):
+        """Returns the array of counts of the vocabulary words."""
+        return np.bincount(self.ids, minlength=len(self.vocabulary))
+
+    def to_dict(self, ids=None):
+        """
+        Returns a dict of the words, all or with the given ids,
+        to their counts, sorted by word.
+        """
+        counts = self.counts().tolist()
+        ids = range(len(self.vocabulary)) if ids is None else ids.tolist()
+        return {
+            self.vocabulary[i]: counts[i]
+            for i in sorted(ids, key=self.vocabulary.__getitem__)
+        }
+
+    def filter(self, min_count=1, max_count=None):
+        """Returns a dict of the words occurring from min_count to max_count times."""
+        counts = self.counts()
+        keep = counts >= min_count
+        if max_count is not None:
+            keep &= counts <= max_count
+        return self.to_dict(np.flatnonzero(keep))
+
+    def top(self, k=10):
+        """Returns the k most frequent words with their counts."""
+        counts = self.counts()
+        if k < len(counts):
+            ids = np.argpartition(-counts, k)[:k]
+        else:
+            ids = np.arange(len(counts))
+        ids = sorted(ids.tolist(), key=lambda i: (-counts[i], self.vocabulary[i]))
+        return [(self.vocabulary[i], int(counts[i])) for i in ids]
+
+    def row_counts(self, words):
+        """
+        Returns a list of (number of the row, count) of the rows
+        containing any of the words.
+        """
+        index = {word: i for i, word in enumerate(self.vocabulary)}
+        word_ids = [index[word] for word in words if word in index]
+        per_row = np.bincount(
+            self.rows[np.isin(self.ids, word_ids)], minlength=self.n_rows + 1
+        )
+        n_rows = np.flatnonzero(per_row)
+        return list(zip(n_rows.tolist(), per_row[n_rows].tolist()))
@@ -0,0 +1,257 @@
+"""
+This module defines the tokens of a text: words, with inner hyphens and
+apostrophes, and numbers. One compiled pattern is used for counting,
+indexing, searching, highlighting and replacing, so all of them agree
+on what a word is.
+"""
+
+import re
+from array import array
+from collections import Counter
+
+from frequency_analysis_text.fuzzy import edit_distance
+
+TOKEN_PATTERN = re.compile(r"\b\w+(?:[-']\w+)*\b|\b\d*\.\d+\b|\b\d+\b")
+NEAR_PATTERN = re.compile(r"(.+?)\s+NEAR/(\d+)\s+(.+)")
+POSITION_BITS = 32
+
+
+def tokenize_rows(rows, skip=None, first_row=1):
+    """
+    Tokenizes the rows in one pass. Returns a dict of the tokens to their
+    postings: flat arrays of (row number, number of occurrences) pairs,
+    the rows numbered from first_row. The tokens for which skip returns True
+    are left out; it is called once per distinct token.
+    """
+    postings = {}
+    skipped = set()
+    findall = TOKEN_PATTERN.findall
+    for n_row, row in enumerate(rows, first_row):
+        for token in findall(row):
+            rows_counts = postings.get(token)
+            if rows_counts is None:
+                if token in skipped:
+                    continue
+                if skip is not None and skip(token):
+                    skipped.add(token)
+                    continue
+                postings[token] = array("I", (n_row, 1))
+            elif rows_counts[-2] == n_row:
+                rows_counts[-1] += 1
+            else:
+                rows_counts.append(n_row)
+                rows_counts.append(1)
+    return postings
+
+
+def tokenize_positions(rows, skip=None, first_row=1):
+    """
+    Tokenizes the rows into positional postings: a dict of the tokens
+    to sorted arrays of keys, row number << POSITION_BITS | the position
+    of the token in the row, the rows numbered from first_row. The tokens
+    for which skip returns True are left out, without changing
+    the positions of the others.
+    """
+    positions = {}
+    skipped = set()
+    findall = TOKEN_PATTERN.findall
+    for n_row, row in enumerate(rows, first_row):
+        base = n_row << POSITION_BITS
+        for position, token in enumerate(findall(row)):
+            keys = positions.get(token)
+            if keys is None:
+                if token in skipped:
+                    continue
+                if skip is not None and skip(token):
+                    skipped.add(token)
+                    continue
+                positions[token] = array("Q", (base | position,))
+            else:
+                keys.append(base | position)
+    return positions
+
+
+def replace_spans(row, spans, new_word):
+    """Returns the row with the sorted (start, end) spans replaced by new_word."""
+    parts, last = [], 0
+    for start, end in spans:
+        parts.append(row[last:start])
+        parts.append(new_word)
+        last = end
+    parts.append(row[last:])
+    return "".join(parts)
+
+
+class TokenQuery:
+    """
+    The tokens searched for: the tokens equal to the word ("exact"),
+    the tokens whose lowercase form is the word ("lower"), contains
+    the word ("contains"), is one of the forms of the word ("forms")
+    or is within an edit distance of the word ("fuzzy", the value is
+    a tuple of the word and the distance).
+    """
+
+    def __init__(self, kind, value):
+        """Initializes the query of the kind."""
+        if kind not in ("exact", "lower", "contains", "forms", "fuzzy"):
+            raise ValueError(f'Unknown query kind "{kind}".')
+        self.kind = kind
+        self.value = value
+
+    def matches(self, token):
+        """Checks whether the token is searched for."""
+        if self.kind == "exact":
+            return token == self.value
+        if self.kind == "lower":
+            return token.lower() == self.value
+        if self.kind == "contains":
+            return self.value in token.lower()
+        if self.kind == "fuzzy":
+            word, max_distance = self.value
+            return edit_distance(token.lower(), word, max_distance) <= max_distance
+        return token.lower() in self.value
+
+    def terms(self, vocabulary):
+        """Returns the tokens of the Vocabulary that are searched for."""
+        if self.kind == "exact":
+            return [self.value] if self.value in vocabulary.words else []
+        if self.kind == "contains":
+            return vocabulary.find(self.value)
+        if self.kind == "fuzzy":
+            return vocabulary.fuzzy(*self.value)
+        forms = vocabulary.forms("lower")
+        values = (self.value,) if self.kind == "lower" else self.value
+        return [token for value in values for token in forms.get(value, ())]
+
+    def literal(self):
+        """
+        Returns (substring, ignore case) that every row with a searched token
+        contains, or None.
+        """
+        if self.kind in ("forms", "fuzzy") or not self.value:
+            return None
+        return self.value, self.kind != "exact"
+
+    def count(self, row, terms=None):
+        """
+        Returns the number of searched tokens in the row.
+        The set of the searched tokens of the text can be given as terms.
+        """
+        matches = self.matches if terms is None else terms.__contains__
+        return sum(
+            count
+            for token, count in Counter(TOKEN_PATTERN.findall(row)).items()
+            if matches(token)
+        )
+
+    def iter_spans(self, row, terms=None):
+        """
+        Yields (start, end) of the searched tokens in the row, lazily.
+        The set of the searched tokens of the text can be given as terms.
+        """
+        matches = self.matches if terms is None else terms.__contains__
+        for match in TOKEN_PATTERN.finditer(row):
+            if matches(match.group()):
+                yield match.span()
+
+    def spans(self, row, terms=None):
+        """Returns a list of (start, end) of the searched tokens in the row."""
+        return list(self.iter_spans(row, terms))
+
+
+class PhraseQuery:
+    """
+    A phrase, a list of TokenQuery objects matching consecutive tokens
+    ("phrase"), or two phrases within distance words of each other ("near").
+    The occurrences of a phrase do not overlap; in "near" queries
+    the occurrences of both phrases that have the other one close are found.
+    """
+
+    def __init__(self, phrases, distance=None):
+        """Initializes the query of one phrase, or of two with the distance."""
+        self.phrases = phrases
+        self.distance = distance
+        self.kind = "phrase" if distance is None else "near"
+
+    def terms(self, vocabulary):
+        """Returns the tokens of the Vocabulary matching any word of the phrases."""
+        return list(
+            dict.fromkeys(
+                term
+                for phrase in self.phrases
+                for query in phrase
+                for term in query.terms(vocabulary)
+            )
+        )
+
+    def literal(self):
+        """
+        Returns (substring, ignore case) that every row with an occurrence
+        contains, or None.
+        """
+        return self.phrases[0][0].literal() if self.phrases[0] else None
+
+    @staticmethod
+    def find_phrase(phrase, tokens):
+        """
+        Returns a list of (start, end) of the non-overlapping occurrences
+        of the phrase in the list of tokens, as token positions.
+        """
+        res = []
+        size = len(phrase)
+        if not size:
+            return res
+        start = 0
+        while start <= len(tokens) - size:
+            if all(query.matches(tokens[start + i]) for i, query in enumerate(phrase)):
+                res.append((start, start + size))
+                start += size
+            else:
+                start += 1
+        return res
+
+    def ranges(self, tokens):
+        """
+        Returns a sorted list of (start, end) of the found occurrences
+        in the list of tokens, as token positions.
+        """
+        found = [self.find_phrase(phrase, tokens) for phrase in self.phrases]
+        if self.distance is None:
+            return found[0]
+        first, second = found
+        res = {
+            a
+            for a in first
+            for b in second
+            if 1 <= max(b[0] - a[1], a[0] - b[1]) + 1 <= self.distance
+        }
+        res.update(
+            b
+            for b in second
+            for a in first
+            if 1 <= max(b[0] - a[1], a[0] - b[1]) + 1 <= self.distance
+        )
+        return sorted(res)
+
+    def count(self, row, terms=None):
+        """Returns the number of the occurrences in the row."""
+        return len(self.ranges(TOKEN_PATTERN.findall(row)))
+
+    def spans(self, row, terms=None):
+        """
+        Returns a sorted list of (start, end) of the occurrences in the row,
+        overlapping ones merged.
+        """
+        matches = list(TOKEN_PATTERN.finditer(row))
+        spans = []
+        for start, end in self.ranges([match.group() for match in matches]):
+            span_start, span_end = matches[start].start(), matches[end - 1].end()
+            if spans and span_start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], span_end))
+            else:
+                spans.append((span_start, span_end))
+        return spans
+
+    def iter_spans(self, row, terms=None):
+        """Yields (start, end) of the occurrences in the row."""
+        return iter(self.spans(row, terms))
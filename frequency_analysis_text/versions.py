@@ -0,0 +1,113 @@
+"""
+This module lets several threads use one analysis at once. Every change
+of the text publishes a new TextVersion, an immutable text with its index,
+by replacing one reference. Searches run through SearchHandle objects, which
+keep the last search of one user, against the version published when
+the search started, so they need no lock and run in parallel with each
+other and with the writers.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class TextVersion:
+    """
+    One published version of the text of an analysis with its index.
+    Neither changes once the version is published; the cache of the search
+    results of the version is guarded by a lock.
+    """
+
+    max_cached = 500
+
+    def __init__(self, number, text, index):
+        """Initializes the version number of the text and its index."""
+        self.number = number
+        self.text = text
+        self.index = index
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, search_key):
+        """Returns the cached result of the search, or None."""
+        with self._lock:
+            res = self._cache.get(search_key)
+            if res is not None:
+                self._cache.move_to_end(search_key)
+            return res
+
+    def cache(self, search_key, res):
+        """Caches the result of the search, dropping the least recently used."""
+        with self._lock:
+            self._cache[search_key] = res
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+
+class SearchHandle:
+    """
+    The search state of one user of a shared analysis: the last query,
+    its search key and the version it was run against. Searching is
+    read-only; replacing the last found words is a write of the analysis.
+    """
+
+    def __init__(self, obj_text):
+        """Initializes the handle of the analysis without a last search."""
+        self.obj_text = obj_text
+        self.version = None
+        self.last_query = None
+        self.last_search_key = None
+
+    def search(self, word, for_gui=False):
+        """
+        Searches for the word in the current version of the text in the search
+        modes of the analysis. Returns the same results as search_word.
+        """
+        obj_text = self.obj_text
+        with obj_text.metrics.timer("search", mode=obj_text.get_search_mode()):
+            version = obj_text.get_version()
+            pattern, words, query = obj_text.get_query(word)
+            search_key = obj_text.get_search_key(pattern)
+            res = version.cached(search_key)
+            obj_text.metrics.count(
+                "search_cache", result="miss" if res is None else "hit"
+            )
+            if res is None:
+                found = False
+                if word:
+                    found, text, *index_log_nrw = obj_text.perform_index_search(
+                        query, words, version.index
+                    )
+                if not found:
+                    self.forget()
+                    return (obj_text.get_not_found_message(word),)
+                list_index_for_gui, log_for_gui = None, None
+                if for_gui:
+                    list_index_for_gui, log_for_gui = obj_text.format_for_gui(
+                        query,
+                        index_log_nrw,
+                        set(query.terms(version.index.vocabulary)),
+                    )
+                res = text, list_index_for_gui, log_for_gui
+                version.cache(search_key, res)
+            self.version, self.last_query = version, query
+            self.last_search_key = search_key
+            return res
+
+    def replace(self, new_word=""):
+        """
+        Removes or replaces the words of the last search in the current
+        version of the text and publishes the new version.
+        """
+        if self.last_query is None:
+            return "First find the word in the text."
+        with self.obj_text.writing():
+            mess = self.obj_text.replace_query(self.last_query, new_word)
+        self.forget()
+        return mess
+
+    def forget(self):
+        """Forgets the last search."""
+        self.version = None
+        self.last_query = None
+        self.last_search_key = None
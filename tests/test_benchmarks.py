@@ -0,0 +1,29 @@
+"""Testing benchmarks."""
+
+from benchmarks.corpus import generate_text
+from benchmarks.suite import compare_results, run_suite
+
+
+def test_generate_text_reproducible():
+    text = generate_text(size=5000, vocabulary_size=300, language="uk", seed=1)
+    assert len(text) >= 5000
+    assert text == generate_text(size=5000, vocabulary_size=300, language="uk", seed=1)
+    assert text != generate_text(size=5000, vocabulary_size=300, language="uk", seed=2)
+
+
+def test_run_and_compare():
+    params = {"size": 5000, "vocabulary_size": 200, "language": "en", "seed": 0}
+    names = ["count", "save_json", "load_json", "save_journal_append", "load_journal"]
+    names += ["search_mapped_scan_1", "search_mapped_scan_2"]
+    results = run_suite(params, repeat=1, names=names)
+    assert set(results["results"]) == set(names)
+    assert all("median" in res for res in results["results"].values())
+    slower = {
+        "results": {
+            name: {"median": res["median"] * 10 + 1}
+            for name, res in results["results"].items()
+        }
+    }
+    rows = compare_results(results, slower)
+    assert all(row[4] for row in rows)
+    assert not any(row[4] for row in compare_results(results, results))
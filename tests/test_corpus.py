@@ -0,0 +1,54 @@
+"""Testing the corpus."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from frequency_analysis_text import corpus as corpus_module
+from frequency_analysis_text.corpus import Corpus
+from frequency_analysis_text.functionality import AnalysisText
+
+
+def test_corpus(tmp_path, monkeypatch):
+    pools = []
+    monkeypatch.setattr(
+        corpus_module,
+        "get_pool",
+        lambda workers: pools.append(workers) or ThreadPoolExecutor(workers),
+    )
+    corpus = Corpus()
+    mess = corpus.load("tests/texts", workers=2)
+    assert mess == "Documents loaded: 4, errors: 2."
+    assert len(corpus) == 4 and pools == [2]
+    assert sorted(corpus.languages) == ["de", "en", "ru", "uk"]
+
+    obj_en = AnalysisText("tests/texts/text_en.txt")
+    obj_en.load_file()
+    obj_en.update_result_counter()
+    doc_id = corpus.paths.index("tests/texts/text_en.txt")
+    for word, count in obj_en.result_counter.items():
+        assert corpus.count_in_document(doc_id, corpus.word_ids[word]) == count
+
+    word, count = corpus.top(1)[0]
+    assert count == max(corpus.totals)
+    assert corpus.frequency("football") == sum(
+        count
+        for word, count in obj_en.result_counter.items()
+        if word.lower() == "football"
+    )
+    assert corpus.documents_with("football")[0][0] == "tests/texts/text_en.txt"
+    assert corpus.document_frequency("football") == 1
+    assert corpus.document_frequency("FOOTBALL", "case_sensitive") == 0
+    assert corpus.frequency("footbal", "root") >= corpus.frequency("football")
+    assert "football" in corpus.show_word("football")
+    assert corpus.show_word("nothingness") == '"nothingness" - not exist in corpus.'
+
+    records = tmp_path / "records.jsonl"
+    records.write_text(
+        '{"text": "football match"}\n{"text": "football goal"}\n', encoding="utf-8"
+    )
+    obj_en.save_file_to_journal()
+    obj_en.journal.path.rename(tmp_path / "text_en.journal")
+    mess = corpus.load(str(tmp_path), workers=1)
+    assert mess == "Documents loaded: 2, errors: 0."
+    assert corpus.frequency("football", "case_sensitive") == (
+        2 * obj_en.result_counter["football"] + 2
+    )
@@ -1,6 +1,15 @@
 """Testing project."""
 
+import bz2
+import gzip
+import json
+import lzma
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import pytest
 from datetime import date
 from frequency_analysis_text.functionality import (
     AnalysisText,
@@ -9,6 +18,23 @@ from frequency_analysis_text.functionality import (
     InvalidFileFormatError,
     ProgramState,
 )
+from frequency_analysis_text.analysis_cache import AnalysisCache, get_default_cache
+from frequency_analysis_text import (
+    compare,
+    functionality,
+    journal,
+    lemmas,
+    parallel_search,
+)
+from frequency_analysis_text.compressed_text import iter_compressed_chunks
+from frequency_analysis_text.follow import FollowWorker
+from frequency_analysis_text.memory import CompactCounter
+from frequency_analysis_text.persistence import PersistenceWorker
+from frequency_analysis_text.records import RecordFormatError
+from frequency_analysis_text.search_index import TextIndex
+from frequency_analysis_text.stopwords import STOPWORDS
+from frequency_analysis_text.tokenizer import TokenQuery
+from frequency_analysis_text.versions import SearchHandle
 from frequency_analysis_text.main import user_command_handler, parse_input
 
 
@@ -33,7 +59,32 @@ def test_show_info_commands():
         "17. '!root_mode' to show the status root mode;\n"
         "18. '!root_mode_on' to enable root mode;\n"
         "19. '!root_mode_off' to disable root mode;\n"
-        "20. '!close' to close the program.\n"
+        "20. '!stats' to show operation timings and counters;\n"
+        "21. '!export_stats' to export the stats to a .json or Prometheus text file;\n"
+        "22. '!memory' to show the memory used by the analysis components;\n"
+        "23. '!memory_lean' to show the status memory-lean mode;\n"
+        "24. '!memory_lean_on' to enable memory-lean mode;\n"
+        "25. '!memory_lean_off' to disable memory-lean mode;\n"
+        "26. '!corpus' to load the documents of a folder or glob pattern into a corpus;\n"
+        "27. '!corpus_word' to show the corpus frequency and documents of a word;\n"
+        "28. '!ngrams' to show n-gram frequencies, e.g. '!ngrams 2 3' for bigrams seen 3+ times;\n"
+        "29. '!rows_with' to show the rows containing all the words, e.g. '!rows_with cat dog';\n"
+        "30. '!row_stats' to show the word frequencies of a row, e.g. '!row_stats 5';\n"
+        "31. '!save_to_journal' to save the text analysis to a journal file, appending only the new edits;\n"
+        "32. '!autosave' to autosave the analysis to a journal every N minutes, e.g. '!autosave 5', 0 to turn it off;\n"
+        "33. '!fuzzy_mode' to show the status fuzzy mode;\n"
+        "34. '!fuzzy_mode_on' to enable fuzzy mode, e.g. '!fuzzy_mode_on 1' for words within 1 edit;\n"
+        "35. '!fuzzy_mode_off' to disable fuzzy mode;\n"
+        "36. '!kwic' to show the hits in context, e.g. '!kwic 5 left player' for 5 words sorted by the left context;\n"
+        "37. '!stopwords_on' to leave the stopwords of the language and your own words out of the counts, e.g. '!stopwords_on foo bar';\n"
+        "38. '!stopwords_off' to count the stopwords again;\n"
+        "39. '!count_range' to count only the words seen from min to max times, e.g. '!count_range 2' to leave out hapaxes;\n"
+        "40. '!filters' to show the filters of the counted words;\n"
+        "41. '!compare' to show the words whose frequencies differ most from another file or the original text, e.g. '!compare old.pkl chi_square 30';\n"
+        "42. '!follow' to show the status follow mode;\n"
+        "43. '!follow_on' to add the rows appended to the .txt file every N seconds, e.g. '!follow_on 5';\n"
+        "44. '!follow_off' to stop following the file;\n"
+        "45. '!close' to close the program.\n"
     )
 
 
@@ -45,7 +96,7 @@ def test_parse_input():
 
 def test_load_empty_unavailable_format():
     x = AnalysisText("tests/texts/empty.txt")
-    y = AnalysisText("tests/texts/unavailable_format.csv")
+    y = AnalysisText("tests/texts/unavailable_format.xml")
     try:
         x.load_file()
         y.load_file()
@@ -213,6 +264,7 @@ def test_search_cache():
 
 
 def test_save_file_to_pickle_json():
+    obj.show_ngrams("2")
     mess1 = obj.save_file_to_pickle()
     mess2 = obj.save_file_to_json()
     mess3 = obj.save_file_to_pickle()
@@ -233,12 +285,14 @@ def test_load_file_from_pickle_json():
         f_json.datetime_created,
         f_json.language,
         f_json.search_cache_keys,
+        f_json.ngram_counter,
     ) == (
         obj.text,
         obj.result_counter,
         obj.datetime_created,
         obj.language,
         obj.search_cache_keys,
+        obj.ngram_counter,
     )
     assert (
         f_pkl.text,
@@ -261,6 +315,847 @@ def test_load_file_from_pickle_json():
     )
 
 
+def test_root_mode_index_matches_scan():
+    obj_root = AnalysisText("tests/texts/text_uk.txt")
+    obj_root.load_file()
+    obj_root.root_mode_on()
+    rows = obj_root.get_text_index().rows
+    for root in ("грав", "е", "ць", "фут", "nothing"):
+        _, words, query = obj_root.get_query(root)
+        assert obj_root.perform_index_search(query, words) == obj_root.perform_search(
+            words, rows, query
+        )
+    assert obj_root.search_word("ГРАВ")[0] != '"ГРАВ" - not exist in text.'
+    assert obj_root.search_cache_keys[0] == r"\b\w*грав\w*\b False False True"
+
+
+def test_parallel_search(monkeypatch):
+    obj_mem = AnalysisText("tests/texts/text_uk.txt")
+    obj_map = AnalysisText("tests/texts/text_uk.txt", use_mmap=True)
+    for el in (obj_mem, obj_map):
+        el.load_file()
+        el.update_result_counter()
+        el.smart_mode_on()
+    rows = obj_mem.get_text_index().rows
+    queries = [obj_mem.get_query(word)[1:] for word in ("гравець", "футбол", "м'яч")]
+    expected = [obj_mem.perform_search(words, rows, query) for words, query in queries]
+    found = [obj_map.search_word(word)[0] for word in ("гравець", "футбол", "м'яч")]
+    monkeypatch.setattr(parallel_search, "PARALLEL_MIN_SIZE", 0)
+    monkeypatch.setattr(parallel_search, "CHUNK_SIZE", 200)
+    monkeypatch.setattr(parallel_search, "get_workers", lambda workers=None: 3)
+    assert len(list(parallel_search.iter_chunks(rows))) > 3
+    for (words, query), res in zip(queries, expected):
+        hits = parallel_search.search_rows(query, iter(rows), 1)
+        assert res[0] and [(n_row, count) for n_row, count, _ in hits] == res[4]
+        assert [row for *_, row in hits] == [rows[n - 1] for n, *_ in hits]
+    obj_map.search_cache.clear()
+    assert all(res.startswith("№") for res in found)
+    assert [obj_map.search_word(w)[0] for w in ("гравець", "футбол", "м'яч")] == found
+    assert parallel_search.get_pool(3) is parallel_search.get_pool(3)
+    parallel_search.shutdown_pool()
+
+
+def test_stats(tmp_path):
+    obj_stats = AnalysisText("tests/texts/text_en.txt", collect_metrics=True)
+    obj_stats.load_file()
+    obj_stats.update_result_counter()
+    obj_stats.search_word("football")
+    obj_stats.search_word("football")
+    operations = {key[0] for key in obj_stats.metrics.timings}
+    assert {"load", "analyze", "count", "search"} <= operations
+    assert obj_stats.metrics.counters[("search_cache", (("result", "hit"),))] == 1
+    assert "search{mode=default}" in obj_stats.show_stats()
+    obj_stats.export_stats(tmp_path / "stats.json")
+    obj_stats.export_stats(tmp_path / "stats.prom")
+    assert (tmp_path / "stats.json").read_text(encoding="utf-8").startswith("{")
+    assert 'frequency_analysis_operation_seconds_count{operation="count"} 1' in (
+        tmp_path / "stats.prom"
+    ).read_text(encoding="utf-8")
+
+    obj_no_stats = AnalysisText("tests/texts/text_en.txt")
+    obj_no_stats.load_file()
+    assert not obj_no_stats.metrics.timings
+    assert obj_no_stats.show_stats() == "Stats are disabled."
+
+
+def test_memory_lean():
+    obj_full = AnalysisText("tests/texts/text_ru.txt")
+    obj_lean = AnalysisText("tests/texts/text_ru.txt", memory_lean=True)
+    for el in (obj_full, obj_lean):
+        el.load_file()
+    assert obj_lean.text is obj_lean.old_text
+    assert str(obj_lean) == str(obj_full)
+    assert obj_lean.result_counter == obj_full.result_counter
+    assert isinstance(obj_lean.result_counter, CompactCounter)
+    assert obj_lean.search_word("игрок")[0] == obj_full.search_word("игрок")[0]
+    assert not hasattr(obj_lean, "__dict__")
+    report = obj_lean.show_memory()
+    assert "result_counter" in report and "total" in report
+    assert obj_lean.memory_lean_off() == "Memory-lean mode off."
+    assert obj_lean.result_counter == obj_full.result_counter
+    assert not isinstance(obj_lean.result_counter, CompactCounter)
+
+
+def test_mmap_mode():
+    obj_mem = AnalysisText("tests/texts/text_uk.txt")
+    obj_map = AnalysisText("tests/texts/text_uk.txt", use_mmap=True)
+    obj_mem.load_file()
+    obj_map.load_file()
+    obj_map.mapped_text.chunk_size = 100
+    assert obj_map.text is None
+    assert obj_map.language == obj_mem.language
+    assert str(obj_map) == str(obj_mem)
+    for mode in (None, "case_sens_on", "root_mode_on"):
+        for el in (obj_mem, obj_map):
+            el.case_sens_off()
+            el.root_mode_off()
+            if mode:
+                getattr(el, mode)()
+        for word in ("Гравець", "гравець", "грав", "відсутнє"):
+            assert obj_map.search_word(word) == obj_mem.search_word(word)
+    assert obj_map.show_user_text() == obj_mem.text
+    obj_map.search_word("гравець")
+    obj_mem.search_word("гравець")
+    obj_map.remove_or_replace_last_words("X")
+    obj_mem.remove_or_replace_last_words("X")
+    assert obj_map.mapped_text is None
+    assert obj_map.text == obj_mem.text
+    assert obj_map.old_text == obj_mem.old_text
+
+
+def test_mmap_mode_newlines(tmp_path):
+    path = tmp_path / "windows.txt"
+    path.write_bytes(b"alpha beta\r\ngamma alpha\r\n\r\nold mac\ralpha end\r\n")
+    obj_mem = AnalysisText(path)
+    obj_map = AnalysisText(path, use_mmap=True)
+    for el in (obj_mem, obj_map):
+        el.load_file()
+    obj_map.mapped_text.chunk_size = 4
+    assert "\r" not in obj_map.show_user_text()
+    assert str(obj_map) == str(obj_mem)
+    for word in ("alpha", "mac", "end"):
+        assert obj_map.search_word(word) == obj_mem.search_word(word)
+    assert list(obj_map.concordance("alpha")) == list(obj_mem.concordance("alpha"))
+    for el in (obj_mem, obj_map):
+        el.search_word("beta")
+        el.remove_or_replace_last_words("X")
+    assert (
+        obj_map.text == obj_mem.text == "alpha X\ngamma alpha\n\nold mac\nalpha end\n"
+    )
+
+
+def test_ngrams():
+    obj_ngrams = AnalysisText("tests/texts/text_en.txt")
+    obj_ngrams.load_file()
+    res = obj_ngrams.show_ngrams("2 3")
+    assert res.startswith("2-gram Results:")
+    assert obj_ngrams.ngram_counter["of the"] == 7
+    assert min(obj_ngrams.ngram_counter.values()) >= 3
+    obj_ngrams.show_ngrams("3")
+    assert obj_ngrams.ngram_size == 3
+    assert all(len(ngram.split()) == 3 for ngram in obj_ngrams.ngram_counter)
+    assert obj_ngrams.show_ngrams("two").startswith("Enter the n-gram size")
+
+
+def test_analysis_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("FREQUENCY_ANALYSIS_NO_CACHE", "1")
+    assert get_default_cache() is None
+    monkeypatch.setenv("FREQUENCY_ANALYSIS_NO_CACHE", "0")
+    assert isinstance(get_default_cache(), AnalysisCache)
+    cache = AnalysisCache(tmp_path)
+    obj_first = AnalysisText(
+        "tests/texts/text_ru.txt", collect_metrics=True, cache=cache
+    )
+    obj_first.load_file()
+    assert obj_first.metrics.counters[("analysis_cache", (("result", "miss"),))] == 1
+    obj_first.search_word("игрок")
+    obj_second = AnalysisText(
+        "tests/texts/text_ru.txt", collect_metrics=True, cache=cache
+    )
+    obj_second.load_file()
+    assert obj_second.metrics.counters[("analysis_cache", (("result", "hit"),))] == 1
+    assert obj_second.language == obj_first.language
+    assert obj_second.result_counter == obj_first.result_counter
+    assert obj_second.text_index.postings == obj_first.text_index.postings
+    assert obj_second.search_word("игрок") == obj_first.search_word("игрок")
+    obj_second.search_word("игрок")
+    obj_second.remove_or_replace_last_words("X")
+    obj_second.update_result_counter()
+    assert "игрок" not in obj_second.result_counter
+    assert len(cache.entries()) == 1
+    AnalysisCache(tmp_path, max_bytes=0).evict()
+    assert not cache.entries()
+
+
+def test_compressed_txt(tmp_path):
+    obj_plain = AnalysisText("tests/texts/text_de.txt")
+    obj_plain.load_file()
+    obj_plain.update_result_counter()
+    data = Path("tests/texts/text_de.txt").read_bytes().replace(b"\n", b"\r\n")
+    for suffix, module in ((".gz", gzip), (".bz2", bz2), (".xz", lzma)):
+        path = tmp_path / f"text_de.txt{suffix}"
+        path.write_bytes(module.compress(data))
+        obj_packed = AnalysisText(path)
+        obj_packed.load_file()
+        assert obj_packed.text == obj_plain.text
+        assert obj_packed.language == obj_plain.language
+        assert obj_packed.result_counter == obj_plain.result_counter
+    chunks = list(iter_compressed_chunks(path, chunk_size=7))
+    assert all(chunk.endswith("\n") for chunk in chunks[:-1])
+    assert "".join(chunks) == obj_plain.text
+
+
+def test_records(tmp_path):
+    rows = ["The player won.", "", "A new player\nand an old player.", "Nothing."]
+    jsonl = tmp_path / "messages.jsonl"
+    jsonl.write_text(
+        "\n".join(
+            json.dumps({"id": f"m{i}", "body": row}) for i, row in enumerate(rows)
+        ),
+        encoding="utf-8",
+    )
+    csv_path = tmp_path / "messages.csv"
+    csv_path.write_text(
+        "id,body\n" + "".join(f'm{i},"{row}"\n' for i, row in enumerate(rows)),
+        encoding="utf-8",
+    )
+    for path in (jsonl, csv_path):
+        obj_records = AnalysisText(path, text_field="body", id_field="id")
+        obj_records.load_file()
+        obj_records.update_result_counter()
+        assert obj_records.text is None
+        assert obj_records.result_counter["player"] == 3
+        res = obj_records.search_word("player")[0]
+        assert res.startswith("№m0: The player won.")
+        assert "№m2: A new player and an old player." in res
+        obj_records.search_word("won")
+        obj_records.remove_or_replace_last_words("lost")
+        assert obj_records.text.startswith("The player lost.\n")
+        assert obj_records.search_word("player")[0] == res.replace("won", "lost")
+        assert [label for label, *_ in obj_records.concordance("player")] == [
+            "m0",
+            "m2",
+            "m2",
+        ]
+        obj_numbers = AnalysisText(path, text_field="body")
+        obj_numbers.load_file()
+        assert "№3: A new player" in obj_numbers.search_word("player")[0]
+        obj_numbers.load_mapped_text()
+        assert "№3: A new player" in obj_numbers.search_word("new")[0]
+    try:
+        AnalysisText(csv_path, text_field="text").load_file()
+        assert False
+    except RecordFormatError as e:
+        assert str(e) == 'The file has no column "text".'
+
+
+def test_numpy_engine():
+    pytest.importorskip("numpy")
+    for path in ("tests/texts/text_uk.txt", "tests/texts/text_en.txt"):
+        obj_python = AnalysisText(path)
+        obj_numpy = AnalysisText(path, use_numpy=True)
+        for el in (obj_python, obj_numpy):
+            el.load_file()
+            el.update_result_counter()
+        assert obj_numpy.result_counter == obj_python.result_counter
+        assert list(obj_numpy.result_counter) == list(obj_python.result_counter)
+    token_array = obj_numpy.get_token_array()
+    assert (
+        token_array.top(5)
+        == sorted(
+            obj_python.result_counter.items(), key=lambda item: (-item[1], item[0])
+        )[:5]
+    )
+    assert token_array.filter(3, 4) == {
+        word: count
+        for word, count in obj_python.result_counter.items()
+        if 3 <= count <= 4
+    }
+    assert token_array.row_counts(
+        ["football", "Football"]
+    ) == obj_python.get_text_index().hits(["football", "Football"])
+
+
+def test_row_term_matrix():
+    obj_rows = AnalysisText("tests/texts/text_en.txt")
+    obj_rows.load_file()
+    index = obj_rows.get_text_index()
+    matrix = index.row_matrix
+    assert len(matrix) == len(index.rows)
+    for n_row, row in enumerate(index.rows, 1):
+        assert matrix.row(n_row) == TextIndex.count_words(row)
+    rows = index.rows_with_all(["the", "football"])
+    assert rows and all(
+        {"the", "football"} <= set(TextIndex.count_words(index.rows[n_row - 1]))
+        for n_row, _ in rows
+    )
+    assert obj_rows.show_rows_with("the football").startswith(
+        f"Rows containing all of: the, football: {len(rows)}."
+    )
+    assert obj_rows.show_row_stats("1").startswith("Row №1:")
+    assert obj_rows.show_row_stats("0").startswith("Enter the number of a row")
+    obj_rows.search_word("football")
+    obj_rows.remove_or_replace_last_words("soccer ball")
+    updated = obj_rows.get_text_index()
+    rebuilt = TextIndex(obj_rows.text)
+    assert updated.postings == rebuilt.postings
+    assert [updated.row_matrix.row(n) for n in range(1, len(index.rows) + 1)] == [
+        rebuilt.row_matrix.row(n) for n in range(1, len(index.rows) + 1)
+    ]
+    obj_scan = AnalysisText("tests/texts/text_en.txt")
+    obj_scan.load_file()
+    _, words, query = obj_scan.get_query("player")
+    found = obj_scan.perform_search(words, obj_scan.get_text_index().rows, query)
+    assert obj_scan.search_word("player")[0] == found[1]
+
+
+def test_tokenizer_consistency(tmp_path):
+    path = tmp_path / "tokens.txt"
+    path.write_text(
+        "A well-known player's move.\nThe player said: don't stop, PLAYER!\n",
+        encoding="utf-8",
+    )
+    obj_tokens = AnalysisText(path)
+    obj_tokens.load_file()
+    obj_tokens.update_result_counter()
+    assert obj_tokens.result_counter["well-known"] == 1
+    assert obj_tokens.result_counter["player's"] == 1
+    assert "well" not in obj_tokens.result_counter
+    res, spans, log = obj_tokens.search_word("player", for_gui=True)
+    assert [res[start:end] for start, end in spans] == ["player", "PLAYER"]
+    assert "Found words: 2." in log
+    assert obj_tokens.search_word("well")[0] == '"well" - not exist in text.'
+    assert obj_tokens.search_word("Well-Known")[0].startswith("№1: A well-known")
+    obj_tokens.search_word("player")
+    obj_tokens.remove_or_replace_last_words("X")
+    assert obj_tokens.text == (
+        "A well-known player's move.\nThe X said: don't stop, X!\n"
+    )
+
+
+def test_fuzzy_mode(tmp_path):
+    path = tmp_path / "ocr.txt"
+    path.write_text(
+        "The footbal player scored.\nFootball fans met the playr.\nA ball.\n",
+        encoding="utf-8",
+    )
+    obj_fuzzy = AnalysisText(path)
+    obj_fuzzy.load_file()
+    assert obj_fuzzy.fuzzy_mode_on("4") == "Enter the edit distance from 1 to 3."
+    obj_fuzzy.case_sens_on()
+    assert obj_fuzzy.fuzzy_mode_on("1") == (
+        "Fuzzy mode on, edit distance 1, case sensitive off, smart mode off, root mode off."
+    )
+    assert obj_fuzzy.get_search_mode() == "fuzzy"
+    res, spans, log = obj_fuzzy.search_word("football", for_gui=True)
+    assert [res[start:end] for start, end in spans] == ["footbal", "Football"]
+    assert "Found words: 2." in log
+    vocabulary = obj_fuzzy.get_text_index().vocabulary
+    for word in ("player", "ball", "fotball", "met"):
+        for distance in (1, 2):
+            assert sorted(vocabulary.fuzzy(word, distance)) == sorted(
+                token
+                for token in vocabulary.words
+                if TokenQuery("fuzzy", (word, distance)).matches(token)
+            )
+    obj_fuzzy.search_word("player")
+    obj_fuzzy.remove_or_replace_last_words("player")
+    assert obj_fuzzy.text.count("player") == 2
+    assert obj_fuzzy.root_mode_on() == "Root mode on, fuzzy mode off."
+    assert not obj_fuzzy.fuzzy_mode
+
+
+def test_phrase_search(tmp_path):
+    path = tmp_path / "phrases.txt"
+    path.write_text(
+        "New York is big. I love new york.\n"
+        "York is not new.\n"
+        "The new, old York.\n",
+        encoding="utf-8",
+    )
+    obj_phrase = AnalysisText(path)
+    obj_phrase.load_file()
+    res, spans, log = obj_phrase.search_word("new york", for_gui=True)
+    assert [res[start:end] for start, end in spans] == ["New York", "new york"]
+    assert "Found words: 2." in log
+    obj_phrase.case_sens_on()
+    assert obj_phrase.search_word("New york")[0] == '"New york" - not exist in text.'
+    assert (
+        obj_phrase.search_word("new york")[0]
+        == "№1: New York is big. I love new york.\n\n"
+    )
+    obj_phrase.case_sens_off()
+    res, spans, _ = obj_phrase.search_word("york NEAR/2 new", for_gui=True)
+    assert res.startswith("№1:") and "№2:" not in res and "№3:" in res
+    assert [res[start:end] for start, end in spans] == (
+        ["New", "York", "new", "york", "new", "York"]
+    )
+    index = obj_phrase.get_text_index()
+    for mode in ("default", "case_sensitive", "root", "fuzzy"):
+        for words in ("new york", "is NEAR/3 new", "york NEAR/1 york"):
+            _, _, query = AnalysisText.make_query(words, mode, "en", 1)
+            assert index.search(query) == [
+                (n_row, query.count(row))
+                for n_row, row in enumerate(index.rows, 1)
+                if query.count(row)
+            ]
+    obj_phrase.search_word("new york")
+    obj_phrase.remove_or_replace_last_words("NYC")
+    assert obj_phrase.text.startswith("NYC is big. I love NYC.\nYork is not new.")
+    assert obj_phrase.search_word("york is")[0].startswith("№2: York is not new.")
+
+
+def test_concordance(tmp_path):
+    path = tmp_path / "kwic.txt"
+    path.write_text(
+        "b a player one two three four five six player x\nA Player\n",
+        encoding="utf-8",
+    )
+    obj_kwic = AnalysisText(path)
+    obj_kwic.load_file()
+    assert list(obj_kwic.concordance("player", 2)) == [
+        (1, "b a", "player", "one two"),
+        (1, "five six", "player", "x"),
+        (2, "A", "Player", ""),
+    ]
+    assert [line[1] for line in obj_kwic.concordance("player", 2, sort="left")] == [
+        "A",
+        "b a",
+        "five six",
+    ]
+    assert list(obj_kwic.concordance("player", 4, "chars", "right"))[0] == (
+        2,
+        "A",
+        "Player",
+        "",
+    )
+    assert obj_kwic.show_concordance("1 right player") == (
+        'Concordance of "player":\n\n'
+        "№2    A [Player]\n"
+        "№1    a [player] one\n"
+        "№1  six [player] x\n"
+    )
+    assert obj_kwic.show_concordance("3 nothing") == '"nothing" - not exist in text.'
+    obj_mapped = AnalysisText(path, use_mmap=True)
+    obj_mapped.load_file()
+    assert list(obj_mapped.concordance("player", 2)) == list(
+        obj_kwic.concordance("player", 2)
+    )
+
+
+def test_token_filter(tmp_path, monkeypatch):
+    obj_uk = AnalysisText("tests/texts/text_uk.txt")
+    obj_uk.load_file()
+    obj_uk.stopwords_on()
+    obj_uk.update_result_counter()
+    assert not {"і", "в", "на"} & set(obj_uk.result_counter)
+
+    obj_filter = AnalysisText("tests/texts/text_en.txt")
+    obj_filter.load_file()
+    obj_filter.update_result_counter()
+    counts = dict(obj_filter.result_counter)
+    n_stopwords = len(STOPWORDS["en"]) + 2
+    assert obj_filter.stopwords_on("Messi, Barcelona") == (
+        f"Stopwords on: {n_stopwords} words."
+    )
+    obj_filter.update_result_counter()
+    assert "the" not in obj_filter.result_counter
+    assert "The" not in obj_filter.result_counter
+    assert "Messi" not in obj_filter.result_counter
+    assert obj_filter.result_counter["football"] == counts["football"]
+    assert obj_filter.search_word("The")[0] == (
+        '"The" - filtered out as a stopword: the.'
+        " Enter '!stopwords_off' to search for it."
+    )
+    assert obj_filter.search_word("the football")[0].startswith(
+        '"the football" - filtered out as a stopword: the.'
+    )
+    assert (
+        SearchHandle(obj_filter)
+        .search("Messi")[0]
+        .startswith('"Messi" - filtered out as a stopword: messi.')
+    )
+    assert obj_filter.search_word("cricket")[0] == '"cricket" - not exist in text.'
+    assert obj_filter.set_count_range("2 10") == "Count range: 2 to 10."
+    assert obj_filter.show_filters() == (
+        f"Filters: stopwords: {n_stopwords}, counts: 2-10."
+    )
+    obj_filter.update_result_counter()
+    assert all(2 <= count <= 10 for count in obj_filter.result_counter.values())
+    assert set(obj_filter.result_counter) == {
+        word
+        for word, count in counts.items()
+        if 2 <= count <= 10 and word.lower() not in obj_filter.token_filter.stopwords
+    }
+    obj_filter.search_word("football")
+    obj_filter.remove_or_replace_last_words("the")
+    assert "the" not in obj_filter.get_text_index().postings
+    obj_mapped = AnalysisText(
+        "tests/texts/text_en.txt",
+        use_mmap=True,
+        token_filter=obj_filter.token_filter,
+    )
+    obj_mapped.load_file()
+    obj_mapped.update_result_counter()
+    obj_filter.restart_user_text()
+    obj_filter.update_result_counter()
+    assert obj_mapped.result_counter == obj_filter.result_counter
+    monkeypatch.chdir(tmp_path)
+    obj_filter.save_file_to_json()
+    obj_loaded = AnalysisText(next(tmp_path.glob("*.json")))
+    obj_loaded.load_file()
+    assert obj_loaded.show_filters() == obj_filter.show_filters()
+    obj_filter.stopwords_off()
+    assert obj_filter.show_filters() == "Filters: counts: 2-10."
+    assert obj_filter.set_count_range("1000") == "Count range: at least 1000."
+    assert str(obj_filter) == "No words pass the filters: counts: 1000-.\n"
+    obj_filter.set_count_range()
+    assert obj_filter.show_filters() == "Filters: off."
+
+
+def test_follow(tmp_path):
+    path = tmp_path / "app.txt"
+    path.write_bytes(b"start football match\nthe ball is red\nfoot")
+    obj_texts = []
+    for memory_lean in (False, True):
+        obj_text = AnalysisText(path, memory_lean=memory_lean)
+        obj_text.load_file()
+        obj_text.update_result_counter()
+        obj_text.search_word('"ball is"')
+        obj_text.search_word("ball")
+        assert obj_text.update_from_file() is None
+        assert obj_text.follow_on() == "Follow mode on."
+        obj_texts.append(obj_text)
+    assert obj_texts[0].update_from_file() is None
+
+    with open(path, "ab") as file:
+        file.write(b"ball club\r\nthe ball is blue\nsecond ha")
+    for obj_text in obj_texts:
+        index = obj_text.get_text_index()
+        assert obj_text.update_from_file() == "Rows added: 2."
+        assert obj_text.get_text_index() is not index
+        assert obj_text.text == obj_text.old_text
+        assert obj_text.text.endswith("football club\nthe ball is blue\n")
+        assert "foot" not in obj_text.result_counter
+        assert obj_text.result_counter["football"] == 2
+        assert obj_text.search_word('"ball is"')[0].count("№") == 2
+
+    def check(obj_text):
+        obj_fresh = AnalysisText(path)
+        obj_fresh.load_file()
+        obj_fresh.text = obj_fresh.old_text = obj_text.text
+        index, fresh_index = obj_text.get_text_index(), obj_fresh.get_text_index()
+        assert list(index.rows) == list(fresh_index.rows)
+        assert index.postings == fresh_index.postings
+        assert index.positions == fresh_index.positions
+        obj_fresh.update_result_counter()
+        assert dict(obj_text.result_counter.items()) == obj_fresh.result_counter
+        assert list(obj_text.result_counter) == list(obj_fresh.result_counter)
+
+    for obj_text in obj_texts:
+        check(obj_text)
+    obj_text = obj_texts[0]
+
+    edited_path = tmp_path / "edited.txt"
+    edited_path.write_bytes(b"the ball is red\n")
+    obj_edited = AnalysisText(edited_path)
+    obj_edited.load_file()
+    obj_edited.follow_on()
+    for word, new_word in (("ball", "goal"), ("red", "green")):
+        obj_edited.search_word(word)
+        obj_edited.remove_or_replace_last_words(new_word)
+    obj_edited.undo()
+    with open(edited_path, "ab") as file:
+        file.write(b"the ball is red\n")
+    assert obj_edited.update_from_file() == "Rows added: 1."
+    assert obj_edited.text == "the goal is red\nthe ball is red\n"
+    obj_edited.redo()
+    assert obj_edited.text == "the goal is green\nthe ball is red\n"
+    obj_edited.undo()
+    assert obj_edited.text == "the goal is red\nthe ball is red\n"
+    obj_edited.restart_user_text()
+    assert obj_edited.text == "the ball is red\n" * 2
+    assert obj_edited.update_from_file() is None
+    offset = obj_edited.follower.offset
+    with open(edited_path, "ab") as file:
+        file.write(b"\xff\n")
+    assert obj_edited.update_from_file().startswith("Follow mode off")
+    assert obj_edited.follower.offset == offset
+
+    path.rename(tmp_path / "app.1.txt")
+    path.write_bytes(b"new football\n")
+    mess = obj_text.update_from_file()
+    assert mess.startswith("The file was rotated") and mess.endswith("Rows added: 1.")
+    assert obj_text.result_counter["football"] == 3
+    check(obj_text)
+    path.write_bytes(b"x\n")
+    assert obj_text.update_from_file().startswith("The file was rotated")
+    path.unlink()
+    assert obj_text.update_from_file().startswith("Follow mode off")
+    assert not obj_text.following and obj_text.update_from_file() is None
+
+    class BrokenText:
+        following = True
+
+        def update_from_file(self):
+            raise RuntimeError("broken")
+
+    messages = []
+    broken = BrokenText()
+    worker = FollowWorker(callback=messages.append)
+    worker.start(lambda: broken, 0.01)
+    for _ in range(500):
+        if messages:
+            break
+        time.sleep(0.01)
+    time.sleep(0.05)
+    worker.stop()
+    assert messages == ["Follow mode off: broken"] and not broken.following
+
+
+def test_concurrent_search(tmp_path):
+    path = tmp_path / "match.txt"
+    path.write_text("the ball is red\nfootball club\n" * 200 + "the ball is blue\n")
+    obj_text = AnalysisText(path)
+    obj_text.load_file()
+    obj_text.update_result_counter()
+    handles = [SearchHandle(obj_text) for _ in range(4)]
+    version = obj_text.get_version()
+    assert obj_text.get_version() is version and version.text is obj_text.text
+    assert handles[0].search('"ball is"')[0].count("№") == 201
+    assert handles[0].version is version
+
+    errors = []
+
+    def read(handle):
+        try:
+            for _ in range(20):
+                text = handle.search("ball")[0]
+                assert text.count("№") in (201, 1)
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=(h,)) for h in handles[1:]]
+    for thread in threads:
+        thread.start()
+    with obj_text.writing():
+        obj_text.search_word("red")
+        obj_text.remove_or_replace_last_words("blue")
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert obj_text.version.number == 2 and obj_text.version.text is obj_text.text
+
+    old_index, fresh_index = version.index, TextIndex(version.text)
+    assert list(old_index.rows) == list(fresh_index.rows)
+    assert old_index.postings == fresh_index.postings
+    assert old_index.positions == fresh_index.positions
+
+    assert handles[0].replace("goal") == "Words replaced."
+    assert obj_text.version.number == 3
+    assert handles[0].replace("goal") == "First find the word in the text."
+    assert handles[1].search('"goal blue"')[0].count("№") == 201
+    assert handles[1].search("red") == ('"red" - not exist in text.',)
+
+
+def test_compare(monkeypatch):
+    counts_a = {"cat": 10, "dog": 5, "fish": 5}
+    counts_b = {"dog": 20, "cat": 10, "bird": 10}
+    tables = []
+    for numpy_module in (compare.np, None):
+        monkeypatch.setattr(compare, "np", numpy_module)
+        comparison = compare.Comparison(counts_a, counts_b)
+        assert comparison.vocabulary == ["cat", "dog", "fish", "bird"]
+        assert (comparison.total_a, comparison.total_b) == (20, 40)
+        tables.append(
+            {measure: comparison.table(measure, 4) for measure in compare.MEASURES}
+        )
+    for measure in compare.MEASURES:
+        for row_numpy, row_python in zip(tables[0][measure], tables[1][measure]):
+            assert row_numpy[:4] == row_python[:4]
+            assert row_numpy[4:] == pytest.approx(row_python[4:])
+    table = {row[0]: row for row in tables[0]["log_likelihood"]}
+    assert table["cat"][1:4] == (10, 10, 0)
+    assert table["cat"][5] < 0 < table["dog"][5] and table["fish"][5] < 0
+    assert table["dog"][5] == pytest.approx(
+        2 * (5 * math.log(5 / 25 * 60 / 20) + 20 * math.log(20 / 25 * 60 / 40))
+    )
+    assert tables[0]["chi_square"][0][0] == "fish"
+    assert tables[0]["delta"][0][::5] == ("bird", pytest.approx(250000))
+    assert len(tables[0]["delta"]) == 4
+    assert [row[0] for row in comparison.table("log_ratio", 2)] == ["fish", "bird"]
+    with pytest.raises(ValueError):
+        compare.Comparison(counts_a, {})
+
+    obj_text = AnalysisText("tests/texts/text_en.txt")
+    obj_text.load_file()
+    assert obj_text.show_comparison().startswith("The text is equal")
+    obj_text.search_word("football")
+    obj_text.remove_or_replace_last_words("soccer")
+    table = obj_text.compare_with().table()
+    assert {row[0] for row in table[:2]} == {"football", "soccer"}
+    football = next(row for row in table if row[0] == "football")
+    assert football[2] == 0 and football[3] == -football[1] and football[5] < 0
+    assert obj_text.compare_with("tests/texts/text_en.txt").table() == table
+    assert len(table) == 2
+    res = obj_text.show_comparison("tests/texts/text_en.txt chi_square 3")
+    assert res.startswith("Comparison of tests/texts/text_en.txt")
+    assert len(res.splitlines()) == 3 + 3 and "soccer" in res
+    assert obj_text.show_comparison("missing.txt").startswith("Cannot compare")
+
+
+def test_journal(tmp_path, monkeypatch):
+    path = tmp_path / "long.txt"
+    path.write_text(
+        Path("tests/texts/text_en.txt").read_text(encoding="utf-8") * 50,
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+    obj_edited = AnalysisText(path)
+    obj_edited.load_file()
+    assert obj_edited.save_file_to_journal() == "File save to journal."
+    journal_path = obj_edited.journal.path
+    base_size = journal_path.stat().st_size
+    obj_edited.search_word("ball")
+    obj_edited.remove_or_replace_last_words("soccer")
+    obj_edited.search_word("soccer")
+    obj_edited.remove_or_replace_last_words()
+    obj_edited.undo()
+    obj_edited.save_file_to_journal()
+    assert journal_path.stat().st_size - base_size < base_size / 10
+    obj_loaded = AnalysisText(journal_path)
+    obj_loaded.load_file()
+    for name in ("text", "old_text", "history", "redo_stack", "result_counter"):
+        assert getattr(obj_loaded, name) == getattr(obj_edited, name)
+
+    with open(journal_path, "ab") as file:
+        file.write(b"\x80\x05cut")
+    obj_loaded = AnalysisText(journal_path)
+    obj_loaded.load_file()
+    obj_loaded.redo()
+    obj_loaded.save_file_to_journal()
+    obj_redone = AnalysisText(journal_path)
+    obj_redone.load_file()
+    assert obj_redone.text == obj_loaded.text != obj_edited.text
+
+    obj_redone.journal.max_ratio = 0
+    obj_redone.restart_user_text()
+    obj_redone.save_file_to_journal()
+    assert obj_redone.journal.edits_size == 0
+    obj_restarted = AnalysisText(journal_path)
+    obj_restarted.load_file()
+    assert obj_restarted.text == obj_restarted.old_text
+
+    def fail_open(*args, **kwargs):
+        raise OSError("disk full")
+
+    messages = []
+    worker = PersistenceWorker(messages.append)
+    obj_restarted.search_word("ball")
+    obj_restarted.remove_or_replace_last_words("soccer")
+    monkeypatch.setattr(journal, "open", fail_open, raising=False)
+    worker.save(obj_restarted).exception()
+    monkeypatch.delattr(journal, "open")
+    obj_restarted.search_word("soccer")
+    obj_restarted.remove_or_replace_last_words("goal")
+    assert worker.autosave(obj_restarted).result() == "File save to journal."
+    worker.close()
+    assert messages == ["Save failed: disk full", "File save to journal."]
+    obj_replayed = AnalysisText(journal_path)
+    obj_replayed.load_file()
+    assert obj_replayed.text == obj_restarted.text != obj_restarted.old_text
+
+
+def test_lemmas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    obj_text = AnalysisText(Path(__file__).parent / "texts/text_uk.txt")
+    obj_text.load_file()
+    words = str(obj_text)
+    assert obj_text.smart_mode_on() == "Smart mode on."
+    res = str(obj_text)
+    assert res.startswith("Analysis Results by lemma:") and res != words
+    lemma_counter = obj_text.lemma_counter
+    assert sum(lemma_counter.values()) == sum(obj_text.result_counter.values())
+    assert len(lemma_counter) < len(obj_text.result_counter)
+    assert lemma_counter["гравець"] == sum(
+        count
+        for word, count in obj_text.result_counter.items()
+        if word.lower() in ("гравець", "гравця", "гравцем", "гравці", "гравців")
+    )
+    assert obj_text.show_list_words() == list(lemma_counter)
+    obj_text.smart_mode_off()
+    assert str(obj_text) == words
+    assert obj_text.show_list_words() == list(obj_text.result_counter)
+
+    assert lemmas.count_lemmas({"Ball": 2, "ball": 1, "balls": 4, "7": 1}, "en") == {
+        "7": 1,
+        "balls": 7,
+    }
+    monkeypatch.setattr(lemmas, "PARALLEL_MIN_WORDS", 2)
+    monkeypatch.setattr(lemmas, "CHUNK_WORDS", 2)
+    monkeypatch.setitem(lemmas.LEMMA_CACHE, "uk", {})
+    pools = []
+    monkeypatch.setattr(
+        lemmas,
+        "get_pool",
+        lambda workers: pools.append(workers) or ThreadPoolExecutor(),
+    )
+    assert lemmas.get_lemmas(["гравця", "м'ячі", "7"], "uk", 2) == {
+        "гравця": "гравець",
+        "м'ячі": "м'яч",
+        "7": "7",
+    }
+    assert pools == [2]
+
+    obj_text.save_file_to_json()
+    obj_text.save_file_to_pickle()
+    obj_text.save_file_to_journal()
+    monkeypatch.setattr(functionality, "count_lemmas", None)
+    saved_paths = sorted(tmp_path.glob("*_000.*"))
+    assert [saved.suffix for saved in saved_paths] == [".journal", ".json", ".pkl"]
+    for saved in saved_paths:
+        obj_loaded = AnalysisText(saved)
+        obj_loaded.load_file()
+        obj_loaded.smart_mode_on()
+        assert str(obj_loaded) == res
+    obj_loaded.search_word("гравець")
+    obj_loaded.remove_or_replace_last_words()
+    assert obj_loaded.lemma_counter is not None
+    monkeypatch.setattr(functionality, "count_lemmas", lemmas.count_lemmas)
+    assert "гравець" not in str(obj_loaded)
+
+
+def test_persistence(tmp_path, monkeypatch):
+    path = Path("tests/texts/text_en.txt").absolute()
+    monkeypatch.chdir(tmp_path)
+    messages = []
+    worker = PersistenceWorker(messages.append)
+    obj_saved = AnalysisText(path)
+    obj_saved.load_file()
+    original = obj_saved.text
+    future = worker.save(obj_saved, "json")
+    obj_saved.search_word("football")
+    obj_saved.remove_or_replace_last_words("soccer")
+    assert future.result() == "File save to json."
+    saved = json.loads(next(tmp_path.glob("*.json")).read_text(encoding="utf-8"))
+    assert saved["text"] == original and not saved["history"]
+
+    assert worker.autosave(obj_saved).result() == "File save to journal."
+    assert worker.autosave(obj_saved) is None
+    obj_saved.restart_user_text()
+    worker.start_autosave(lambda: obj_saved, 0.01)
+    for _ in range(500):
+        if len(messages) == 3:
+            break
+        time.sleep(0.01)
+    worker.close()
+    assert messages == ["File save to json."] + ["File save to journal."] * 2
+    obj_loaded = AnalysisText(obj_saved.journal.path)
+    obj_loaded.load_file()
+    assert obj_loaded.text == original
+    assert not list(tmp_path.glob("*.tmp"))
+
+
 def test_clear():
     Path(f"{str(date.today())}_text_en_000.json").absolute().unlink()
     Path(f"{str(date.today())}_text_en_000.pkl").absolute().unlink()
@@ -0,0 +1,117 @@
+"""Testing the HTTP/JSON server."""
+
+import asyncio
+import time
+
+from frequency_analysis_text.server import (
+    MAX_BODY,
+    AnalysisServer,
+    HTTPError,
+    SessionPool,
+    fetch,
+)
+
+
+async def scenario():
+    server = AnalysisServer(base_dir="tests", idle_timeout=600)
+    port = await server.start("127.0.0.1", 0)
+    try:
+        status, data = await fetch(
+            "127.0.0.1", port, "POST", "/sessions", {"path": "tests/texts/text_en.txt"}
+        )
+        assert status == 200
+        assert data["language"] == "en"
+        session = f'/sessions/{data["session"]}'
+
+        responses = await asyncio.gather(
+            *(
+                fetch("127.0.0.1", port, "POST", f"{session}/search", {"word": word})
+                for word in ["football", "Messi", "nothing"] * 100
+            )
+        )
+        assert all(status == 200 for status, _ in responses)
+        assert [res["found"] for _, res in responses[:3]] == [True, True, False]
+
+        status, data = await fetch("127.0.0.1", port, "GET", f"{session}/count?top=3")
+        assert status == 200 and len(data["result_counter"]) == 3
+
+        await fetch("127.0.0.1", port, "POST", f"{session}/search", {"word": "messi"})
+        status, data = await fetch(
+            "127.0.0.1", port, "POST", f"{session}/replace", {"new_word": "Leo"}
+        )
+        assert data["message"] == "Words replaced."
+        status, data = await fetch("127.0.0.1", port, "POST", f"{session}/undo")
+        assert status == 200 and data["message"].startswith("Press")
+        obj_text = server.pool.sessions[session.rsplit("/", 1)[1]].obj_text
+        assert obj_text.version.text is obj_text.text
+
+        status, _ = await fetch(
+            "127.0.0.1", port, "POST", "/sessions", {"path": "README.md"}
+        )
+        assert status == 403
+        status, _ = await fetch("127.0.0.1", port, "GET", "/sessions/unknown/count")
+        assert status == 404
+
+        server.pool.idle_timeout = 0
+        time.sleep(0.01)
+        assert server.pool.evict_idle() == 1
+        status, _ = await fetch("127.0.0.1", port, "GET", session)
+        assert status == 404
+    finally:
+        await server.stop()
+
+
+def test_server():
+    asyncio.run(scenario())
+
+
+async def raw_request(port, head):
+    """Sends a raw request head, returns the status of the response."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(head.encode("latin-1"))
+        await writer.drain()
+        status_line = await reader.readline()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def error_scenario(base_dir):
+    (base_dir / "x.txt").mkdir()
+    (base_dir / "corrupt.pkl").write_bytes(b"not a pickle")
+    server = AnalysisServer(base_dir=base_dir)
+    port = await server.start("127.0.0.1", 0)
+    try:
+        for name in ("x.txt", "corrupt.pkl"):
+            status, data = await fetch(
+                "127.0.0.1", port, "POST", "/sessions", {"path": str(base_dir / name)}
+            )
+            assert status == 400 and data["error"]
+        for length, expected in (("abc", 400), ("-1", 400), (str(MAX_BODY + 1), 413)):
+            status = await raw_request(
+                port, f"POST /sessions HTTP/1.1\r\nContent-Length: {length}\r\n\r\n"
+            )
+            assert status == expected
+    finally:
+        await server.stop()
+
+
+def test_server_errors(tmp_path):
+    asyncio.run(error_scenario(tmp_path))
+
+
+async def busy_scenario():
+    pool = SessionPool(max_sessions=1)
+    session = pool.add(object())
+    async with session.lock:
+        try:
+            pool.add(object())
+            assert False
+        except HTTPError as e:
+            assert e.status == 503
+    assert pool.add(object()) is not session and len(pool.sessions) == 1
+
+
+def test_session_pool_busy():
+    asyncio.run(busy_scenario())